@@ -1,11 +1,21 @@
 import os
+import json
+import asyncio
+import uuid
+import time
+from contextlib import ExitStack, asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime, timezone
 from typing import List, Optional, Any, Dict
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
+from time import perf_counter
+from starlette.background import BackgroundTask
+from starlette.routing import Match
 
 from src.document_ingestion.data_ingestion import (
     DocHandler,
@@ -14,14 +24,43 @@ from src.document_ingestion.data_ingestion import (
     FaissManager,
 )
 from src.document_analyzer.data_analysis import DocumentAnalyzer
+from src.document_analyzer.batch_analysis import BatchDocumentAnalyzer, list_pdfs
 from src.document_compare.document_comparator import DocumentComparatorLLM
 from src.document_chat.retrieval import ConversationalRAG
+from src.document_chat.federated import FederatedSearch
+from src.document_chat.memory import ConversationMemory
+from utils.token_budget import TokenUsage
+from utils.model_loader import ModelLoader
+from utils.metrics import REGISTRY, IN_FLIGHT, REQUEST_SECONDS, record_cache
+from utils.janitor import Janitor, in_use
+from utils.vector_store import MetadataFilter
+from exception.custom_exception import DocumentPortalException
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
 
 FAISS_BASE = os.getenv("FAISS_BASE", "faiss_index")
 UPLOAD_BASE = os.getenv("UPLOAD_BASE", "data")
 FAISS_INDEX_NAME = os.getenv("FAISS_INDEX_NAME", "index")  # <--- keep consistent with save_local()
+SEARCH_TYPES = ("similarity", "mmr", "adaptive")
+BATCH_INPUT_BASE = os.getenv("BATCH_INPUT_BASE", UPLOAD_BASE)  # server-side dirs must live under this
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL_SECONDS", "3600"))  # finished jobs stay queryable this long
+BATCH_JOBS_MAX = int(os.getenv("BATCH_JOBS_MAX", "256"))  # finished jobs kept at most
+WARM_UP = os.getenv("WARM_UP", "1") != "0"
+WARM_INDEXES = int(os.getenv("WARM_INDEXES", "4"))  # most recently written session indexes to preload
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP:
+        await asyncio.to_thread(_warm_up)
+    janitor = Janitor.from_config()
+    janitor.start()
+    try:
+        yield
+    finally:
+        janitor.stop()
 
-app = FastAPI(title="Document Portal API", version="0.1")
+app = FastAPI(title="Document Portal API", version="0.1", lifespan=lifespan)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
@@ -35,6 +74,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """In-flight gauge and latency histogram per route template (not raw path)."""
+    endpoint = _route_template(request)
+    in_flight = IN_FLIGHT.labels(endpoint)
+    in_flight.inc()
+    t0 = perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        REQUEST_SECONDS.labels(endpoint, str(status)).observe(perf_counter() - t0)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus exposition for this worker process."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/", response_class=HTMLResponse)
 async def serve_ui(request: Request):
     resp = templates.TemplateResponse("index.html", {"request": request})
@@ -50,34 +110,145 @@ def health() -> Dict[str, str]:
 async def analyze_document(file: UploadFile = File(...)) -> Any:
     try:
         dh = DocHandler()
-        saved_path = dh.save_pdf(FastAPIFileAdapter(file))
-        text = _read_pdf_via_handler(dh, saved_path)
-        analyzer = DocumentAnalyzer()
-        result = analyzer.analyze_document(text)
-        return JSONResponse(content=result)
+        with in_use(dh.session_path):
+            saved_path = dh.save_pdf(FastAPIFileAdapter(file))
+            result, usage = await asyncio.to_thread(_get_analyzer().analyze_pdf_with_usage, saved_path)
+        return JSONResponse(content=result, headers=_usage_headers(usage))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
 
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    directory: Optional[str] = Form(None),
+    job_id: Optional[str] = Form(None),
+    max_concurrency: Optional[int] = Form(None),
+    requests_per_minute: Optional[float] = Form(None),
+) -> Any:
+    """
+    Start a batch analysis over uploaded PDFs or a server-side directory (under
+    BATCH_INPUT_BASE). Results are appended to <batch_analysis.output_dir>/<job_id>.jsonl;
+    re-submitting the same job_id resumes it.
+    """
+    guard = ExitStack()  # uploads stay protected from the janitor until the job's own guard takes over
+    try:
+        if not files and not directory:
+            raise HTTPException(status_code=400, detail="Provide files or a directory")
+        job_id = job_id or f"batch_{uuid.uuid4().hex[:12]}"
+        if not job_id.replace("_", "").replace("-", "").isalnum():
+            raise HTTPException(status_code=400, detail="Invalid job_id")
+        _prune_batch_jobs()
+        if job_id in _batch_jobs and not _batch_jobs[job_id]["task"].done():
+            raise HTTPException(status_code=409, detail=f"Batch job already running: {job_id}")
+
+        if directory:
+            base = Path(BATCH_INPUT_BASE).resolve()
+            src_dir = Path(directory).resolve()
+            if not src_dir.is_relative_to(base) or not src_dir.is_dir():
+                raise HTTPException(status_code=400, detail=f"directory must be an existing folder under {BATCH_INPUT_BASE}")
+            pdfs = list_pdfs(src_dir)
+        else:
+            dh = DocHandler(session_id=job_id)
+            guard.enter_context(in_use(dh.session_path))
+            pdfs = [Path(dh.save_pdf(FastAPIFileAdapter(f))) for f in files]  # type: ignore
+
+        batch = BatchDocumentAnalyzer(
+            analyzer=_get_analyzer(),
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+        )
+        output_path = batch.output_dir / f"{job_id}.jsonl"
+        task = _start_protected(batch.run(pdfs, output_path), output_path, *{p.parent for p in pdfs})
+        _batch_jobs[job_id] = {"task": task, "batch": batch, "output": str(output_path), "finished_at": None}
+        return {"job_id": job_id, "files": len(pdfs), "output": str(output_path)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {e}")
+    finally:
+        guard.close()
+
+@app.get("/analyze/batch/{job_id}")
+def analyze_batch_status(job_id: str) -> Dict[str, Any]:
+    _prune_batch_jobs()
+    job = _batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch job: {job_id}")
+    task: asyncio.Task = job["task"]
+    if not task.done():
+        state = "running"
+    elif task.cancelled():
+        state = "cancelled"
+    else:
+        state = "failed" if task.exception() else "finished"
+    resp = {"job_id": job_id, "state": state, "output": job["output"], **job["batch"].progress}
+    if state == "failed":
+        resp["error"] = str(task.exception())
+    return resp
+
 # ---------- COMPARE ----------
 @app.post("/compare")
 async def compare_documents(reference: UploadFile = File(...), actual: UploadFile = File(...)) -> Any:
     try:
         dc = DocumentComparator()
+        with in_use(dc.session_path):
+            ref_path, act_path = dc.save_uploaded_files(
+                FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
+            )
+            _ = ref_path, act_path
+            combined_text = dc.combine_documents()
+            comp = DocumentComparatorLLM()
+            df = comp.compare_documents(combined_text)
+        return {
+            "rows": df.to_dict(orient="records"),
+            "session_id": dc.session_id,
+            "usage": comp.last_usage.as_dict(),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
+
+@app.post("/compare/stream")
+async def compare_documents_stream(
+    reference: UploadFile = File(...),
+    actual: UploadFile = File(...),
+    window_pages: int = Form(10),
+    max_concurrency: int = Form(4),
+    max_retries: int = Form(2),
+) -> Any:
+    """Compare aligned page windows concurrently and stream ChangeFormat rows as NDJSON."""
+    # held from before the save until the stream ends (or the response is abandoned)
+    guard = ExitStack()
+    try:
+        dc = DocumentComparator()
+        guard.enter_context(in_use(dc.session_path))
         ref_path, act_path = dc.save_uploaded_files(
             FastAPIFileAdapter(reference), FastAPIFileAdapter(actual)
         )
-        _ = ref_path, act_path
-        combined_text = dc.combine_documents()
         comp = DocumentComparatorLLM()
-        df = comp.compare_documents(combined_text)
-        return {"rows": df.to_dict(orient="records"), "session_id": dc.session_id}
-    except HTTPException:
-        raise
     except Exception as e:
+        guard.close()
         raise HTTPException(status_code=500, detail=f"Comparison failed: {e}")
 
+    async def ndjson():
+        yield json.dumps({"type": "session", "session_id": dc.session_id}) + "\n"
+        failed = 0
+        try:
+            with guard:
+                windows = dc.iter_page_windows(ref_path, act_path, window_pages=window_pages)
+                async for event in comp.astream_compare(windows, max_concurrency=max_concurrency, max_retries=max_retries):
+                    failed += event["type"] == "error"
+                    yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": f"Comparison failed: {e}"}) + "\n"
+            return
+        yield json.dumps({"type": "done", "failed_windows": failed, "usage": comp.last_usage.as_dict()}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", background=BackgroundTask(guard.close))
+
 # ---------- CHAT: INDEX ----------
 @app.post("/chat/index")
 async def chat_build_index(
@@ -98,9 +269,10 @@ async def chat_build_index(
         )
         # NOTE: ensure your ChatIngestor saves with index_name="index" or FAISS_INDEX_NAME
         # e.g., if it calls FAISS.save_local(dir, index_name=FAISS_INDEX_NAME)
-        ci.built_retriver(  # if your method name is actually build_retriever, fix it there as well
-            wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k
-        )
+        with in_use(ci.temp_dir, ci.faiss_dir):
+            ci.built_retriver(  # if your method name is actually build_retriever, fix it there as well
+                wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap, k=k
+            )
         return {"session_id": ci.session_id, "k": k, "use_session_dirs": use_session_dirs}
     except HTTPException:
         raise
@@ -114,32 +286,285 @@ async def chat_query(
     session_id: Optional[str] = Form(None),
     use_session_dirs: bool = Form(True),
     k: int = Form(5),
+    search_type: str = Form("similarity"),  # similarity | mmr (diverse chunks) | adaptive (k cut by score drop-off)
+    fetch_k: Optional[int] = Form(None),
+    lambda_mult: Optional[float] = Form(None),
+    min_k: Optional[int] = Form(None),  # adaptive bounds; retriever.adaptive if unset
+    max_k: Optional[int] = Form(None),
+    sources: Optional[List[str]] = Form(None),  # file names (or stored paths) to search within
+    page_from: Optional[int] = Form(None),  # 1-based, inclusive
+    page_to: Optional[int] = Form(None),
+    ingested_after: Optional[str] = Form(None),  # ISO 8601, e.g. 2025-01-31T12:00:00Z
+    ingested_before: Optional[str] = Form(None),
 ) -> Any:
     try:
         if use_session_dirs and not session_id:
             raise HTTPException(status_code=400, detail="session_id is required when use_session_dirs=True")
+        if search_type not in SEARCH_TYPES:
+            raise HTTPException(status_code=400, detail=f"search_type must be one of {', '.join(SEARCH_TYPES)}")
+        metadata_filter = _metadata_filter(sources, page_from, page_to, ingested_after, ingested_before)
 
         index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs else FAISS_BASE  # type: ignore
         if not os.path.isdir(index_dir):
             raise HTTPException(status_code=404, detail=f"FAISS index not found at: {index_dir}")
 
-        rag = ConversationalRAG(session_id=session_id)
-        rag.load_retriever_from_faiss(index_dir, k=k, index_name=FAISS_INDEX_NAME)  # build retriever + chain
-        response = rag.invoke(question, chat_history=[])
+        with in_use(index_dir):
+            rag = ConversationalRAG(session_id=session_id)
+            extra = {
+                "mmr": (("fetch_k", fetch_k), ("lambda_mult", lambda_mult)),
+                "adaptive": (("min_k", min_k), ("max_k", max_k)),
+            }.get(search_type, ())
+            search_kwargs = {n: v for n, v in extra if v is not None}
+            rag.load_retriever_from_faiss(  # build retriever + chain
+                index_dir, k=k, index_name=FAISS_INDEX_NAME, search_type=search_type,
+                search_kwargs={"k": k, **search_kwargs} if search_kwargs else None,
+                metadata_filter=metadata_filter,
+            )
+            response = rag.invoke(question, chat_history=[])
 
         return {
             "answer": response,
             "session_id": session_id,
             "k": k,
-            "engine": "LCEL-RAG"
+            "search_type": search_type,
+            "adaptive": _adaptive_cutoff(rag),
+            "filter": None if metadata_filter.is_empty() else asdict(metadata_filter),
+            "engine": "LCEL-RAG",
+            "usage": rag.last_usage.as_dict(),
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
+# ---------- CHAT: WEBSOCKET ----------
+@app.websocket("/chat/ws")
+async def chat_ws(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    use_session_dirs: bool = True,
+    k: int = 5,
+    search_type: str = "similarity",
+) -> None:
+    """
+    Multi-turn chat over one session index. The connection keeps its RAG chain warm and
+    its history server-side (token-bounded, older turns summarized). Send {"question": ...}
+    (or plain text) per turn, or {"type": "reset"} to forget the history. Each answer comes
+    back as {"type": "token"} pieces followed by {"type": "done"} with usage and history size.
+    """
+    await websocket.accept()
+    index_dir = os.path.join(FAISS_BASE, session_id) if use_session_dirs and session_id else FAISS_BASE
+    error = None
+    if use_session_dirs and not session_id:
+        error = "session_id is required when use_session_dirs=True"
+    elif search_type not in SEARCH_TYPES:
+        error = f"search_type must be one of {', '.join(SEARCH_TYPES)}"
+    elif not os.path.isdir(index_dir):
+        error = f"FAISS index not found at: {index_dir}"
+    if error:
+        await websocket.send_json({"type": "error", "error": error})
+        await websocket.close(code=1008)
+        return
+
+    turns = 0
+    try:
+        with in_use(index_dir):
+            rag = await asyncio.to_thread(_open_chat, index_dir, session_id, k, search_type)
+            memory = ConversationMemory.from_config(rag.llm, rag.budget, rag.model_loader.config)
+            await websocket.send_json({"type": "ready", "session_id": session_id, "k": k, "search_type": search_type})
+            while True:
+                message = _ws_message(await websocket.receive_text())
+                if message.get("type") == "reset":
+                    memory.clear()
+                    await websocket.send_json({"type": "reset", "history": memory.stats()})
+                    continue
+                question = str(message.get("question") or "").strip()
+                if not question:
+                    await websocket.send_json({"type": "error", "error": "question is required"})
+                    continue
+                parts: List[str] = []
+                try:
+                    async for piece in rag.astream(question, memory.messages()):
+                        parts.append(piece)
+                        await websocket.send_json({"type": "token", "text": piece})
+                except DocumentPortalException as e:
+                    await websocket.send_json({"type": "error", "error": f"Query failed: {e}"})
+                    continue
+                answer = "".join(parts) or "no answer generated."
+                memory.add_turn(question, answer)
+                turns += 1
+                await websocket.send_json({
+                    "type": "done",
+                    "answer": answer,
+                    "usage": rag.last_usage.as_dict(),
+                    "adaptive": _adaptive_cutoff(rag),
+                    "history": memory.stats(),
+                })
+                await memory.acompact()  # after "done", so summarizing never delays an answer
+    except WebSocketDisconnect:
+        log.info("Chat websocket closed", session_id=session_id, turns=turns)
+    except Exception as e:
+        log.error("Chat websocket failed", session_id=session_id, error=str(e))
+        try:
+            await websocket.send_json({"type": "error", "error": f"Chat failed: {e}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+
+# ---------- SEARCH: FEDERATED ----------
+@app.post("/search/federated")
+async def search_federated(
+    query: str = Form(...),
+    session_ids: Optional[List[str]] = Form(None),  # omit to search every session index
+    k: int = Form(5),
+    timeout_ms: Optional[int] = Form(None),  # per-shard cap; federated.timeout_seconds if unset
+    sources: Optional[List[str]] = Form(None),
+    page_from: Optional[int] = Form(None),
+    page_to: Optional[int] = Form(None),
+    ingested_after: Optional[str] = Form(None),
+    ingested_before: Optional[str] = Form(None),
+) -> Any:
+    """Top-k chunks across many session indexes, searched in parallel, with per-shard timings."""
+    try:
+        if k < 1:
+            raise HTTPException(status_code=400, detail="k must be at least 1")
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise HTTPException(status_code=400, detail="timeout_ms must be positive")
+        metadata_filter = _metadata_filter(sources, page_from, page_to, ingested_after, ingested_before)
+        searcher = FederatedSearch.from_config(FAISS_BASE, index_name=FAISS_INDEX_NAME)
+        result = await asyncio.to_thread(
+            searcher.search,
+            query,
+            session_ids=[s for s in session_ids if s] if session_ids else None,
+            k=k,
+            metadata_filter=None if metadata_filter.is_empty() else metadata_filter,
+            timeout_seconds=None if timeout_ms is None else timeout_ms / 1000,
+        )
+        return {
+            "query": query,
+            "k": k,
+            "filter": None if metadata_filter.is_empty() else asdict(metadata_filter),
+            "results": [h.as_dict() for h in result.hits],
+            "shards": [asdict(r) for r in result.shards],
+            "seconds": result.seconds,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Federated search failed: {e}")
+
 
 # ---------- Helpers ----------
+_analyzer: Optional[DocumentAnalyzer] = None
+_batch_jobs: Dict[str, Dict[str, Any]] = {}
+
+def _prune_batch_jobs() -> None:
+    """Forget jobs finished over BATCH_JOB_TTL ago, then all but the newest BATCH_JOBS_MAX finished ones."""
+    now = time.monotonic()
+    for job in _batch_jobs.values():
+        if job["finished_at"] is None and job["task"].done():
+            job["finished_at"] = now  # first seen finished
+    finished = sorted(
+        (job["finished_at"], job_id) for job_id, job in _batch_jobs.items() if job["finished_at"] is not None
+    )
+    excess = len(finished) - BATCH_JOBS_MAX
+    for i, (finished_at, job_id) in enumerate(finished):
+        if i < excess or now - finished_at > BATCH_JOB_TTL:
+            del _batch_jobs[job_id]
+
+def _get_analyzer() -> DocumentAnalyzer:
+    """One DocumentAnalyzer (and LLM client) per worker process."""
+    global _analyzer
+    record_cache("analyzer", _analyzer is not None)
+    if _analyzer is None:
+        _analyzer = DocumentAnalyzer()
+    return _analyzer
+
+def _parse_timestamp(value: Optional[str], field: str) -> Optional[float]:
+    """ISO 8601 form value to epoch seconds (naive times are UTC); 400 if malformed."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be an ISO 8601 timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _metadata_filter(
+    sources: Optional[List[str]],
+    page_from: Optional[int],
+    page_to: Optional[int],
+    ingested_after: Optional[str],
+    ingested_before: Optional[str],
+) -> MetadataFilter:
+    return MetadataFilter(
+        sources=[s for s in (sources or []) if s] or None,
+        page_from=page_from,
+        page_to=page_to,
+        ingested_after=_parse_timestamp(ingested_after, "ingested_after"),
+        ingested_before=_parse_timestamp(ingested_before, "ingested_before"),
+    )
+
+def _open_chat(index_dir: str, session_id: Optional[str], k: int, search_type: str) -> ConversationalRAG:
+    rag = ConversationalRAG(session_id=session_id)
+    rag.load_retriever_from_faiss(index_dir, k=k, index_name=FAISS_INDEX_NAME, search_type=search_type)
+    return rag
+
+def _adaptive_cutoff(rag: ConversationalRAG) -> Optional[Dict[str, Any]]:
+    """The last query's adaptive top-k cutoff (chosen k, token savings), if search_type was adaptive."""
+    cutoff = rag.last_cutoff
+    return cutoff.as_dict() if cutoff is not None else None
+
+def _ws_message(raw: str) -> Dict[str, Any]:
+    """A websocket chat message: a JSON object, or plain text taken as the question."""
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return {"question": raw}
+    return message if isinstance(message, dict) else {"question": raw}
+
+def _start_protected(coro, *paths) -> asyncio.Task:
+    """Run `coro` as a task, its session paths protected from the janitor from now until it ends."""
+    guard = ExitStack()
+    guard.enter_context(in_use(*paths))
+    task = asyncio.create_task(coro)
+    task.add_done_callback(lambda _: guard.close())  # also runs if cancelled before it starts
+    return task
+
+def _warm_up() -> None:
+    """
+    Startup hook: build model clients, the analyzer and the hottest session indexes
+    before serving, so the first requests do not pay for imports and disk loads.
+    Failures are logged, not fatal; the same work then happens lazily.
+    """
+    t0 = perf_counter()
+    try:
+        ModelLoader().warm_up()
+        _get_analyzer()
+        for index_dir in _recent_indexes(WARM_INDEXES):
+            ConversationalRAG(session_id=None).load_retriever_from_faiss(index_dir, index_name=FAISS_INDEX_NAME)
+        log.info("Warm-up complete", seconds=round(perf_counter() - t0, 3))
+    except Exception as e:
+        log.warning("Warm-up incomplete; continuing with lazy loading", error=str(e))
+
+def _recent_indexes(limit: int) -> List[str]:
+    """Index dirs under FAISS_BASE (session dirs or the base itself), newest first."""
+    base = Path(FAISS_BASE)
+    candidates = ([base] + [d for d in base.iterdir() if d.is_dir()]) if base.is_dir() else []
+    found = [(d / f"{FAISS_INDEX_NAME}.faiss") for d in candidates]
+    found = [f for f in found if f.exists()]
+    found.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+    return [str(f.parent) for f in found[:max(0, limit)]]
+
+def _route_template(request: Request) -> str:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
 class FastAPIFileAdapter:
     """Adapt FastAPI UploadFile -> .name + .getbuffer() API"""
     def __init__(self, uf: UploadFile):
@@ -149,6 +574,14 @@ class FastAPIFileAdapter:
         self._uf.file.seek(0)
         return self._uf.file.read()
 
+def _usage_headers(usage: TokenUsage) -> Dict[str, str]:
+    """Expose per-request token counts on responses whose body is a fixed schema."""
+    return {
+        "X-Prompt-Tokens": str(usage.prompt_tokens),
+        "X-Completion-Tokens": str(usage.completion_tokens),
+        "X-Tokens-Estimated": "true" if usage.estimated else "false",
+    }
+
 def _read_pdf_via_handler(handler: DocHandler, path: str) -> str:
     if hasattr(handler, "read_pdf"):
         return handler.read_pdf(path)  # type: ignore
@@ -0,0 +1,97 @@
+"""
+Adaptive top-k (search_type="adaptive") against a fixed k over the synthetic corpus,
+through ConversationalRAG with the fake LLM. Two kinds of question are asked:
+"lookup" questions about one page's reference code, which have a single relevant
+chunk, and "broad" questions about the filler prose, which many chunks match
+about equally. Reports per mode and kind: mean / min / max chunks sent, mean
+prompt tokens, and (lookup only) how often the relevant chunk was in the context.
+For adaptive, it also reports the per-query prompt tokens saved against the fixed k.
+
+    python -m benchmarks.bench_adaptive_topk --pages 60 --queries 30 --k 5
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+
+def _run(rag, questions, relevant) -> Dict[str, float]:
+    ks, prompt_tokens, hits, saved = [], [], [], []
+    for question, passage in zip(questions, relevant):
+        rag.invoke(question, chat_history=[])
+        prompt_tokens.append(rag.last_usage.prompt_tokens)
+        docs = rag.last_documents  # AdaptiveDocuments in adaptive mode, carrying its cutoff
+        cutoff = getattr(docs, "cutoff", None)
+        if cutoff is not None:
+            saved.append(cutoff.tokens_saved)
+        ks.append(len(docs))
+        if passage is not None:
+            from src.document_chat.evaluation import is_relevant
+            hits.append(any(is_relevant(d.page_content, passage) for d in docs))
+    return {
+        "mean_k": statistics.mean(ks),
+        "min_k": min(ks),
+        "max_k": max(ks),
+        "prompt_tokens": statistics.mean(prompt_tokens),
+        "found": statistics.mean(hits) if hits else None,
+        "context_tokens_saved": statistics.mean(saved) if saved else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=60)
+    ap.add_argument("--queries", type=int, default=30, help="questions of each kind")
+    ap.add_argument("--k", type=int, default=5, help="the fixed k (and adaptive's savings baseline)")
+    ap.add_argument("--chunk-size", type=int, default=400)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "1000000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.run_suite import _Upload
+    from benchmarks.synthetic import ADJS, NOUNS, make_corpus_pdf, make_labeled_queries
+    from src.document_chat.retrieval import ConversationalRAG
+    from src.document_ingestion.data_ingestion import ChatIngestor
+
+    lookup = make_labeled_queries(args.pages, args.queries)
+    broad = [f"What did the committee agree on for the {ADJS[i % len(ADJS)]} {NOUNS[i % len(NOUNS)]} programme?"
+             for i in range(args.queries)]
+    kinds = {"lookup": ([q for q, _ in lookup], [p for _, p in lookup]), "broad": (broad, [None] * len(broad))}
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        pdf = work / "corpus.pdf"
+        make_corpus_pdf(pdf, args.pages)
+        ingestor = ChatIngestor(temp_base=str(work / "data"), faiss_base=str(work / "faiss"), session_id="bench")
+        ingestor.built_retriver([_Upload(pdf)], chunk_size=args.chunk_size, chunk_overlap=args.chunk_size // 5)
+
+        print(f"{args.pages} pages, chunk size {args.chunk_size}, {args.queries} questions per kind, fixed k={args.k}")
+        print(f"{'mode':>9} {'kind':>7} {'mean k':>7} {'k range':>8} {'prompt tok':>11} {'found':>6} {'ctx tok saved':>14}")
+        for mode in ("fixed", "adaptive"):
+            rag = ConversationalRAG(session_id="bench")
+            rag.load_retriever_from_faiss(
+                str(ingestor.faiss_dir), k=args.k, search_type="adaptive" if mode == "adaptive" else "similarity"
+            )
+            for kind, (questions, relevant) in kinds.items():
+                r = {"mode": mode, "kind": kind, **_run(rag, questions, relevant)}
+                results.append(r)
+                found = f"{r['found']:>6.2f}" if r["found"] is not None else f"{'-':>6}"
+                saved = f"{r['context_tokens_saved']:>14.0f}" if r["context_tokens_saved"] is not None else f"{'-':>14}"
+                print(f"{mode:>9} {kind:>7} {r['mean_k']:>7.2f} {r['min_k']:>3}-{r['max_k']:<4} "
+                      f"{r['prompt_tokens']:>11.0f} {found} {saved}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Full-text LLM analysis vs PDF-metadata pre-pass + semantic-only LLM call.
+
+Reports latency and prompt/completion tokens per document size for both paths,
+using whatever LLM ModelLoader is configured for (LLM_PROVIDER).
+
+    python -m benchmarks.bench_analysis_metadata --pages 5 50 200
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_pdf_extraction import make_pdf
+from src.document_analyzer.data_analysis import DocumentAnalyzer
+from utils.pdf_pages import iter_pdf_pages
+
+
+def make_pdf_with_info(path: Path, pages: int) -> Path:
+    make_pdf(path, pages)
+    doc = fitz.open(str(path))
+    doc.set_metadata({
+        "title": f"Synthetic report ({pages} pages)",
+        "author": "A. Writer; B. Reviewer",
+        "creationDate": "D:20240101120000Z",
+        "modDate": "D:20240301090000Z",
+    })
+    doc.saveIncr()
+    doc.close()
+    return path
+
+
+def full_text(pdf_path: Path) -> str:
+    return "\n".join(f"\n--- Page {n + 1} ---\n{t}" for n, t in iter_pdf_pages(str(pdf_path)))
+
+
+def timed(fn, repeats):
+    runs = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        _, usage = fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs), usage
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, nargs="+", default=[5, 50, 200])
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    analyzer = DocumentAnalyzer()
+    results = []
+    print(f"{'pages':>6} | {'full s':>8} {'prompt':>8} {'compl':>6} | {'prepass s':>9} {'prompt':>8} {'compl':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.pages:
+            pdf = make_pdf_with_info(Path(tmp) / f"doc_{n}.pdf", n)
+            before_s, before = timed(lambda: analyzer.analyze_with_usage(full_text(pdf)), args.repeats)
+            after_s, after = timed(lambda: analyzer.analyze_pdf_with_usage(str(pdf)), args.repeats)
+            results.append({
+                "pages": n,
+                "full_text": {"latency_s": before_s, **before.as_dict()},
+                "metadata_prepass": {"latency_s": after_s, **after.as_dict()},
+            })
+            print(
+                f"{n:>6} | {before_s:>8.2f} {before.prompt_tokens:>8} {before.completion_tokens:>6} |"
+                f" {after_s:>9.2f} {after.prompt_tokens:>8} {after.completion_tokens:>6}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Multi-turn chat cost over --turns questions: the whole history resent every turn
+(trimmed only by ConversationalRAG's history share of the prompt budget) against
+the token-bounded ConversationMemory used by /chat/ws. Reports prompt tokens of the
+last turn, mean prompt tokens per turn, LLM summary calls, and time to first token
+versus full answer latency when the answer is streamed.
+
+    python -m benchmarks.bench_chat_memory --turns 30 --memory-tokens 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+async def _chat(index_dir: str, questions: List[str], k: int, memory_tokens: int) -> Dict[str, float]:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.document_chat.memory import ConversationMemory
+    from src.document_chat.retrieval import ConversationalRAG
+
+    rag = ConversationalRAG(session_id="bench")
+    rag.load_retriever_from_faiss(index_dir, k=k)
+    memory = None
+    if memory_tokens:
+        memory = ConversationMemory.from_config(rag.llm, rag.budget, rag.model_loader.config)
+        memory.max_tokens = memory_tokens
+    history, prompt_tokens, ttft, total, summaries = [], [], [], [], 0
+    for question in questions:
+        t0 = time.perf_counter()
+        first, parts = None, []
+        async for piece in rag.astream(question, memory.messages() if memory else history):
+            first = first or time.perf_counter() - t0
+            parts.append(piece)
+        total.append(time.perf_counter() - t0)
+        ttft.append(first or total[-1])
+        prompt_tokens.append(rag.last_usage.prompt_tokens)
+        answer = "".join(parts)
+        if memory:
+            memory.add_turn(question, answer)
+            summaries += await memory.acompact()
+        else:
+            history += [HumanMessage(content=question), AIMessage(content=answer)]
+    return {
+        "last_prompt_tokens": prompt_tokens[-1],
+        "mean_prompt_tokens": statistics.mean(prompt_tokens),
+        "summary_calls": summaries,
+        "ttft_ms": statistics.mean(ttft) * 1000,
+        "answer_ms": statistics.mean(total) * 1000,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--turns", type=int, default=30)
+    ap.add_argument("--k", type=int, default=3)
+    ap.add_argument("--memory-tokens", type=int, default=1000)
+    ap.add_argument("--llm-latency-ms", type=float, default=20.0)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "2000")
+    os.environ.setdefault("FAKE_LLM_PROMPT_TOKENS_PER_SECOND", "20000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.run_suite import bench_ingest
+    from benchmarks.synthetic import make_corpus_pdf, make_queries
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        pdf = work / "corpus.pdf"
+        make_corpus_pdf(pdf, args.pages)
+        _, index_dir = bench_ingest(work, pdf, args.pages)
+        questions = [q for q, _ in make_queries(args.pages, args.turns)]
+        questions = (questions * (args.turns // max(len(questions), 1) + 1))[: args.turns]
+
+        print(f"{args.turns} turns, k={args.k}")
+        print(f"{'history':>16} {'last prompt':>12} {'mean prompt':>12} {'summaries':>10} {'ttft ms':>8} {'answer ms':>10}")
+        for name, memory_tokens in (("full resend", 0), (f"memory {args.memory_tokens}", args.memory_tokens)):
+            r = {"history": name, **asyncio.run(_chat(index_dir, questions, args.k, memory_tokens))}
+            results.append(r)
+            print(f"{name:>16} {r['last_prompt_tokens']:>12.0f} {r['mean_prompt_tokens']:>12.0f} "
+                  f"{r['summary_calls']:>10} {r['ttft_ms']:>8.1f} {r['answer_ms']:>10.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+API cold start: cumulative import time per module for `import api.main` (from
+`python -X importtime`), optionally against an older git revision, plus the time
+the startup warm-up takes.
+
+    python -m benchmarks.bench_cold_start                       # current tree
+    python -m benchmarks.bench_cold_start --compare-ref HEAD~1  # before/after
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules worth reporting individually: the app's own packages plus the heavy
+# third-party imports that used to sit on the startup path.
+WATCHED = [
+    "api.main", "src.document_ingestion.data_ingestion", "src.document_analyzer.data_analysis",
+    "src.document_compare.document_comparator", "src.document_chat.retrieval", "utils.model_loader",
+    "utils.document_ops", "utils.config_loader", "fastapi", "pandas", "fitz", "langchain_google_genai",
+    "langchain_groq", "langchain_text_splitters", "langchain.output_parsers",
+    "langchain_community.document_loaders", "langchain_community.vectorstores",
+]
+
+
+def import_times(tree: Path, module: str = "api.main") -> Dict[str, int]:
+    """Cumulative microseconds per top-level-imported module, parsed from -X importtime."""
+    env = dict(os.environ, PYTHONPATH=str(tree), WARM_UP="0", LOG_LEVEL="WARNING")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=tree, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    times: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), int(cumulative))
+    return times
+
+
+def median_times(tree: Path, repeats: int) -> Dict[str, float]:
+    runs = [import_times(tree) for _ in range(repeats)]
+    names = set().union(*runs)
+    return {n: statistics.median(r.get(n, 0) for r in runs) / 1000.0 for n in names}
+
+
+def export_ref(ref: str, dest: Path) -> Path:
+    """Check out `ref` into `dest` with the current config (older trees read it relative to cwd)."""
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+    config = ROOT / "config" / "config.yaml"
+    shutil.copy(config, dest / "config" / "config.yaml")
+    shutil.copy(config, dest / "config\\config.yaml")
+    return dest
+
+
+def warm_up_seconds(tree: Path) -> float:
+    code = (
+        "import time, api.main as m; t0 = time.perf_counter(); m._warm_up(); "
+        "print(time.perf_counter() - t0)"
+    )
+    env = dict(os.environ, PYTHONPATH=str(tree), LOG_LEVEL="WARNING",
+               LLM_PROVIDER=os.getenv("LLM_PROVIDER", "fake"), EMBEDDING_PROVIDER=os.getenv("EMBEDDING_PROVIDER", "hash"))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=tree, env=env, capture_output=True, text=True)
+    return float(proc.stdout.strip().splitlines()[-1]) if proc.returncode == 0 else float("nan")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--compare-ref", type=str, default=None, help="git revision to measure as 'before'")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    after = median_times(ROOT, args.repeats)
+    before: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.compare_ref:
+            before = median_times(export_ref(args.compare_ref, Path(tmp)), args.repeats)
+
+    rows: List[dict] = []
+    print(f"{'module':<45} {'before ms':>10} {'after ms':>10}")
+    for name in WATCHED:
+        b, a = before.get(name), after.get(name)
+        rows.append({"module": name, "before_ms": b, "after_ms": a})
+        fmt = lambda v: f"{v:>10.1f}" if v is not None else f"{'-':>10}"
+        print(f"{name:<45} {fmt(b)} {fmt(a)}")
+    warm = warm_up_seconds(ROOT)
+    print(f"\nstartup warm-up (fake LLM, hash embeddings): {warm * 1000:.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"modules": rows, "warm_up_seconds": warm}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
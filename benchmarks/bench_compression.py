@@ -0,0 +1,88 @@
+"""
+Effect of extractive context compression on the QA prompt: prompt tokens, context
+compression ratio, whether the queried fact survives, and end-to-end RAG latency.
+The fake LLM charges prompt tokens at --prompt-tokens-per-second, so its latency
+responds to prompt size the way a hosted model's prefill does; pass a real
+LLM_PROVIDER in the environment to measure a hosted model instead.
+
+    python -m benchmarks.bench_compression --k 5 --max-tokens 200 400 800
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def _run(index_dir: str, queries, k: int, compress: bool, max_tokens: int) -> Dict[str, float]:
+    os.environ["CONTEXT_COMPRESSION"] = "1" if compress else "0"
+    from src.document_chat.retrieval import ConversationalRAG
+
+    rag = ConversationalRAG(session_id="bench")
+    if rag.compressor is not None:
+        rag.compressor.max_tokens = max_tokens
+    rag.load_retriever_from_faiss(index_dir, k=k)
+    latencies, prompt_tokens, ratios, hits = [], [], [], 0
+    for question, code in queries:
+        t0 = time.perf_counter()
+        rag.invoke(question, chat_history=[])
+        latencies.append(time.perf_counter() - t0)
+        prompt_tokens.append(rag.last_usage.prompt_tokens)
+        docs = rag.retriever.invoke(question)
+        if rag.compressor is not None:
+            docs, stats = rag.compressor.compress(question, docs, count=rag.budget.count)
+            ratios.append(stats.ratio)
+        hits += any(code in d.page_content for d in docs)
+    return {
+        "latency_ms": statistics.mean(latencies) * 1000,
+        "prompt_tokens": statistics.mean(prompt_tokens),
+        "context_ratio": statistics.mean(ratios) if ratios else 1.0,
+        "fact_kept": hits / len(queries),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--max-tokens", type=int, nargs="+", default=[200, 400, 800])
+    ap.add_argument("--llm-latency-ms", type=float, default=20.0)
+    ap.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "5000")
+    os.environ.setdefault("FAKE_LLM_PROMPT_TOKENS_PER_SECOND", str(args.prompt_tokens_per_second))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.run_suite import bench_ingest
+    from benchmarks.synthetic import make_corpus_pdf, make_queries, page_fact
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        pdf = work / "corpus.pdf"
+        make_corpus_pdf(pdf, args.pages)
+        _, index_dir = bench_ingest(work, pdf, args.pages)
+        queries = [(q, page_fact(p)[0]) for q, p in make_queries(args.pages, args.queries)]
+
+        print(f"{'mode':>14} {'prompt tokens':>14} {'context kept':>13} {'fact kept':>10} {'latency ms':>11}")
+        modes = [("off", False, 0)] + [(f"max {t}", True, t) for t in args.max_tokens]
+        for name, compress, max_tokens in modes:
+            r = {"mode": name, **_run(index_dir, queries, args.k, compress, max_tokens)}
+            results.append(r)
+            print(f"{name:>14} {r['prompt_tokens']:>14.0f} {r['context_ratio']:>13.2f} {r['fact_kept']:>10.2f} {r['latency_ms']:>11.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
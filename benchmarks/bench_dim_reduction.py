@@ -0,0 +1,107 @@
+"""
+Reduced-dimension session indexes: full --dim vectors against truncation (for
+Matryoshka-style embeddings) and a PCA projection trained when the index is
+written, at each of --dims output dimensions. Vectors are clustered, unit-norm,
+with variance decaying over dimensions the way Matryoshka-trained embeddings
+front-load information. Every mode is saved with save_vectorstore and loaded back
+with load_vectorstore, so queries go through the transform stored in the index.
+
+Reported per mode:
+- index RAM: the stored vectors
+- write time: save_vectorstore, including PCA training
+- mean query latency
+- recall@k against exact search at full dimension
+
+    python -m benchmarks.bench_dim_reduction --vectors 50000 --dim 768 --dims 64,128,256,384
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+def _front_loaded(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    x *= (1.0 + np.arange(dim, dtype=np.float32)) ** -0.5
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vectors", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--dims", type=str, default="64,128,256,384", help="comma-separated output dimensions")
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import SegmentedIndex, load_vectorstore, save_vectorstore
+
+    rng = np.random.default_rng(0)
+    x = _front_loaded(args.vectors, args.dim, args.clusters, rng)
+    q = x[rng.integers(0, args.vectors, args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(x)
+    _, truth = exact.search(q, args.k)
+    del exact
+
+    ids = [str(i) for i in range(args.vectors)]
+    docs = {i: Document(page_content=f"chunk {i}") for i in ids}
+    modes = [("full", args.dim, None)] + [
+        (f"{method} {dim}", dim, (method, dim))
+        for dim in sorted(int(d) for d in args.dims.split(",") if int(d) < args.dim)
+        for method in ("truncate", "pca")
+    ]
+
+    results: List[Dict] = []
+    print(f"{args.vectors} vectors x {args.dim} dims, k={args.k}")
+    print(f"{'mode':>13} {'index RAM MB':>13} {'write s':>8} {'latency ms':>11} {'recall@k':>9}")
+    for name, dim, reduction in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            flat = faiss.IndexFlatL2(args.dim)
+            flat.add(x)
+            vs = FAISS(HashEmbeddings(), flat, InMemoryDocstore(dict(docs)), dict(enumerate(ids)))
+            t0 = time.perf_counter()
+            save_vectorstore(vs, tmp, reduction=reduction)
+            write_s = time.perf_counter() - t0
+            vs.docstore.close()
+            del vs, flat
+            store = load_vectorstore(tmp, HashEmbeddings(), mmap=False)
+            index = store.index.base if isinstance(store.index, SegmentedIndex) else store.index
+            latencies, found = [], []
+            for row in q:
+                t0 = time.perf_counter()
+                _, got = index.search(row[None, :], args.k)
+                latencies.append(time.perf_counter() - t0)
+                found.append(got[0])
+            recall = statistics.mean(len(set(g) & set(t)) / args.k for g, t in zip(found, truth))
+            store.docstore.close()
+        r = {"mode": name, "dim": dim, "index_ram_mb": args.vectors * dim * 4 / 1e6, "write_s": write_s,
+             "latency_ms": statistics.mean(latencies) * 1000, "recall_at_k": recall}
+        results.append(r)
+        print(f"{name:>13} {r['index_ram_mb']:>13.1f} {r['write_s']:>8.2f} {r['latency_ms']:>11.2f} {r['recall_at_k']:>9.3f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
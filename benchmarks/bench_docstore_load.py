@@ -0,0 +1,88 @@
+"""
+Index load time, memory and top-k query time against corpus text size: the
+pickled docstore (FAISS.save_local/load_local) vs the SQLite chunk store of
+utils.vector_store, which reads only the chunks a search returns.
+
+    python -m benchmarks.bench_docstore_load --vectors 50000 --text-bytes 200 2000 8000
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+DIM = 384
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/status") as fh:
+        return int(fh.read().split("VmRSS:")[1].split()[0])
+
+
+def _load(folder: str, fmt: str, out):
+    from langchain_community.vectorstores import FAISS
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import load_vectorstore
+
+    emb = HashEmbeddings(dim=DIM)
+    rss0, t0 = _rss_kb(), time.perf_counter()
+    if fmt == "pickle":
+        vs = FAISS.load_local(folder, emb, allow_dangerous_deserialization=True)
+    else:
+        vs = load_vectorstore(Path(folder), emb, read_only=False)
+    load_s = time.perf_counter() - t0
+    q = np.random.default_rng(1).random(DIM, dtype=np.float32).tolist()
+    t0 = time.perf_counter()
+    for _ in range(20):
+        vs.similarity_search_by_vector(q, k=5)
+    out.put({"load_ms": load_s * 1000, "query_ms": (time.perf_counter() - t0) / 20 * 1000, "rss_mb": (_rss_kb() - rss0) / 1024})
+
+
+def measure(folder: Path, fmt: str) -> dict:
+    ctx = multiprocessing.get_context("spawn")  # fresh process per load: no warm allocator or caches
+    out = ctx.Queue()
+    p = ctx.Process(target=_load, args=(str(folder), fmt, out))
+    p.start()
+    result = out.get()
+    p.join()
+    return result
+
+
+def build(folder: Path, vectors: int, text_bytes: int) -> None:
+    from langchain_community.vectorstores import FAISS
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import save_vectorstore
+
+    emb = np.random.default_rng(0).random((vectors, DIM), dtype=np.float32)
+    texts = [f"chunk {i} " + "x" * text_bytes for i in range(vectors)]
+    vs = FAISS.from_embeddings(zip(texts, emb.tolist()), HashEmbeddings(dim=DIM), metadatas=[{"row": i} for i in range(vectors)])
+    vs.save_local(str(folder / "pickle"))
+    save_vectorstore(vs, folder / "sqlite")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vectors", type=int, default=50000)
+    ap.add_argument("--text-bytes", type=int, nargs="+", default=[200, 2000, 8000])
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'text B':>7} {'format':>7} {'load ms':>9} {'query ms':>9} {'RSS MB':>8}")
+    for size in args.text_bytes:
+        with tempfile.TemporaryDirectory() as tmp:
+            build(Path(tmp), args.vectors, size)
+            for fmt in ("pickle", "sqlite"):
+                r = measure(Path(tmp) / fmt, fmt)
+                results.append({"text_bytes": size, "format": fmt, **r})
+                print(f"{size:>7} {fmt:>7} {r['load_ms']:>9.1f} {r['query_ms']:>9.2f} {r['rss_mb']:>8.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Embedding providers compared on the synthetic corpus: document throughput, query
+latency and retrieval quality (recall@k and MRR against the labelled page).
+
+    python -m benchmarks.bench_embeddings --providers hash local local-int8 google --pages 200
+
+"local" uses embedding_model.local from config.yaml; "local-int8" is the same model
+quantized. "google" needs GOOGLE_API_KEY and costs quota.
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.synthetic import page_texts, make_queries
+
+
+def load_provider(name: str):
+    from utils.config_loader import load_config
+    from utils.local_models import HashEmbeddings, LocalEmbeddings
+
+    config = load_config()["embedding_model"]
+    if name == "hash":
+        return HashEmbeddings(dim=config.get("hash", {}).get("dim", 384))
+    if name in ("local", "local-int8"):
+        local = dict(config.get("local", {}))
+        local["quantized"] = name == "local-int8"
+        return LocalEmbeddings(**local)
+    if name == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=config["model_name"])
+    raise ValueError(f"unknown provider {name}")
+
+
+def chunk_corpus(pages: int, chunk_size: int):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_size // 5)
+    texts, page_of = [], []
+    for page, text in enumerate(page_texts(pages), start=1):
+        for chunk in splitter.split_text(text):
+            texts.append(chunk)
+            page_of.append(page)
+    return texts, np.asarray(page_of)
+
+
+def measure(emb, texts, page_of, queries, k: int) -> dict:
+    t0 = time.perf_counter()
+    docs = np.asarray(emb.embed_documents(texts), dtype=np.float32)
+    embed_s = time.perf_counter() - t0
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True) + 1e-12
+
+    latencies, hits, rr = [], 0, 0.0
+    for question, page in queries:
+        t0 = time.perf_counter()
+        q = np.asarray(emb.embed_query(question), dtype=np.float32)
+        latencies.append(time.perf_counter() - t0)
+        ranked_pages = page_of[np.argsort(-(docs @ q))[:k]]
+        found = np.flatnonzero(ranked_pages == page)
+        if found.size:
+            hits += 1
+            rr += 1.0 / (found[0] + 1)
+    return {
+        "docs_per_s": len(texts) / embed_s,
+        "query_p50_ms": statistics.median(latencies) * 1000,
+        f"recall_at_{k}": hits / len(queries),
+        "mrr": rr / len(queries),
+        "dim": int(docs.shape[1]),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--providers", nargs="+", default=["hash", "local", "local-int8"])
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--chunk-size", type=int, default=1000)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    texts, page_of = chunk_corpus(args.pages, args.chunk_size)
+    queries = make_queries(args.pages, args.queries)
+    results = []
+    print(f"{len(texts)} chunks, {len(queries)} queries")
+    print(f"{'provider':>12} {'docs/s':>10} {'q p50 ms':>9} {'recall@' + str(args.k):>9} {'mrr':>6} {'dim':>5}")
+    for name in args.providers:
+        try:
+            emb = load_provider(name)
+        except Exception as e:  # missing optional dependency or API key
+            print(f"{name:>12} skipped: {e}")
+            continue
+        r = measure(emb, texts, page_of, queries, args.k)
+        results.append({"provider": name, **r})
+        print(f"{name:>12} {r['docs_per_s']:>10.1f} {r['query_p50_ms']:>9.2f} "
+              f"{r[f'recall_at_{args.k}']:>9.2f} {r['mrr']:>6.2f} {r['dim']:>5}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
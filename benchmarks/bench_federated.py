@@ -0,0 +1,126 @@
+"""
+Federated search over --shards session indexes of --chunks chunks each, against a
+plain sequential loop over the same shards and one combined index holding every
+chunk. Reports mean latency with warm shards (already in the index cache), the
+latency of the first query while shards are still cold (read from disk), and
+overlap@k with the combined index (1.0 = the federated merge is exact). With
+--mixed, every other shard is saved as int8 + pca:64, so the merge has to rank hits
+from shards whose raw distances are not comparable.
+Parallel fan-out only pays off with more than one core; on a single core,
+federated and sequential should match apart from thread hand-off overhead.
+
+    python -m benchmarks.bench_federated --shards 8 --chunks 10000 --k 10 [--mixed]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+def _measure(search: Callable, queries, repeat: int) -> float:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            search(q)
+        latencies.append((time.perf_counter() - t0) / repeat)
+    return statistics.mean(latencies) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--shards", type=int, default=8)
+    ap.add_argument("--chunks", type=int, default=10000, help="chunks per shard")
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--mixed", action="store_true", help="save every other shard as int8 + pca:64")
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_community.vectorstores import FAISS
+    from benchmarks.synthetic import ADJS, NOUNS, VERBS
+    from src.document_chat.federated import FederatedSearch
+    from src.document_chat.prefilter import embed_query
+    from src.document_chat.retrieval import open_index
+    from utils.index_cache import INDEX_CACHE
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import save_vectorstore
+
+    def text(shard: int, i: int) -> str:
+        words = [NOUNS[(i * 7 + shard) % len(NOUNS)], VERBS[(i * 3) % len(VERBS)], ADJS[(i + shard) % len(ADJS)]]
+        return f"Shard {shard} record {i}: the {words[2]} {words[0]} {words[1]} item {i % 97}."
+
+    embeddings = HashEmbeddings()
+    queries = [f"the {ADJS[i % len(ADJS)]} {NOUNS[i % len(NOUNS)]} item {i}" for i in range(args.queries)]
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        all_texts, all_meta = [], []
+        for s in range(args.shards):
+            texts = [text(s, i) for i in range(args.chunks)]
+            metas = [{"source": f"shard_{s:02d}.txt", "row_id": i} for i in range(args.chunks)]
+            compact = {"storage": "int8", "reduction": ("pca", 64)} if args.mixed and s % 2 else {}
+            save_vectorstore(
+                FAISS.from_texts(texts, embeddings, metadatas=metas), os.path.join(tmp, "faiss", f"session_{s:02d}"), **compact
+            )
+            all_texts += texts
+            all_meta += metas
+        combined = FAISS.from_texts(all_texts, embeddings, metadatas=all_meta)
+
+        fed = FederatedSearch(os.path.join(tmp, "faiss"), timeout_seconds=60, max_workers=args.shards)
+        shards = fed.resolve()[0]
+
+        def sequential(q):
+            hits = []
+            for d in shards.values():
+                vs = open_index(d, fed.model_loader)
+                hits += vs.similarity_search_with_score(q, k=args.k)
+            return sorted(hits, key=lambda h: h[1])[: args.k]
+
+        cold_ms = {}
+        for name, search in (("sequential", sequential), ("federated", lambda q: fed.search(q, k=args.k))):
+            for d in shards.values():
+                INDEX_CACHE.evict(d)
+            t0 = time.perf_counter()
+            search(queries[0])
+            cold_ms[name] = (time.perf_counter() - t0) * 1000
+
+        def key(doc):
+            return doc.metadata["source"], doc.metadata["row_id"]
+
+        overlap = []
+        for q in queries:
+            exact = {key(d) for d in combined.similarity_search_by_vector(embed_query(combined, q)[0].tolist(), k=args.k)}
+            got = {key(h.document) for h in fed.search(q, k=args.k).hits}
+            overlap.append(len(exact & got) / len(exact))
+
+        modes = {
+            "combined": lambda q: combined.similarity_search(q, k=args.k),
+            "sequential": sequential,
+            "federated": lambda q: fed.search(q, k=args.k),
+        }
+        mixed = ", every other shard int8 + pca:64" if args.mixed else ""
+        print(f"{args.shards} shards x {args.chunks} chunks{mixed}, k={args.k}, {os.cpu_count()} cpu(s)")
+        print(f"{'mode':>11} {'warm ms':>9} {'cold ms':>9}")
+        for name, search in modes.items():
+            r = {"mode": name, "latency_ms": _measure(search, queries, args.repeat), "cold_ms": cold_ms.get(name)}
+            results.append(r)
+            cold = f"{r['cold_ms']:>9.1f}" if r["cold_ms"] is not None else f"{'-':>9}"
+            print(f"{name:>11} {r['latency_ms']:>9.2f} {cold}")
+        print(f"federated overlap@{args.k} with the combined index: {statistics.mean(overlap):.3f}")
+        results.append({"mode": "federated", "overlap_at_k": statistics.mean(overlap)})
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
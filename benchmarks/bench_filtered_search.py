@@ -0,0 +1,88 @@
+"""
+Metadata-filtered search on the synthetic corpus, split across --files source
+files: LangChain's post-filter (search fetch_k, then drop non-matching chunks)
+against the pre-filter of src/document_chat/prefilter.py (chunk_meta lookup plus
+a FAISS ID selector). Each query is restricted to the file holding its page.
+Reports mean latency, chunks returned (out of k) and hit@k for the queried code.
+
+    python -m benchmarks.bench_filtered_search --files 20 --k 5 --fetch-k 20
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+def _measure(search: Callable, queries, k: int, repeat: int) -> Dict[str, float]:
+    latencies, returned, hits = [], 0, 0
+    for question, code, source in queries:
+        docs = search(question, source)
+        returned += len(docs)
+        hits += any(code in d.page_content for d in docs)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            search(question, source)
+        latencies.append((time.perf_counter() - t0) / repeat)
+    n = len(queries)
+    return {"latency_ms": statistics.mean(latencies) * 1000, "fill_rate": returned / (n * k), "hit_rate": hits / n}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=400)
+    ap.add_argument("--files", type=int, default=20)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--fetch-k", type=int, default=20, help="LangChain post-filter candidate pool")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from benchmarks.synthetic import make_queries, page_fact, page_texts
+    from src.document_chat.prefilter import PrefilteredRetriever
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import MetadataFilter, load_vectorstore, save_vectorstore
+
+    per_file = max(1, args.pages // args.files)
+    source_of = lambda page: f"/data/file_{(page - 1) // per_file:03d}.pdf"  # noqa: E731
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts = page_texts(args.pages)
+    metadatas = [{"source": source_of(p), "page": (p - 1) % per_file} for p in range(1, len(texts) + 1)]
+    chunks = splitter.create_documents(texts, metadatas=metadatas)
+    queries = [(q, page_fact(p)[0], source_of(p)) for q, p in make_queries(args.pages, args.queries)]
+
+    embeddings = HashEmbeddings()
+    with tempfile.TemporaryDirectory() as tmp:
+        save_vectorstore(FAISS.from_documents(chunks, embeddings), tmp)
+        vs = load_vectorstore(tmp, embeddings)
+        modes = {
+            "unfiltered": lambda q, s: vs.similarity_search(q, k=args.k),
+            "post_filter": lambda q, s: vs.similarity_search(q, k=args.k, filter={"source": s}, fetch_k=args.fetch_k),
+            "pre_filter": lambda q, s: PrefilteredRetriever(
+                vectorstore=vs, filter=MetadataFilter(sources=[s]), k=args.k
+            ).invoke(q),
+        }
+        print(f"{len(chunks)} chunks in {args.files} files, k={args.k}, post-filter fetch_k={args.fetch_k}")
+        print(f"{'mode':>12} {'latency ms':>11} {'fill rate':>10} {'hit rate':>9}")
+        results: List[Dict] = []
+        for name, search in modes.items():
+            r = {"mode": name, **_measure(search, queries, args.k, args.repeat)}
+            results.append(r)
+            print(f"{name:>12} {r['latency_ms']:>11.3f} {r['fill_rate']:>10.2f} {r['hit_rate']:>9.2f}")
+        vs.docstore.close()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Latency of appending a small batch to a large saved index: rewriting the whole
+index file (the behaviour before delta segments) vs appending to the delta
+segment of utils.vector_store, plus the cost of the background merge.
+
+    python -m benchmarks.bench_incremental_add --vectors 50000 200000 --add 10
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+DIM = 384
+
+
+def build(folder: Path, vectors: int) -> None:
+    from langchain_community.vectorstores import FAISS
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import save_vectorstore
+
+    emb = np.random.default_rng(0).random((vectors, DIM), dtype=np.float32)
+    texts = [f"chunk {i}" for i in range(vectors)]
+    save_vectorstore(FAISS.from_embeddings(zip(texts, emb.tolist()), HashEmbeddings(dim=DIM)), folder)
+
+
+def add_batch(folder: Path, n: int, full_rewrite: bool) -> float:
+    import faiss
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import index_lock, load_vectorstore, save_vectorstore
+
+    vectors = np.random.default_rng(1).random((n, DIM), dtype=np.float32)
+    t0 = time.perf_counter()
+    with index_lock(folder):
+        vs = load_vectorstore(folder, HashEmbeddings(dim=DIM), read_only=False, mmap=not full_rewrite)
+        vs.add_embeddings([(f"new {i}", v.tolist()) for i, v in enumerate(vectors)])
+        if full_rewrite:  # in-memory base, everything written back
+            base = vs.index.base
+            base.add(vs.index.delta.reconstruct_n(0, vs.index.delta.ntotal))
+            faiss.write_index(base, str(folder / "index.faiss.tmp"))
+        else:
+            save_vectorstore(vs, folder)
+    vs.docstore.close()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vectors", type=int, nargs="+", default=[50000, 200000])
+    ap.add_argument("--add", type=int, default=10, help="vectors appended per batch")
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    from utils.vector_store import merge_delta
+
+    results = []
+    print(f"{'vectors':>9} {'full rewrite ms':>16} {'delta append ms':>16} {'merge ms':>9}")
+    for size in args.vectors:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            build(folder, size)
+            full = add_batch(folder, args.add, full_rewrite=True)
+            delta = min(add_batch(folder, args.add, full_rewrite=False) for _ in range(3))
+            t0 = time.perf_counter()
+            merge_delta(folder)
+            merge = time.perf_counter() - t0
+        r = {"vectors": size, "full_rewrite_ms": full * 1000, "delta_append_ms": delta * 1000, "merge_ms": merge * 1000}
+        results.append(r)
+        print(f"{size:>9} {r['full_rewrite_ms']:>16.1f} {r['delta_append_ms']:>16.1f} {r['merge_ms']:>9.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Per-log-call cost under concurrency: synchronous file+console handlers (the old
+per-instance setup) vs the configure-once queue pipeline in logger.custom_logger.
+
+    python -m benchmarks.bench_logging --threads 1 4 16 --calls 20000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import structlog
+
+
+def sync_logger(log_path: str):
+    """Old behaviour: handlers write on the calling thread."""
+    std = logging.getLogger("bench.sync")
+    std.propagate = False
+    std.setLevel(logging.INFO)
+    for h in (logging.FileHandler(log_path), logging.StreamHandler(open(os.devnull, "w"))):
+        h.setFormatter(logging.Formatter("%(message)s"))
+        std.addHandler(h)
+    return structlog.wrap_logger(
+        std,
+        processors=[
+            structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
+            structlog.processors.add_log_level,
+            structlog.processors.EventRenamer(to="event"),
+            structlog.processors.JSONRenderer(),
+        ],
+    )
+
+
+def queued_logger():
+    from logger.custom_logger import CustomLogger
+    return CustomLogger().get_logger("bench_queued")
+
+
+def run(logger, threads: int, calls: int, level: str = "info") -> float:
+    per_thread = calls // threads
+    barrier = threading.Barrier(threads + 1)
+    log = getattr(logger, level)
+
+    def work():
+        barrier.wait()
+        for i in range(per_thread):
+            log("chunk embedded", session_id="bench", chunk=i, tokens=512)
+
+    ts = [threading.Thread(target=work) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in ts:
+        t.join()
+    return (time.perf_counter() - t0) / (per_thread * threads) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--calls", type=int, default=20000)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    sys.stderr = open(os.devnull, "w")  # keep console handlers from flooding the terminal
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        sync = sync_logger(str(Path(tmp) / "sync.log"))
+        queued = queued_logger()
+        results = []
+        print(f"{'threads':>7} {'sync us/call':>13} {'queued us/call':>15} {'filtered debug':>15}")
+        for n in args.threads:
+            s, q = run(sync, n, args.calls), run(queued, n, args.calls)
+            d = run(queued, n, args.calls, level="debug")
+            results.append({"threads": n, "sync_us_per_call": s, "queued_us_per_call": q, "filtered_us_per_call": d})
+            print(f"{n:>7} {s:>13.2f} {q:>15.2f} {d:>15.2f}")
+        logging.shutdown()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Cost and effect of MMR retrieval on the synthetic corpus: plain top-k similarity,
+LangChain's built-in MMR and the vectorised MMRRetriever of
+src/document_chat/mmr.py, at the same fetch_k. Reports mean latency, distinct
+pages among the k chunks (diversity) and hit@k for the queried reference code.
+
+    python -m benchmarks.bench_mmr --fetch-k 100 --k 5
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+def _measure(search: Callable, queries, repeat: int) -> Dict[str, float]:
+    latencies, pages, hits = [], 0, 0
+    for question, code in queries:
+        docs = search(question)
+        pages += len({d.metadata.get("page") for d in docs})
+        hits += any(code in d.page_content for d in docs)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            search(question)
+        latencies.append((time.perf_counter() - t0) / repeat)
+    n = len(queries)
+    return {"latency_ms": statistics.mean(latencies) * 1000, "distinct_pages": pages / n, "hit_rate": hits / n}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=300)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--fetch-k", type=int, default=100)
+    ap.add_argument("--lambda-mult", type=float, default=0.5)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from benchmarks.synthetic import make_queries, page_fact, page_texts
+    from src.document_chat.mmr import MMRRetriever
+    from utils.local_models import HashEmbeddings
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts = page_texts(args.pages)
+    chunks = splitter.create_documents(texts, metadatas=[{"page": p} for p in range(len(texts))])
+    vs = FAISS.from_documents(chunks, HashEmbeddings())
+    queries = [(q, page_fact(p)[0]) for q, p in make_queries(args.pages, args.queries)]
+    mmr = MMRRetriever(vectorstore=vs, k=args.k, fetch_k=args.fetch_k, lambda_mult=args.lambda_mult)
+
+    modes = {
+        "similarity": lambda q: vs.similarity_search(q, k=args.k),
+        "langchain_mmr": lambda q: vs.max_marginal_relevance_search(q, k=args.k, fetch_k=args.fetch_k, lambda_mult=args.lambda_mult),
+        "vectorised_mmr": lambda q: mmr.invoke(q),
+    }
+    print(f"{len(chunks)} chunks, k={args.k}, fetch_k={args.fetch_k}, lambda={args.lambda_mult}")
+    print(f"{'mode':>15} {'latency ms':>11} {'distinct pages':>15} {'hit rate':>9}")
+    results: List[Dict] = []
+    for name, search in modes.items():
+        r = {"mode": name, **_measure(search, queries, args.repeat)}
+        results.append(r)
+        print(f"{name:>15} {r['latency_ms']:>11.3f} {r['distinct_pages']:>15.2f} {r['hit_rate']:>9.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Pages/second of PDF text extraction, sequential vs process-parallel, against page count.
+
+    python -m benchmarks.bench_pdf_extraction --pages 100 500 2000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from utils.pdf_pages import iter_pdf_pages, PDF_WORKERS
+
+LOREM = (
+    "Attention mechanisms allow modeling of dependencies without regard to their distance "
+    "in the input or output sequences. "
+)
+
+
+def make_pdf(path: Path, pages: int, lines_per_page: int = 40) -> Path:
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        text = "\n".join(f"[{p + 1}:{i}] {LOREM}" for i in range(lines_per_page))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=7)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def measure(pdf_path: Path, workers: int, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        n = sum(1 for _ in iter_pdf_pages(str(pdf_path), workers=workers))
+        best = min(best, time.perf_counter() - t0)
+    return n / best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, nargs="+", default=[50, 200, 1000, 2000])
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    # warm the process pool so spawn cost is not charged to the first size
+    with tempfile.TemporaryDirectory() as tmp:
+        warm = make_pdf(Path(tmp) / "warm.pdf", 128)
+        list(iter_pdf_pages(str(warm)))
+
+        results = []
+        print(f"{'pages':>7} {'seq p/s':>10} {'par p/s':>10} {'speedup':>8}   (workers={PDF_WORKERS})")
+        for n in args.pages:
+            pdf = make_pdf(Path(tmp) / f"doc_{n}.pdf", n)
+            seq = measure(pdf, workers=1, repeats=args.repeats)
+            par = measure(pdf, workers=PDF_WORKERS, repeats=args.repeats)
+            results.append({"pages": n, "sequential_pps": seq, "parallel_pps": par, "workers": PDF_WORKERS})
+            print(f"{n:>7} {seq:>10.0f} {par:>10.0f} {par / seq:>7.2f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency/accuracy tradeoff of the reranking stage on the synthetic corpus: plain
+top-k retrieval vs over-fetching `fetch_k` candidates and keeping the reranker's
+best `top_n`. Accuracy is hit@n (the chunk carrying the queried reference code is
+returned); context is the characters that would reach the QA prompt.
+
+    python -m benchmarks.bench_rerank                                   # offline stand-in scorer
+    python -m benchmarks.bench_rerank --reranker cross_encoder --embeddings local
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def _retrieval_stats(vs, queries, k: int) -> Dict[str, float]:
+    hits, chars, latencies = 0, 0, []
+    for question, code in queries:
+        t0 = time.perf_counter()
+        docs = vs.similarity_search(question, k=k)
+        latencies.append(time.perf_counter() - t0)
+        hits += any(code in d.page_content for d in docs)
+        chars += sum(len(d.page_content) for d in docs)
+    n = len(queries)
+    return {"hit_rate": hits / n, "context_chars": chars / n, "latency_ms": statistics.mean(latencies) * 1000}
+
+
+def _rerank_stats(vs, reranker, queries, fetch_k: int, top_n: int) -> Dict[str, float]:
+    out = {}
+    for label in ("cold", "cached"):  # second pass is served from the score cache
+        hits, chars, latencies = 0, 0, []
+        for question, code in queries:
+            t0 = time.perf_counter()
+            docs = reranker.rerank(question, vs.similarity_search(question, k=fetch_k), top_n=top_n)
+            latencies.append(time.perf_counter() - t0)
+            hits += any(code in d.page_content for d in docs)
+            chars += sum(len(d.page_content) for d in docs)
+        out[f"latency_{label}_ms"] = statistics.mean(latencies) * 1000
+    n = len(queries)
+    out.update({"hit_rate": hits / n, "context_chars": chars / n})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--top-n", type=int, default=5)
+    ap.add_argument("--fetch-k", type=int, nargs="+", default=[10, 20, 50])
+    ap.add_argument("--reranker", default="hash", help="RERANKER_PROVIDER: hash | cross_encoder")
+    ap.add_argument("--embeddings", default="hash", help="EMBEDDING_PROVIDER: hash | local | google")
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ["EMBEDDING_PROVIDER"] = args.embeddings
+    os.environ["RERANKER_PROVIDER"] = args.reranker
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from benchmarks.synthetic import make_queries, page_fact, page_texts
+    from utils.model_loader import ModelLoader
+
+    loader = ModelLoader()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks = splitter.create_documents(page_texts(args.pages))
+    vs = FAISS.from_documents(chunks, loader.load_embeddings())
+    reranker = loader.load_reranker()
+    queries = [(q, page_fact(p)[0]) for q, p in make_queries(args.pages, args.queries)]
+    print(f"{len(chunks)} chunks, {len(queries)} queries, reranker={args.reranker}, embeddings={args.embeddings}")
+
+    results: List[Dict] = []
+    print(f"{'mode':>18} {'hit rate':>9} {'context chars':>14} {'latency ms':>11} {'cached ms':>10}")
+    for k in sorted({args.top_n, *args.fetch_k}):
+        r = {"mode": f"top-{k}", **_retrieval_stats(vs, queries, k)}
+        results.append(r)
+        print(f"{r['mode']:>18} {r['hit_rate']:>9.2f} {r['context_chars']:>14.0f} {r['latency_ms']:>11.2f} {'':>10}")
+    for fetch_k in args.fetch_k:
+        r = {"mode": f"rerank {fetch_k}->{args.top_n}", **_rerank_stats(vs, reranker, queries, fetch_k, args.top_n)}
+        results.append(r)
+        print(f"{r['mode']:>18} {r['hit_rate']:>9.2f} {r['context_chars']:>14.0f} {r['latency_cold_ms']:>11.2f} {r['latency_cached_ms']:>10.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
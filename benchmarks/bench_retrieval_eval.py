@@ -0,0 +1,77 @@
+"""
+Retrieval evaluation sweep (src/document_chat/evaluation.py): recall@k, MRR, build
+time, index size and query latency for every combination of chunk size, chunk
+overlap, index variant and retrieval mode, written as a markdown comparison report.
+
+Runs on --dataset (a labelled question -> relevant-passage JSON file), or on the
+synthetic corpus when none is given. Embeddings default to the local CPU model
+(embedding_model.local; needs sentence-transformers and the model in the local
+cache), so no API is called; --embeddings hash needs no model at all.
+
+    python -m benchmarks.bench_retrieval_eval --chunk-sizes 300,600,1000 --overlaps 0,150 \
+        --indexes float32,int8,int8+rescore,pca:128 --modes similarity,mmr --report eval.md
+"""
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _names(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dataset", type=str, default=None, help="labelled JSON set (default: synthetic corpus)")
+    ap.add_argument("--pages", type=int, default=60, help="synthetic corpus pages")
+    ap.add_argument("--questions", type=int, default=40, help="synthetic questions")
+    ap.add_argument("--embeddings", choices=("local", "hash"), default="local")
+    ap.add_argument("--chunk-sizes", type=_ints, default=[500, 1000])
+    ap.add_argument("--overlaps", type=_ints, default=[0, 200])
+    ap.add_argument("--indexes", type=_names, default=["float32", "int8+rescore"])
+    ap.add_argument("--modes", type=_names, default=["similarity", "mmr"])
+    ap.add_argument("--ks", type=_ints, default=[1, 3, 5, 10])
+    ap.add_argument("--min-overlap", type=float, default=0.5, help="share of a passage a chunk must hold")
+    ap.add_argument("--report", type=str, default=None, help="write the markdown report to this file")
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ["EMBEDDING_PROVIDER"] = args.embeddings
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.synthetic import make_corpus_pdf, make_labeled_queries
+    from src.document_chat.evaluation import EvalDataset, LabeledQuestion, RetrievalEvaluator, format_report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        if args.dataset:
+            dataset = EvalDataset.load(args.dataset)
+        else:
+            pdf = work / "corpus.pdf"
+            make_corpus_pdf(pdf, args.pages)
+            dataset = EvalDataset(
+                documents=[pdf],
+                questions=[LabeledQuestion(q, [p]) for q, p in make_labeled_queries(args.pages, args.questions)],
+            )
+        evaluator = RetrievalEvaluator(dataset, work / "eval", ks=args.ks, min_overlap=args.min_overlap)
+        results = evaluator.run(args.chunk_sizes, args.overlaps, args.indexes, args.modes)
+
+    report = format_report(results, args.ks)
+    print(f"{len(dataset.questions)} questions over {len(dataset.documents)} document(s), {args.embeddings} embeddings")
+    print(report)
+    if args.report:
+        Path(args.report).write_text(report, encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps([r.as_dict() for r in results], indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
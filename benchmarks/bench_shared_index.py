@@ -0,0 +1,99 @@
+"""
+Memory of N worker processes serving the same session index: private loads
+(read_only=False) vs the memory-mapped read-only mode of utils.vector_store.
+
+Reports per-worker RSS and the summed PSS (proportional set size, which splits
+shared page-cache pages between the processes mapping them), so the sum is
+the real memory the workers cost together. Linux only (/proc/<pid>/smaps_rollup).
+
+    python -m benchmarks.bench_shared_index --workers 4 --vectors 200000 --dim 768
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+def _memory_kb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def _worker(folder: str, read_only: bool, dim: int, ready, done):
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import load_vectorstore
+
+    vs = load_vectorstore(Path(folder), HashEmbeddings(dim=dim), read_only=read_only)
+    rng = np.random.default_rng(0)
+    for _ in range(20):  # touch the whole index, as a brute-force search does
+        vs.similarity_search_with_score_by_vector(rng.random(dim, dtype=np.float32).tolist(), k=5)
+    ready.put(_memory_kb())
+    done.wait()
+
+
+def build_index(folder: Path, vectors: int, dim: int, text_bytes: int) -> None:
+    from langchain_community.vectorstores import FAISS
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import save_vectorstore
+
+    rng = np.random.default_rng(0)
+    emb = rng.random((vectors, dim), dtype=np.float32)
+    texts = [f"chunk {i} " + "x" * text_bytes for i in range(vectors)]
+    vs = FAISS.from_embeddings(zip(texts, emb.tolist()), HashEmbeddings(dim=dim), metadatas=[{"row": i} for i in range(vectors)])
+    save_vectorstore(vs, folder)
+
+
+def measure(folder: Path, workers: int, read_only: bool, dim: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    ready, done = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(str(folder), read_only, dim, ready, done)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    stats = [ready.get() for _ in procs]  # all workers alive and loaded at the same time
+    done.set()
+    for p in procs:
+        p.join()
+    return {
+        "mode": "mmap" if read_only else "private",
+        "workers": workers,
+        "rss_mb_per_worker": sum(s["Rss"] for s in stats) / workers / 1024,
+        "pss_mb_total": sum(s["Pss"] for s in stats) / 1024,
+        "private_mb_total": sum(s["Private_Clean"] + s["Private_Dirty"] for s in stats) / 1024,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--vectors", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--text-bytes", type=int, default=800, help="chunk text size per vector")
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        build_index(folder, args.vectors, args.dim, args.text_bytes)
+        index_mb = (folder / "index.faiss").stat().st_size / 2 ** 20
+        print(f"index.faiss {index_mb:.0f} MB, {args.workers} workers")
+        print(f"{'mode':>8} {'RSS/worker MB':>14} {'PSS total MB':>13} {'private MB':>11}")
+        results = []
+        for read_only in (False, True):
+            r = measure(folder, args.workers, read_only, args.dim)
+            results.append(r)
+            print(f"{r['mode']:>8} {r['rss_mb_per_worker']:>14.0f} {r['pss_mb_total']:>13.0f} {r['private_mb_total']:>11.0f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
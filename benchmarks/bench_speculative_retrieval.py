@@ -0,0 +1,112 @@
+"""
+Speculative retrieval against the sequential rewrite -> retrieve chain, over
+conversations that mix standalone questions (the rewrite leaves them as they are)
+with follow-ups that refer back ("what does it say about that?"), which the
+rewrite expands with the previous question. The fake LLM and the hash embeddings
+sleep --llm-latency-ms / --embed-latency-ms per call to stand in for hosted models.
+
+Reported per mode: mean and p95 answer latency, speculation hit rate, mean latency
+saved per request (from ConversationalRAG.last_speculation), and the share of
+answers identical to the sequential chain's.
+
+    python -m benchmarks.bench_speculative_retrieval --turns 40 --follow-up-share 0.3
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+def _conversation(questions: List[str], turns: int, follow_up_share: float) -> List[str]:
+    """`turns` questions, about `follow_up_share` of them follow-ups to the one before."""
+    out, follow_ups, qi = [], 0, 0
+    for t in range(turns):
+        if t and follow_ups < follow_up_share * (t + 1):
+            out.append("What else does it say about that?")
+            follow_ups += 1
+        else:
+            out.append(questions[qi % len(questions)])
+            qi += 1
+    return out
+
+
+def _chat(index_dir: str, turns: List[str], k: int, speculative: bool) -> Dict:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.document_chat.retrieval import ConversationalRAG
+
+    rag = ConversationalRAG(session_id="bench", speculative=speculative)
+    rag.load_retriever_from_faiss(index_dir, k=k)
+    history, latencies, answers, hits, saved = [], [], [], 0, []
+    for question in turns:
+        t0 = time.perf_counter()
+        answer = rag.invoke(question, chat_history=history)
+        latencies.append(time.perf_counter() - t0)
+        answers.append(answer)
+        if rag.last_speculation is not None:
+            hits += rag.last_speculation.hit
+            saved.append(rag.last_speculation.saved_seconds)
+        history = (history + [HumanMessage(content=question), AIMessage(content=answer)])[-4:]
+    latencies.sort()
+    return {
+        "latency_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "hit_rate": hits / len(turns) if speculative else None,
+        "saved_ms": statistics.mean(saved) * 1000 if saved else None,
+        "answers": answers,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--turns", type=int, default=40)
+    ap.add_argument("--follow-up-share", type=float, default=0.3)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--llm-latency-ms", type=float, default=150.0)
+    ap.add_argument("--embed-latency-ms", type=float, default=60.0)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "2000")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.run_suite import bench_ingest
+    from benchmarks.synthetic import make_corpus_pdf, make_queries
+
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        pdf = work / "corpus.pdf"
+        make_corpus_pdf(pdf, args.pages)
+        _, index_dir = bench_ingest(work, pdf, args.pages)
+        # embedding latency applies to queries only, so ingest stays fast
+        os.environ["HASH_EMBEDDING_LATENCY_MS"] = str(args.embed_latency_ms)
+        turns = _conversation([q for q, _ in make_queries(args.pages, args.turns)], args.turns, args.follow_up_share)
+
+        print(f"{args.turns} turns, {args.follow_up_share:.0%} follow-ups, k={args.k}, "
+              f"llm {args.llm_latency_ms:.0f} ms, embeddings {args.embed_latency_ms:.0f} ms")
+        print(f"{'mode':>12} {'mean ms':>8} {'p95 ms':>8} {'hit rate':>9} {'saved ms':>9} {'same answer':>12}")
+        sequential = None
+        for name, speculative in (("sequential", False), ("speculative", True)):
+            r = _chat(index_dir, turns, args.k, speculative)
+            answers = r.pop("answers")
+            sequential = sequential or answers
+            r = {"mode": name, **r, "same_answer": statistics.mean(a == b for a, b in zip(answers, sequential))}
+            results.append(r)
+            hit = f"{r['hit_rate']:>9.2f}" if r["hit_rate"] is not None else f"{'-':>9}"
+            saved = f"{r['saved_ms']:>9.1f}" if r["saved_ms"] is not None else f"{'-':>9}"
+            print(f"{name:>12} {r['latency_ms']:>8.1f} {r['p95_ms']:>8.1f} {hit} {saved} {r['same_answer']:>12.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compact vector storage for session indexes: float32 (IndexFlat) against float16
+and int8 scalar quantization, each with and without exact float32 re-scoring of
+FAISS_RESCORE_FACTOR x k candidates. Vectors are clustered, unit-norm and
+--dim-dimensional (768 = text-embedding-004). Every mode is saved with
+save_vectorstore and loaded back with load_vectorstore.
+
+Reported per mode:
+- index RAM: the compact codes held in memory (the .f32 file used for
+  re-scoring is memory-mapped, and only candidate rows are read)
+- disk: every index file
+- mean query latency
+- recall@k against exact float32 search
+
+    python -m benchmarks.bench_vector_storage --vectors 50000 --dim 768 --k 10
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+def _clustered(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vectors", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--rescore-factor", type=int, default=4)
+    ap.add_argument("--json", type=str, default=None, help="write results to this file")
+    args = ap.parse_args()
+
+    os.environ.setdefault("EMBEDDING_PROVIDER", "hash")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from utils.local_models import HashEmbeddings
+    from utils.vector_store import RescoredIndex, SegmentedIndex, load_vectorstore, save_vectorstore
+
+    rng = np.random.default_rng(0)
+    x = _clustered(args.vectors, args.dim, args.clusters, rng)
+    q = x[rng.integers(0, args.vectors, args.queries)] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(x)
+    _, truth = exact.search(q, args.k)
+    del exact
+
+    ids = [str(i) for i in range(args.vectors)]
+    docs = {i: Document(page_content=f"chunk {i}") for i in ids}
+
+    def base_of(index):
+        index = index.base if isinstance(index, SegmentedIndex) else index
+        return index.base if isinstance(index, RescoredIndex) else index
+
+    results: List[Dict] = []
+    print(f"{args.vectors} vectors x {args.dim} dims, k={args.k}, rescore factor {args.rescore_factor}")
+    print(f"{'mode':>16} {'index RAM MB':>13} {'disk MB':>8} {'latency ms':>11} {'recall@k':>9}")
+    for storage in ("float32", "float16", "int8"):
+        for rescore in ((False,) if storage == "float32" else (False, True)):
+            with tempfile.TemporaryDirectory() as tmp:
+                flat = faiss.IndexFlatL2(args.dim)
+                flat.add(x)
+                vs = FAISS(HashEmbeddings(), flat, InMemoryDocstore(dict(docs)), dict(enumerate(ids)))
+                save_vectorstore(vs, tmp, storage=storage, rescore=rescore)
+                vs.docstore.close()
+                del vs, flat
+                disk = sum(f.stat().st_size for f in Path(tmp).iterdir() if f.suffix in (".faiss", ".f32"))
+                store = load_vectorstore(tmp, HashEmbeddings(), mmap=False, rescore_factor=args.rescore_factor)
+                base = base_of(store.index)
+                ram = base.code_size * base.ntotal
+                latencies, found = [], []
+                for row in q:
+                    t0 = time.perf_counter()
+                    _, got = store.index.search(row[None, :], args.k)
+                    latencies.append(time.perf_counter() - t0)
+                    found.append(got[0])
+                recall = statistics.mean(len(set(g) & set(t)) / args.k for g, t in zip(found, truth))
+                store.docstore.close()
+            name = storage + (" + rescore" if rescore else "")
+            r = {"mode": name, "index_ram_mb": ram / 1e6, "disk_mb": disk / 1e6,
+                 "latency_ms": statistics.mean(latencies) * 1000, "recall_at_k": recall}
+            results.append(r)
+            print(f"{name:>16} {r['index_ram_mb']:>13.1f} {r['disk_mb']:>8.1f} {r['latency_ms']:>11.2f} {r['recall_at_k']:>9.3f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Offline end-to-end benchmark suite: ingest, query, analyze and compare on synthetic
+PDFs with the fake LLM and hash embeddings, so it needs no API keys or network.
+
+    python -m benchmarks.run_suite                       # run, write results, check baseline
+    python -m benchmarks.run_suite --scale 4             # 4x larger corpus
+    python -m benchmarks.run_suite --update-baseline     # accept current numbers
+
+Results are written as flat JSON to benchmarks/results/latest.json. Metrics ending
+in `_per_s` are higher-is-better, everything else is a latency (lower is better);
+any metric worse than the baseline by more than --tolerance exits with status 1.
+The suite runs --repeats times and each metric is the median across runs, so
+one slow run on a busy machine does not fail the check (or skew a new baseline).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+HERE = Path(__file__).resolve().parent
+BASELINE_PATH = HERE / "baseline.json"
+RESULTS_PATH = HERE / "results" / "latest.json"
+
+
+def _offline_env(latency_ms: float, tokens_per_second: float) -> None:
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["EMBEDDING_PROVIDER"] = "hash"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(latency_ms)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+class _Upload:
+    """Minimal stand-in for an uploaded file (name + getbuffer), as the API adapters provide."""
+
+    def __init__(self, path: Path):
+        self.name = path.name
+        self._path = path
+
+    def getbuffer(self) -> bytes:
+        return self._path.read_bytes()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def bench_ingest(work: Path, pdf: Path, pages: int) -> Tuple[Dict[str, float], str]:
+    from src.document_ingestion.data_ingestion import ChatIngestor
+
+    ingestor = ChatIngestor(temp_base=str(work / "data"), faiss_base=str(work / "faiss"), session_id="bench")
+    t0 = time.perf_counter()
+    retriever = ingestor.built_retriver([_Upload(pdf)])
+    elapsed = time.perf_counter() - t0
+    chunks = retriever.vectorstore.index.ntotal
+    return {
+        "ingest_seconds": elapsed,
+        "ingest_pages_per_s": pages / elapsed,
+        "ingest_chunks_per_s": chunks / elapsed,
+    }, str(ingestor.faiss_dir)
+
+
+def bench_query(index_dir: str, pages: int, queries: int) -> Dict[str, float]:
+    from src.document_chat.retrieval import ConversationalRAG
+    from benchmarks.synthetic import make_queries
+
+    rag = ConversationalRAG(session_id="bench")
+    rag.load_retriever_from_faiss(index_dir, k=5)
+    latencies = []
+    for question, _ in make_queries(pages, queries):
+        t0 = time.perf_counter()
+        rag.invoke(question, chat_history=[])
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "query_p50_seconds": statistics.median(latencies),
+        "query_p99_seconds": _percentile(latencies, 0.99),
+    }
+
+
+def bench_analyze(pdf: Path) -> Dict[str, float]:
+    from src.document_analyzer.data_analysis import DocumentAnalyzer
+
+    analyzer = DocumentAnalyzer()
+    t0 = time.perf_counter()
+    analyzer.analyze_pdf_with_usage(str(pdf))
+    return {"analyze_seconds": time.perf_counter() - t0}
+
+
+def bench_compare(work: Path, reference: Path, actual: Path, window_pages: int) -> Dict[str, float]:
+    from src.document_ingestion.data_ingestion import DocumentComparator
+    from src.document_compare.document_comparator import DocumentComparatorLLM
+
+    comparator = DocumentComparator(base_dir=str(work / "compare"), session_id="bench")
+    llm = DocumentComparatorLLM()
+
+    async def run():
+        first, rows = None, 0
+        t0 = time.perf_counter()
+        async for event in llm.astream_compare(comparator.iter_page_windows(reference, actual, window_pages)):
+            if event.get("type") == "row":
+                rows += 1
+                if first is None:
+                    first = time.perf_counter() - t0
+        return first or 0.0, time.perf_counter() - t0
+
+    first, total = asyncio.run(run())
+    return {"compare_first_row_seconds": first, "compare_total_seconds": total}
+
+
+def run_suite(pages: int, queries: int, window_pages: int) -> Dict[str, float]:
+    from benchmarks.synthetic import make_corpus_pdf
+
+    results: Dict[str, float] = {"pages": pages}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        pdf = work / "corpus.pdf"
+        make_corpus_pdf(pdf, pages, seed=0)
+        revised = work / "corpus_revised.pdf"
+        make_corpus_pdf(revised, pages, seed=1)
+
+        # one untimed pass so lazily imported loaders/splitters are not charged to the first run
+        warm = work / "warm.pdf"
+        make_corpus_pdf(warm, 2, seed=2)
+        bench_ingest(work / "warm", warm, 2)
+
+        ingest, index_dir = bench_ingest(work, pdf, pages)
+        results.update(ingest)
+        results.update(bench_query(index_dir, pages, queries))
+        results.update(bench_analyze(pdf))
+        results.update(bench_compare(work, pdf, revised, window_pages))
+    return results
+
+
+def regressions(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    failed = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if name == "pages" or current is None or not base:
+            continue
+        if name.endswith("_per_s"):
+            worse = current < base * (1 - tolerance)
+        else:
+            worse = current > base * (1 + tolerance)
+        if worse:
+            failed.append(f"{name}: {current:.4g} vs baseline {base:.4g}")
+    return failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=40, help="corpus pages at scale 1")
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--window-pages", type=int, default=10)
+    ap.add_argument("--llm-latency-ms", type=float, default=20.0)
+    ap.add_argument("--llm-tokens-per-second", type=float, default=5000.0)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    ap.add_argument("--repeats", type=int, default=3, help="runs; each metric is the median across them")
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+
+    _offline_env(args.llm_latency_ms, args.llm_tokens_per_second)
+    sys.path.insert(0, str(HERE.parent))
+
+    runs = [run_suite(args.pages * args.scale, args.queries, args.window_pages) for _ in range(max(1, args.repeats))]
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(results, indent=2, sort_keys=True), encoding="utf-8")
+    for name, value in sorted(results.items()):
+        print(f"{name:>28} {value:12.4f}")
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"baseline updated: {BASELINE_PATH}")
+        return
+    if not BASELINE_PATH.exists():
+        print("no baseline; run with --update-baseline to create one")
+        return
+    baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    if baseline.get("pages") != results["pages"]:
+        print(f"baseline was recorded at {baseline.get('pages')} pages; skipping comparison")
+        return
+    failed = regressions(results, baseline, args.tolerance)
+    if failed:
+        print("REGRESSIONS:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+    print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Deterministic synthetic PDFs and labelled queries for offline benchmarks.
+
+Every page carries filler prose plus one unique "reference code" fact, so a query
+about that code has exactly one relevant page.
+"""
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+NOUNS = ["contract", "invoice", "encoder", "decoder", "warranty", "pipeline", "ledger", "policy",
+         "shipment", "reactor", "turbine", "dataset", "budget", "license", "sensor", "archive"]
+VERBS = ["governs", "summarises", "records", "limits", "describes", "extends", "replaces", "audits"]
+ADJS = ["quarterly", "regional", "optional", "encrypted", "historic", "standard", "revised", "internal"]
+FILLER = ("The committee reviewed the material in detail and agreed on the next steps for the "
+          "programme, noting open questions for the following meeting.")
+
+
+def page_fact(page: int, seed: int = 0) -> Tuple[str, str]:
+    """(reference code, fact sentence) for a 1-based page."""
+    rng = random.Random(seed * 1_000_003 + page)
+    code = f"RC{page:05d}"
+    noun, verb, adj, obj = rng.choice(NOUNS), rng.choice(VERBS), rng.choice(ADJS), rng.choice(NOUNS)
+    return code, f"Reference code {code} {verb} the {adj} {noun} for the {obj} programme."
+
+
+def page_texts(pages: int, seed: int = 0, lines_per_page: int = 30) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for p in range(1, pages + 1):
+        lines = [f"{FILLER} ({rng.choice(ADJS)} {rng.choice(NOUNS)})" for _ in range(lines_per_page)]
+        lines.insert(rng.randrange(len(lines) + 1), page_fact(p, seed)[1])
+        out.append("\n".join(lines))
+    return out
+
+
+def make_corpus_pdf(path: Path, pages: int, seed: int = 0, lines_per_page: int = 30) -> List[str]:
+    """Write the synthetic corpus to `path` and return the page texts."""
+    texts = page_texts(pages, seed, lines_per_page)
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=7)
+    doc.save(str(path))
+    doc.close()
+    return texts
+
+
+def make_queries(pages: int, n: int, seed: int = 0) -> List[Tuple[str, int]]:
+    """(question, relevant 1-based page) for `n` pages spread evenly over the corpus."""
+    step = max(1, pages // max(n, 1))
+    chosen = list(range(1, pages + 1, step))[:n]
+    return [(f"What does reference code {page_fact(p, seed)[0]} cover?", p) for p in chosen]
+
+
+def make_labeled_queries(pages: int, n: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """make_queries with the relevant passage (the page's fact sentence) instead of its page."""
+    return [(question, page_fact(page, seed)[1]) for question, page in make_queries(pages, n, seed)]
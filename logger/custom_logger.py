@@ -1,78 +1,122 @@
 import os
+import atexit
+import queue
+import random
 import logging
+import logging.handlers
+import threading
 from datetime import datetime
-import struct
 import structlog
 
-class CustomLogger:
-    def __init__(self, log_dir="logs"):
-        # ensure logs dir exist
-        self.logs_dir = os.path.join(os.getcwd(), log_dir)
-        os.makedirs(self.logs_dir, exist_ok=True)
+# Process-wide settings (env): LOG_LEVEL, LOG_DIR and LOG_SAMPLE_RATES such as
+# "debug=0.01,info=0.5" to keep only a fraction of high-volume hot-path events.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
 
-        # create time-stamped log file
-        log_file = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
-        self.log_file_path = os.path.join(self.logs_dir, log_file)
+_configure_lock = threading.Lock()
+_log_file_path = None
+_listener = None
 
-        #configure logging
-        # logging.basicConfig(
-        #     filename=log_file_path,
-        #     format="[%(asctime)s] %(levelname)s %(name)s (line:%(lineno)d) - %(message)s",
-        #     level=logging.INFO
-        # )
-    def get_logger(self,name=__file__):
-        """
-        Returns a logger instance with file + console handlers.
-        Default name is the current file name (without path).
-        """
-        # return logging.getLogger(os.path.basename(name))
-        logger_name = os.path.basename(name)
-        # logger = logging.getLogger(logger_name)
-        # logger.setLevel(logging.INFO)
 
-        #format for both handlers
-        # file_formatter = logging.Formatter(
-        #     "[ %(asctime)s ] %(levelname)s %(name)s (line:%(lineno)d) - %(message)s"
-        # )
-        # console_formatter = logging.Formatter(
-        #     "[ %(levelname)s ] %(message)s"
-        # )
+def _parse_sample_rates(spec: str) -> dict:
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        level, _, rate = part.partition("=")
+        rates[level.strip().lower()] = float(rate)
+    return rates
+
+
+def _make_sampler(rates: dict):
+    def sample_by_level(logger, method_name, event_dict):
+        rate = rates.get(method_name)
+        if rate is not None and random.random() >= rate:
+            raise structlog.DropEvent
+        return event_dict
+    return sample_by_level
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler without the per-record copy; structlog has already rendered the message."""
+    def prepare(self, record):
+        if record.exc_info or record.stack_info:
+            return super().prepare(record)
+        if record.args:
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+
+def _configure_once(logs_dir: str) -> str:
+    """
+    Configure stdlib logging + structlog exactly once per process.
+
+    Log calls only render JSON and enqueue it; a QueueListener thread does the
+    file/console I/O. Below-level calls are no-ops via a filtering bound logger.
+    """
+    global _log_file_path, _listener
+    if _log_file_path is not None:
+        return _log_file_path
+    with _configure_lock:
+        if _log_file_path is not None:
+            return _log_file_path
+
+        log_file = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}_{os.getpid()}.log"
+        log_file_path = os.path.join(logs_dir, log_file)
 
         # File handler - logs saved to file
-        file_handler = logging.FileHandler(self.log_file_path)
-        file_handler.setLevel(logging.INFO)
+        file_handler = logging.FileHandler(log_file_path)
         file_handler.setFormatter(logging.Formatter("%(message)s"))
 
         # Console handler - logs printed on console or terminal
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(logging.Formatter("%(message)s"))
 
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(message)s", # structlog will handle the JSON rendering
-            handlers=[file_handler,console_handler]
-        )
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+        _listener.start()
+        atexit.register(_listener.stop)  # drains the queue on shutdown
+
+        root = logging.getLogger()
+        root.handlers = [_PreparedQueueHandler(log_queue)]
+        root.setLevel(LOG_LEVEL)
+
+        processors = [
+            structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
+            structlog.processors.add_log_level,
+            structlog.processors.EventRenamer(to="event"),
+            structlog.processors.JSONRenderer(),
+        ]
+        rates = _parse_sample_rates(LOG_SAMPLE_RATES)
+        if rates:
+            processors.insert(0, _make_sampler(rates))
 
         structlog.configure(
-            processors=[
-                structlog.processors.TimeStamper(fmt="iso",utc=True,key="timestamp"),
-                structlog.processors.add_log_level,
-                structlog.processors.EventRenamer(to="event"),
-                structlog.processors.JSONRenderer()
-            ],
+            processors=processors,
+            wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(LOG_LEVEL)),
             logger_factory=structlog.stdlib.LoggerFactory(),
             cache_logger_on_first_use=True,
         )
+        _log_file_path = log_file_path
+        return _log_file_path
 
 
+class CustomLogger:
+    def __init__(self, log_dir=os.getenv("LOG_DIR", "logs")):
+        # ensure logs dir exist
+        self.logs_dir = os.path.join(os.getcwd(), log_dir)
+        os.makedirs(self.logs_dir, exist_ok=True)
+
+        # one time-stamped log file and one handler set per process, however many instances
+        self.log_file_path = _configure_once(self.logs_dir)
 
-        
+    def get_logger(self,name=__file__):
+        """
+        Returns a logger instance; output goes to the shared file + console handlers.
+        Default name is the current file name (without path).
+        """
+        logger_name = os.path.basename(name)
         return structlog.get_logger(logger_name)
 
 if __name__ == "__main__":
     logger = CustomLogger()
     logger = logger.get_logger(__file__)
     logger.info("Custom logger initialized")
-
-
@@ -14,6 +14,11 @@ class Metadata(BaseModel):
     PageCount: Union[int, str]
     SentimentTone: str
 
+class SemanticMetadata(BaseModel):
+    Summary: List[str]
+    Language: str
+    SentimentTone: str
+
 class ChangeFormat(BaseModel):
     Page: str
     Changes: str
@@ -23,8 +28,10 @@ class SummaryResponse(RootModel[list[ChangeFormat]]):
 
 class PromptType(str,Enum):
     DOCUMENT_ANALYSIS = "document_analysis"
+    DOCUMENT_SEMANTIC_ANALYSIS = "document_semantic_analysis"
     DOCUMENT_COMPARISON = "document_comparison"
     CONTEXTUALIZE_QUESTION = "contextualize_question"
     CONTEXT_QA = "context_qa"
+    CONVERSATION_SUMMARY = "conversation_summary"
 
 
@@ -13,6 +13,20 @@ Analyse this document:
 """
 )
 
+# Semantic fields only; structural metadata is read from the PDF itself
+document_semantic_analysis_prompt = ChatPromptTemplate.from_template(
+    """
+You are a highly capable assistant trained to analyze and summarize documents.
+The text below is a sample of pages from a longer document.
+Return only valid JSON matching the exact schema below.
+
+{format_instructions}
+
+Analyse this document sample:
+{document_text}
+"""
+)
+
 document_comparison_prompt = ChatPromptTemplate.from_template(
     """
 You will be provided with content from two PDFs. Your tasks are as follows:
@@ -54,9 +68,21 @@ context_qa_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+# Prompt for folding older chat turns into a rolling summary
+conversation_summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", (
+        "Progressively summarize the conversation, adding the new lines to the existing summary. Keep the "
+        "facts, names, numbers and documents the user may refer back to. Use at most {max_words} words and "
+        "return only the summary."
+    )),
+    ("human", "Existing summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}"),
+])
+
 PROMPT_REGISTRY = {
     "document_analysis": document_analysis_prompt,
+    "document_semantic_analysis": document_semantic_analysis_prompt,
     "document_comparison": document_comparison_prompt,
     "contextualize_question": contextualize_question_prompt,
     "context_qa": context_qa_prompt,
+    "conversation_summary": conversation_summary_prompt,
 }
@@ -0,0 +1,134 @@
+import os
+import json
+import asyncio
+import multiprocessing
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+from src.document_analyzer.data_analysis import DocumentAnalyzer
+from src.document_analyzer.pdf_metadata import prepare_pdf
+from utils.config_loader import load_config
+from utils.rate_limit import AsyncRateLimiter
+
+
+def list_pdfs(directory: Path) -> List[Path]:
+    return sorted(p for p in Path(directory).rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+
+
+class BatchDocumentAnalyzer:
+    """
+    Analyze many PDFs with one shared DocumentAnalyzer.
+
+    PDFs go through the metadata pre-pass in a process pool, LLM calls run under a concurrency cap and a
+    requests-per-minute limit, and every result is appended to a JSONL file as soon
+    as it is ready. Re-running against the same output file skips PDFs that already
+    have a successful line, so a crashed run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        analyzer: Optional[DocumentAnalyzer] = None,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        parse_workers: Optional[int] = None,
+    ):
+        try:
+            self.log = CustomLogger().get_logger(__name__)
+            cfg = load_config().get("batch_analysis", {})
+            self.analyzer = analyzer or DocumentAnalyzer()
+            self.max_concurrency = int(max_concurrency or cfg.get("max_concurrency", 4))
+            self.requests_per_minute = float(
+                requests_per_minute if requests_per_minute is not None else cfg.get("requests_per_minute", 0)
+            )
+            self.parse_workers = int(parse_workers or cfg.get("parse_workers", os.cpu_count() or 1))
+            self.output_dir = Path(cfg.get("output_dir", "data/batch_analysis"))
+            self.progress: Dict[str, int] = {"total": 0, "done": 0, "failed": 0, "skipped": 0}
+            self.log.info(
+                "BatchDocumentAnalyzer initialized",
+                max_concurrency=self.max_concurrency,
+                requests_per_minute=self.requests_per_minute,
+                parse_workers=self.parse_workers,
+            )
+        except Exception as e:
+            raise DocumentPortalException("Initialization error in BatchDocumentAnalyzer", e) from e
+
+    @staticmethod
+    def _completed(output_path: Path) -> Set[str]:
+        """Files that already have a successful result line (a torn last line is ignored)."""
+        done: Set[str] = set()
+        if not output_path.exists():
+            return done
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec.get("status") == "ok":
+                    done.add(rec["file"])
+        return done
+
+    async def run(self, pdf_paths: Iterable[Path], output_path: Path) -> Dict[str, int]:
+        try:
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            paths = [str(Path(p).resolve()) for p in pdf_paths]
+            done = await asyncio.to_thread(self._completed, output_path)
+            todo = [p for p in paths if p not in done]
+            self.progress.update(total=len(paths), done=0, failed=0, skipped=len(paths) - len(todo))
+            self.log.info("Batch analysis started", total=len(paths), resumed_skip=len(paths) - len(todo), output=str(output_path))
+
+            loop = asyncio.get_running_loop()
+            llm_slots = asyncio.Semaphore(self.max_concurrency)
+            # bound prepared-but-not-analyzed samples held in memory
+            in_flight = asyncio.Semaphore(self.max_concurrency + self.parse_workers)
+            limiter = AsyncRateLimiter(self.requests_per_minute)
+            write_lock = asyncio.Lock()
+
+            pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                with open(output_path, "a", encoding="utf-8") as out:
+
+                    def append(line: str):
+                        out.write(line)
+                        out.flush()
+                        os.fsync(out.fileno())
+
+                    async def write(record: Dict[str, Any]):
+                        # the fsync'd append runs off the event loop; the lock keeps lines whole and in order
+                        async with write_lock:
+                            await asyncio.to_thread(append, json.dumps(record, ensure_ascii=False) + "\n")
+
+                    async def analyze_one(path: str):
+                        async with in_flight:
+                            record: Dict[str, Any] = {"file": path}
+                            try:
+                                fields, sample = await loop.run_in_executor(
+                                    pool, prepare_pdf, path, self.analyzer.sample_chars
+                                )
+                                async with llm_slots:
+                                    await limiter.acquire()
+                                    result, usage = await self.analyzer.aanalyze_prepared_with_usage(fields, sample)
+                                record.update(status="ok", result=result, usage=usage.as_dict())
+                                self.progress["done"] += 1
+                            except Exception as e:
+                                self.log.error("Batch item failed", file=path, error=str(e))
+                                record.update(status="error", error=str(e))
+                                self.progress["failed"] += 1
+                            record["finished_at"] = datetime.now(timezone.utc).isoformat()
+                            await write(record)
+
+                    await asyncio.gather(*(analyze_one(p) for p in todo))
+            finally:
+                # waiting for the spawn workers to exit would stall every other request on the loop
+                await asyncio.to_thread(pool.shutdown, wait=True)
+
+            self.log.info("Batch analysis finished", output=str(output_path), **self.progress)
+            return dict(self.progress)
+        except Exception as e:
+            self.log.error("Batch analysis failed", error=str(e))
+            raise DocumentPortalException("Batch analysis failed", e) from e
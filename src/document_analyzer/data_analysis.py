@@ -1,12 +1,17 @@
 import os
 import sys
+from typing import Tuple
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 from model.models import *
 from langchain_core.output_parsers import JsonOutputParser
-from langchain.output_parsers import OutputFixingParser
 from prompt.prompt_library import PROMPT_REGISTRY # type: ignore
+from utils.token_budget import TokenUsage, CHARS_PER_TOKEN
+from src.document_analyzer.pdf_metadata import prepare_pdf
+from utils.metrics import stage_timer, record_usage
+
+_TIMERS = {s: stage_timer("analyzer", s) for s in ("prepass", "generate", "parse")}
 
 class DocumentAnalyzer:
     """
@@ -18,12 +23,22 @@ class DocumentAnalyzer:
         try:
             self.loader=ModelLoader()
             self.llm=self.loader.load_llm()
+            self.budget=self.loader.load_token_budget()
+            self.last_usage = self.budget.usage()
             
-            # Prepare parsers
+            # Prepare parsers (langchain.output_parsers is slow to import; load it with the analyzer)
+            from langchain.output_parsers import OutputFixingParser
             self.parser = JsonOutputParser(pydantic_object=Metadata)
             self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
             
             self.prompt = PROMPT_REGISTRY["document_analysis"]
+
+            # Semantic-only analysis for PDFs whose structural fields come from the file
+            self.semantic_parser = JsonOutputParser(pydantic_object=SemanticMetadata)
+            self.semantic_fixing_parser = OutputFixingParser.from_llm(parser=self.semantic_parser, llm=self.llm)
+            self.semantic_prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_SEMANTIC_ANALYSIS.value]
+            sample_tokens = self.loader.config.get("document_analysis", {}).get("sample_tokens", 4000)
+            self.sample_chars = int(sample_tokens) * CHARS_PER_TOKEN
             
             self.log.info("DocumentAnalyzer initialized successfully")
             
@@ -38,22 +53,93 @@ class DocumentAnalyzer:
         """
         Analyze a document's text and extract structured metadata & summary.
         """
+        response, self.last_usage = self.analyze_with_usage(document_text)
+        return response
+
+    def analyze_with_usage(self, document_text: str) -> Tuple[dict, TokenUsage]:
+        """
+        Same as analyze_document but returns the token usage instead of storing it,
+        so one analyzer can be shared across concurrent requests.
+        """
         try:
-            chain = self.prompt | self.llm | self.fixing_parser
-            
-            self.log.info("Meta-data analysis chain initialized")
+            prompt_value, usage = self._build_prompt(self.prompt, self.parser, document_text)
+            with _TIMERS["generate"].time():
+                raw = self.llm.invoke(prompt_value)
+            return self._parse_response(self.fixing_parser, raw, usage), usage
+        except Exception as e:
+            self.log.error("Metadata analysis failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed",sys)
 
-            response = chain.invoke({
-                "format_instructions": self.parser.get_format_instructions(),
-                "document_text": document_text
-            })
+    async def aanalyze_with_usage(self, document_text: str) -> Tuple[dict, TokenUsage]:
+        """
+        Async variant of analyze_with_usage (used by batch analysis).
+        """
+        try:
+            prompt_value, usage = self._build_prompt(self.prompt, self.parser, document_text)
+            with _TIMERS["generate"].time():
+                raw = await self.llm.ainvoke(prompt_value)
+            return self._parse_response(self.fixing_parser, raw, usage), usage
+        except Exception as e:
+            self.log.error("Metadata analysis failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed", e) from e
 
-            self.log.info("Metadata extraction successful", keys=list(response.keys()))
-            
-            return response
+    def analyze_pdf_with_usage(self, pdf_path: str) -> Tuple[dict, TokenUsage]:
+        """
+        Fill Title/Author/dates/PageCount/Publisher from the PDF itself and ask the LLM
+        only for Summary/Language/SentimentTone over a reduced page sample.
+        """
+        try:
+            with _TIMERS["prepass"].time():
+                fields, sample = prepare_pdf(pdf_path, self.sample_chars)
+        except Exception as e:
+            self.log.error("PDF metadata pre-pass failed", error=str(e), pdf_path=pdf_path)
+            raise DocumentPortalException(f"Could not read PDF metadata: {pdf_path}", e) from e
+        return self.analyze_prepared_with_usage(fields, sample)
 
+    def analyze_prepared_with_usage(self, fields: dict, sample_text: str) -> Tuple[dict, TokenUsage]:
+        try:
+            prompt_value, usage = self._build_prompt(self.semantic_prompt, self.semantic_parser, sample_text)
+            with _TIMERS["generate"].time():
+                raw = self.llm.invoke(prompt_value)
+            return self._merge(fields, self._parse_response(self.semantic_fixing_parser, raw, usage)), usage
         except Exception as e:
-            self.log.error("Metadata analysis failed", error=str(e))
-            raise DocumentPortalException("Metadata extraction failed",sys)
-        
-    
\ No newline at end of file
+            self.log.error("Semantic analysis failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed", e) from e
+
+    async def aanalyze_prepared_with_usage(self, fields: dict, sample_text: str) -> Tuple[dict, TokenUsage]:
+        try:
+            prompt_value, usage = self._build_prompt(self.semantic_prompt, self.semantic_parser, sample_text)
+            with _TIMERS["generate"].time():
+                raw = await self.llm.ainvoke(prompt_value)
+            return self._merge(fields, self._parse_response(self.semantic_fixing_parser, raw, usage)), usage
+        except Exception as e:
+            self.log.error("Semantic analysis failed", error=str(e))
+            raise DocumentPortalException("Metadata extraction failed", e) from e
+
+    @staticmethod
+    def _merge(fields: dict, semantic: dict) -> dict:
+        """Combine both halves in Metadata field order."""
+        merged = {**fields, **{k: semantic.get(k) for k in SemanticMetadata.model_fields}}
+        return {k: merged.get(k) for k in Metadata.model_fields}
+
+    def _build_prompt(self, prompt, parser, document_text: str):
+        inputs = self.budget.fit_prompt_variable(
+            prompt,
+            {
+                "format_instructions": parser.get_format_instructions(),
+                "document_text": document_text,
+            },
+            "document_text",
+        )
+        prompt_value = prompt.format_prompt(**inputs)
+        usage = self.budget.usage(prompt_tokens=self.budget.count_prompt(prompt_value))
+        self.log.info("Meta-data analysis chain initialized", prompt_tokens=usage.prompt_tokens)
+        return prompt_value, usage
+
+    def _parse_response(self, parser, raw, usage: TokenUsage) -> dict:
+        usage.add(completion_tokens=self.budget.count_output(raw))
+        record_usage("analyzer", usage)
+        with _TIMERS["parse"].time():
+            response = parser.parse(getattr(raw, "content", raw))
+        self.log.info("Metadata extraction successful", keys=list(response.keys()), **usage.as_dict())
+        return response
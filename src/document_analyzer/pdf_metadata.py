@@ -0,0 +1,96 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+
+NOT_AVAILABLE = "Not Available"
+_PDF_DATE = re.compile(r"D?:?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?([Zz+\-])?(\d{2})?'?(\d{2})?")
+_XMP_PUBLISHER = re.compile(r"<dc:publisher>.*?<rdf:li[^>]*>(.*?)</rdf:li>", re.DOTALL)
+_AUTHOR_SPLIT = re.compile(r"\s*(?:;|&|\band\b)\s*")
+
+
+def parse_pdf_date(value: str) -> str:
+    """'D:20170101120000+05'30'' -> '2017-01-01T12:00:00+05:30'; unparseable -> Not Available."""
+    m = _PDF_DATE.match((value or "").strip())
+    if not m:
+        return NOT_AVAILABLE
+    y, mo, d, h, mi, s, tz, tzh, tzm = m.groups()
+    try:
+        dt = datetime(int(y), int(mo or 1), int(d or 1), int(h or 0), int(mi or 0), int(s or 0))
+    except ValueError:
+        return NOT_AVAILABLE
+    if tz in ("Z", "z"):
+        dt = dt.replace(tzinfo=timezone.utc)
+    elif tz in ("+", "-") and tzh:
+        offset = timedelta(hours=int(tzh), minutes=int(tzm or 0))
+        dt = dt.replace(tzinfo=timezone(offset if tz == "+" else -offset))
+    return dt.isoformat()
+
+
+def _authors(value: str) -> List[str]:
+    """Split on ';', '&' and 'and'. A part with one comma is 'Last, First'; more commas separate names."""
+    out: List[str] = []
+    for part in _AUTHOR_SPLIT.split(value or ""):
+        names = [part] if part.count(",") <= 1 else part.split(",")
+        out.extend(n.strip().strip(",").strip() for n in names)
+    return [a for a in out if a]
+
+
+def _first_line(text: str) -> str:
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return ""
+
+
+def _sample_order(n_pages: int) -> List[int]:
+    """Opening pages first, then pages spread evenly through the rest, then the remainder."""
+    head = list(range(min(3, n_pages)))
+    rest = list(range(len(head), n_pages))
+    spread = rest[:: max(1, len(rest) // 8)]
+    seen = set(spread)
+    return head + spread + [i for i in rest if i not in seen]
+
+
+def sample_text(doc, max_chars: int) -> Dict[int, str]:
+    """
+    Extract only the pages needed for a ~`max_chars` sample for the semantic LLM call,
+    stopping at the first page that would overflow it.
+    """
+    chosen: Dict[int, str] = {}
+    used = 0
+    for i in _sample_order(doc.page_count):
+        text = doc.load_page(i).get_text()  # type: ignore
+        if used + len(text) > max_chars:
+            if chosen:
+                break
+            text = text[:max_chars]
+        chosen[i] = text
+        used += len(text)
+    return chosen
+
+
+def prepare_pdf(pdf_path: str, max_sample_chars: int) -> Tuple[Dict[str, Any], str]:
+    """
+    Deterministic pre-pass: read the structural Metadata fields from the PDF info
+    dictionary / XMP packet and build a reduced text sample for the LLM.
+    Top-level and picklable so batch analysis can run it in a process pool.
+    """
+    import fitz  # PyMuPDF; imported on first use to keep API startup light
+    with fitz.open(pdf_path) as doc:
+        info = doc.metadata or {}
+        pages = sample_text(doc, max_sample_chars)
+        xmp = doc.get_xml_metadata() or ""
+        page_count = doc.page_count
+
+    publisher = _XMP_PUBLISHER.search(xmp)
+    fields = {
+        "Title": (info.get("title") or "").strip() or _first_line(pages.get(0, "")) or NOT_AVAILABLE,
+        "Author": _authors(info.get("author", "")),
+        "DateCreated": parse_pdf_date(info.get("creationDate", "")),
+        "LastModifiedDate": parse_pdf_date(info.get("modDate", "")),
+        "Publisher": publisher.group(1).strip() if publisher else NOT_AVAILABLE,
+        "PageCount": page_count,
+    }
+    sample = "\n".join(f"\n--- Page {i + 1} ---\n{pages[i]}" for i in sorted(pages))
+    return fields, sample
@@ -0,0 +1,125 @@
+"""
+Adaptive top-k over a FAISS store. Instead of a fixed k, one search over-fetches
+`max_k` candidates (among those matching `filter`, if set), scores them by cosine
+similarity to the query in the space FAISS searched (reduced dimensions under
+truncate/PCA, stored precision), and cuts the list, in FAISS order, where either holds:
+
+- the score drops by more than `max_gap` from one candidate to the next, or
+- a score falls below `min_relative` x the best score.
+
+The cut is never before `min_k`. Questions with one clearly relevant chunk
+then send few chunks to the LLM, and broad questions whose scores decay slowly
+get up to `max_k`.
+
+The retriever keeps no per-query state. It returns `AdaptiveDocuments`, a list
+carrying the cutoff that chose them: k, the reason, and the context tokens against
+the fixed `baseline_k` it replaces. ConversationalRAG records the cutoff of the
+documents it finally uses, once per question (after speculation settles), so the
+token totals in metrics give the aggregate saving as fixed_k - adaptive.
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from src.document_chat.mmr import _unit
+from src.document_chat.prefilter import documents_at, embed_query, nearest_positions
+from utils.vector_store import MetadataFilter, searched_query, searched_vectors
+
+
+def adaptive_cutoff(
+    scores: Sequence[float], min_k: int, max_k: int, max_gap: float, min_relative: float
+) -> Tuple[int, str]:
+    """(k, reason) for best-first `scores`: reason is gap, relative, max_k or exhausted."""
+    n = min(len(scores), max_k)
+    if n <= min_k:
+        return n, "exhausted" if n < max_k else "max_k"
+    top = scores[0]
+    for i in range(max(min_k, 1), n):
+        if scores[i - 1] - scores[i] > max_gap:
+            return i, "gap"
+        if top > 0 and scores[i] < top * min_relative:
+            return i, "relative"
+    return n, "max_k" if n == max_k else "exhausted"
+
+
+@dataclass
+class AdaptiveCutoff:
+    k: int
+    fetched: int
+    reason: str
+    top_score: float
+    last_score: float         # score of the last chunk kept
+    tokens: int               # context tokens of the kept chunks (0 without a counter)
+    baseline_tokens: int      # context tokens of the first baseline_k chunks
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), tokens_saved=self.tokens_saved)
+
+
+class AdaptiveDocuments(list):
+    """The documents an AdaptiveRetriever kept, with the `cutoff` that chose them."""
+
+    def __init__(self, docs: Sequence[Document], cutoff: AdaptiveCutoff):
+        super().__init__(docs)
+        self.cutoff = cutoff
+
+
+class AdaptiveRetriever(BaseRetriever):
+    """Retriever returning between `min_k` and `max_k` chunks, cut by `adaptive_cutoff`."""
+
+    vectorstore: FAISS
+    min_k: int = 2
+    max_k: int = 12
+    max_gap: float = 0.1
+    min_relative: float = 0.8
+    baseline_k: int = 5
+    filter: Optional[MetadataFilter] = None
+    count: Optional[Callable[[str], int]] = None  # token counter for the savings report
+
+    @classmethod
+    def from_config(cls, vectorstore: FAISS, config: Dict[str, Any], **kwargs) -> "AdaptiveRetriever":
+        """retriever.adaptive settings from config, overridden by non-None `kwargs`."""
+        cfg = config.get("retriever", {}).get("adaptive", {})
+        merged = {
+            "min_k": cfg.get("min_k", 2),
+            "max_k": cfg.get("max_k", 12),
+            "max_gap": cfg.get("max_gap", 0.1),
+            "min_relative": cfg.get("min_relative", 0.8),
+            **{n: v for n, v in kwargs.items() if v is not None},
+        }
+        merged["max_k"] = max(merged["max_k"], merged["min_k"])
+        return cls(vectorstore=vectorstore, **merged)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_by_vector(embed_query(self.vectorstore, query))
+
+    def search_by_vector(self, q: np.ndarray) -> AdaptiveDocuments:
+        """Results for a query embedded as `q` (a `query_vector` batch)."""
+        vs = self.vectorstore
+        ids = nearest_positions(vs, q, max(self.max_k, self.baseline_k), self.filter)
+        if len(ids) == 0:
+            return AdaptiveDocuments([], AdaptiveCutoff(0, 0, "exhausted", 0.0, 0.0, 0, 0))
+        scores = _unit(searched_vectors(vs.index, ids)) @ _unit(searched_query(vs.index, q)[0])
+        fetched = min(len(ids), self.max_k)
+        k, reason = adaptive_cutoff(scores[:fetched].tolist(), self.min_k, self.max_k, self.max_gap, self.min_relative)
+        docs = documents_at(vs, ids[: max(k, self.baseline_k)])
+        count = self.count or (lambda text: 0)
+        cutoff = AdaptiveCutoff(
+            k=k,
+            fetched=fetched,
+            reason=reason,
+            top_score=float(scores[0]),
+            last_score=float(scores[k - 1]) if k else 0.0,
+            tokens=sum(count(d.page_content) for d in docs[:k]),
+            baseline_tokens=sum(count(d.page_content) for d in docs[: self.baseline_k]),
+        )
+        return AdaptiveDocuments(docs[:k], cutoff)
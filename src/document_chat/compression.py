@@ -0,0 +1,131 @@
+"""
+Extractive contextual compression for ConversationalRAG: retrieved chunks are
+split into sentences, every sentence is scored against the question embedding in
+one matrix product, and only the best-scoring sentences that fit `max_tokens` go
+into the QA prompt. Each kept chunk is its selected sentences in original order.
+
+Sentence embeddings are cached per process (by text hash), so chunks that come
+back for later questions are not re-embedded; only the question is embedded per call.
+"""
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.metrics import CONTEXT_TOKENS, record_cache
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}|\n(?=\s*[-*•]|\s*\d+[.)]\s)")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+@dataclass
+class CompressionStats:
+    tokens_in: int = 0
+    tokens_out: int = 0
+    sentences_in: int = 0
+    sentences_out: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Kept share of the retrieved context tokens (1.0 = nothing removed)."""
+        return self.tokens_out / self.tokens_in if self.tokens_in else 1.0
+
+
+class ExtractiveCompressor:
+    def __init__(
+        self,
+        embeddings,
+        max_tokens: int = 800,
+        min_similarity: Optional[float] = None,
+        cache_size: int = 20000,
+    ):
+        self.embeddings = embeddings
+        self.max_tokens = int(max_tokens)
+        self.min_similarity = min_similarity
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed_sentences(self, sentences: Sequence[str]) -> np.ndarray:
+        keys = [hashlib.sha1(s.encode("utf-8")).digest() for s in sentences]
+        vectors: List[Optional[np.ndarray]] = [None] * len(sentences)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._cache.get(key)
+                if vec is not None:
+                    self._cache.move_to_end(key)
+                    vectors[i] = vec
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        for v in vectors:
+            record_cache("sentence_embedding", v is not None)
+        if missing:
+            embedded = np.asarray(self.embeddings.embed_documents([sentences[i] for i in missing]), dtype=np.float32)
+            with self._lock:
+                for i, vec in zip(missing, embedded):
+                    vectors[i] = vec
+                    if self.cache_size:
+                        self._cache[keys[i]] = vec
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.vstack(vectors)
+
+    def compress(
+        self,
+        query: str,
+        docs: Sequence[Document],
+        max_tokens: Optional[int] = None,
+        count: Callable[[str], int] = _estimate_tokens,
+    ) -> Tuple[List[Document], CompressionStats]:
+        """
+        Keep the sentences most similar to `query` within `max_tokens` (as measured by
+        `count`, e.g. TokenBudget.count); docs keep rank order.
+        """
+        stats = CompressionStats()
+        sentences, owner = [], []
+        for d_idx, doc in enumerate(docs):
+            parts = split_sentences(doc.page_content)
+            sentences.extend(parts)
+            owner.extend([d_idx] * len(parts))
+            stats.tokens_in += count(doc.page_content)
+        stats.sentences_in = len(sentences)
+        if not sentences:
+            return list(docs), stats
+
+        vectors = self._embed_sentences(sentences)
+        q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(q) or 1.0)
+        scores = (vectors @ q) / np.where(norms == 0, 1, norms)
+
+        order = np.argsort(-scores, kind="stable")
+        if self.min_similarity is not None:
+            order = order[scores[order] >= self.min_similarity]
+        tokens = np.array([count(sentences[i]) for i in order], dtype=np.int64)
+        fits = np.cumsum(tokens) <= (max_tokens or self.max_tokens)
+        fits[:1] = True  # always keep the best sentence
+        keep = np.zeros(len(sentences), dtype=bool)
+        keep[order[fits]] = True
+
+        owner_arr = np.asarray(owner)
+        out: List[Document] = []
+        for d_idx, doc in enumerate(docs):
+            idx = np.flatnonzero(keep & (owner_arr == d_idx))
+            if len(idx):
+                text = " ".join(sentences[i] for i in idx)
+                out.append(Document(page_content=text, metadata=doc.metadata, id=getattr(doc, "id", None)))
+                stats.tokens_out += count(text)
+        stats.sentences_out = int(keep.sum())
+        CONTEXT_TOKENS.labels("retrieved").inc(stats.tokens_in)
+        CONTEXT_TOKENS.labels("compressed").inc(stats.tokens_out)
+        return out, stats
@@ -0,0 +1,319 @@
+"""
+Offline retrieval evaluation over a labelled question -> relevant-passage set.
+
+Each split setting (chunk_size x chunk_overlap) is ingested once through
+ChatIngestor. Every index variant ("float32", "int8+rescore", "pca:128",
+"float16+truncate:256", ...) is then rebuilt from those vectors with
+save_vectorstore, without embedding again. Each retrieval mode (similarity, mmr,
+rerank) is scored on it:
+
+- recall@k: share of a question's relevant passages found in the top k chunks
+- MRR: 1 / rank of the first relevant chunk (0 when none is in the top max(k))
+- ingest seconds (parse, split, embed, write), variant build seconds, index MB
+- mean and p95 query latency, query embedding included
+
+A chunk counts as relevant to a passage when they share a run of text covering at
+least `min_overlap` of the passage (whitespace and case ignored), so passages cut
+by a chunk boundary still count for the chunk holding most of them.
+
+Dataset file (JSON; document paths relative to the file):
+    {"documents": ["a.pdf", ...],
+     "questions": [{"question": "...", "relevant": ["passage", ...]}, ...]}
+"""
+import json
+import re
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from logger.custom_logger import CustomLogger
+from src.document_chat.mmr import MMRRetriever
+from src.document_ingestion.data_ingestion import ChatIngestor
+from utils.model_loader import ModelLoader
+from utils.vector_store import STORAGE_MODES, exact_vectors, load_vectorstore, parse_reduction, save_vectorstore
+
+log = CustomLogger().get_logger(__name__)
+
+MODES = ("similarity", "mmr", "rerank")
+_SPACE = re.compile(r"\s+")
+
+
+@dataclass
+class LabeledQuestion:
+    question: str
+    relevant: List[str]
+
+
+@dataclass
+class EvalDataset:
+    documents: List[Path]
+    questions: List[LabeledQuestion]
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "EvalDataset":
+        path = Path(path)
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            documents=[(path.parent / d).resolve() for d in raw["documents"]],
+            questions=[LabeledQuestion(q["question"], list(q["relevant"])) for q in raw["questions"]],
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        raw = {
+            "documents": [str(Path(d).resolve()) for d in self.documents],
+            "questions": [asdict(q) for q in self.questions],
+        }
+        path.write_text(json.dumps(raw, indent=2), encoding="utf-8")
+
+
+@dataclass
+class IndexSpec:
+    """An index variant: storage mode, float32 re-scoring and dimensionality reduction."""
+
+    storage: str = "float32"
+    rescore: bool = False
+    reduction: Optional[Tuple[str, int]] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "IndexSpec":
+        """From "+"-joined parts, e.g. "int8+rescore+pca:128"; "float32" is the plain flat index."""
+        out = cls()
+        for part in filter(None, (p.strip().lower() for p in spec.split("+"))):
+            if part in STORAGE_MODES:
+                out.storage = part
+            elif part == "rescore":
+                out.rescore = True
+            else:
+                out.reduction = parse_reduction(part)
+        return out
+
+    @property
+    def name(self) -> str:
+        parts = [] if self.storage == "float32" and self.reduction else [self.storage]
+        if self.rescore:
+            parts.append("rescore")
+        if self.reduction:
+            parts.append(f"{self.reduction[0]}:{self.reduction[1]}")
+        return "+".join(parts)
+
+    @property
+    def is_plain(self) -> bool:
+        return self.storage == "float32" and not self.rescore and not self.reduction
+
+
+@dataclass
+class EvalResult:
+    chunk_size: int
+    chunk_overlap: int
+    index: str
+    mode: str
+    chunks: int
+    ingest_seconds: float
+    index_seconds: float
+    index_mb: float
+    latency_ms: float
+    p95_ms: float
+    mrr: float
+    recall: Dict[int, float] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out.update({f"recall@{k}": v for k, v in out.pop("recall").items()})
+        return out
+
+
+def _norm(text: str) -> str:
+    return _SPACE.sub(" ", text).strip().casefold()
+
+
+def is_relevant(chunk: str, passage: str, min_overlap: float = 0.5) -> bool:
+    """Whether `chunk` holds at least `min_overlap` of `passage` as one contiguous run."""
+    chunk, passage = _norm(chunk), _norm(passage)
+    if not passage:
+        return False
+    if passage in chunk:
+        return True
+    match = SequenceMatcher(None, passage, chunk, autojunk=False).find_longest_match(0, len(passage), 0, len(chunk))
+    return match.size >= min_overlap * len(passage)
+
+
+def score(ranked: Sequence[str], passages: Sequence[str], ks: Sequence[int], min_overlap: float = 0.5) -> Tuple[Dict[int, float], float]:
+    """({k: recall@k}, reciprocal rank) of one question's ranked chunk texts."""
+    found_at = [
+        next((rank for rank, chunk in enumerate(ranked, 1) if is_relevant(chunk, p, min_overlap)), None)
+        for p in passages
+    ]
+    recall = {k: sum(r is not None and r <= k for r in found_at) / max(len(passages), 1) for k in ks}
+    first = min((r for r in found_at if r is not None), default=None)
+    return recall, 1.0 / first if first else 0.0
+
+
+def _index_bytes(folder: Path) -> int:
+    return sum(f.stat().st_size for f in folder.iterdir() if f.suffix in (".faiss", ".f32"))
+
+
+class RetrievalEvaluator:
+    """Sweeps split settings, index variants and retrieval modes over one dataset in `work_dir`."""
+
+    def __init__(
+        self,
+        dataset: EvalDataset,
+        work_dir: Union[str, Path],
+        ks: Sequence[int] = (1, 3, 5, 10),
+        min_overlap: float = 0.5,
+        model_loader: Optional[ModelLoader] = None,
+    ):
+        self.dataset = dataset
+        self.work_dir = Path(work_dir)
+        self.ks = sorted(set(int(k) for k in ks))
+        self.min_overlap = float(min_overlap)
+        self.model_loader = model_loader or ModelLoader()
+        self.embeddings = self.model_loader.load_embeddings()
+
+    def run(
+        self,
+        chunk_sizes: Sequence[int] = (500, 1000),
+        chunk_overlaps: Sequence[int] = (0, 200),
+        indexes: Sequence[str] = ("float32",),
+        modes: Sequence[str] = ("similarity", "mmr"),
+    ) -> List[EvalResult]:
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown retrieval modes {sorted(unknown)}; expected some of {MODES}")
+        if "rerank" in modes and self.model_loader.load_reranker() is None:
+            raise ValueError("rerank mode needs a reranker: set reranker.provider or RERANKER_PROVIDER")
+        specs = [IndexSpec.parse(s) for s in indexes]
+        results: List[EvalResult] = []
+        for size in chunk_sizes:
+            for overlap in chunk_overlaps:
+                if overlap >= size:
+                    log.warning("Skipping split with overlap >= chunk size", chunk_size=size, chunk_overlap=overlap)
+                    continue
+                index_dir, ingest_s = self._ingest(size, overlap)
+                for spec in specs:
+                    folder, index_s = self._build_variant(index_dir, spec)
+                    vs = load_vectorstore(folder, self.embeddings)
+                    try:
+                        for mode in modes:
+                            latencies, recall, mrr = self._evaluate(vs, mode)
+                            latencies.sort()
+                            results.append(EvalResult(
+                                chunk_size=size,
+                                chunk_overlap=overlap,
+                                index=spec.name,
+                                mode=mode,
+                                chunks=vs.index.ntotal,
+                                ingest_seconds=ingest_s,
+                                index_seconds=index_s,
+                                index_mb=_index_bytes(folder) / 1e6,
+                                latency_ms=statistics.mean(latencies) * 1000,
+                                p95_ms=latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+                                mrr=mrr,
+                                recall=recall,
+                            ))
+                            log.info("Retrieval evaluated", **results[-1].as_dict())
+                    finally:
+                        vs.docstore.close()
+        return results
+
+    def _ingest(self, chunk_size: int, chunk_overlap: int) -> Tuple[Path, float]:
+        ingestor = ChatIngestor(
+            temp_base=str(self.work_dir / "data"),
+            faiss_base=str(self.work_dir / "faiss"),
+            session_id=f"split_{chunk_size}_{chunk_overlap}",
+        )
+        files = [open(p, "rb") for p in self.dataset.documents]
+        try:
+            t0 = time.perf_counter()
+            ingestor.built_retriver(files, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+            return ingestor.faiss_dir, time.perf_counter() - t0
+        finally:
+            for f in files:
+                f.close()
+
+    def _build_variant(self, index_dir: Path, spec: IndexSpec) -> Tuple[Path, float]:
+        """
+        The index at `index_dir` rewritten as `spec`. For plain float32 the index is used
+        as ingested, i.e. as fais_db in config builds it.
+        """
+        import faiss
+
+        if spec.is_plain:
+            return index_dir, 0.0
+        folder = index_dir.parent / f"{index_dir.name}__{spec.name.replace(':', '_')}"
+        source = load_vectorstore(index_dir, self.embeddings, mmap=False)
+        try:
+            ids = [source.index_to_docstore_id[i] for i in range(source.index.ntotal)]
+            docs = {i: source.docstore.search(i) for i in ids}
+            t0 = time.perf_counter()
+            flat = faiss.IndexFlat(source.index.d, source.index.metric_type)
+            flat.add(exact_vectors(source.index))
+            vs = FAISS(
+                self.embeddings, flat, InMemoryDocstore(docs), dict(enumerate(ids)),
+                normalize_L2=source._normalize_L2, distance_strategy=source.distance_strategy,
+            )
+            save_vectorstore(vs, folder, storage=spec.storage, rescore=spec.rescore, reduction=spec.reduction)
+            vs.docstore.close()
+            return folder, time.perf_counter() - t0
+        finally:
+            source.docstore.close()
+
+    def _retriever(self, vs: FAISS, mode: str):
+        k = self.ks[-1]
+        if mode == "similarity":
+            return vs.as_retriever(search_kwargs={"k": k})
+        mmr = self.model_loader.config.get("retriever", {}).get("mmr", {})
+        if mode == "mmr":
+            return MMRRetriever(
+                vectorstore=vs, k=k, fetch_k=max(mmr.get("fetch_k", 50), k), lambda_mult=mmr.get("lambda_mult", 0.5)
+            )
+        reranker = self.model_loader.load_reranker()
+        candidates = vs.as_retriever(search_kwargs={"k": max(reranker.fetch_k, k)})
+        return _Reranked(candidates, reranker, k)
+
+    def _evaluate(self, vs: FAISS, mode: str) -> Tuple[List[float], Dict[int, float], float]:
+        retriever = self._retriever(vs, mode)
+        retriever.invoke(self.dataset.questions[0].question)  # warm-up, untimed
+        latencies, recalls, ranks = [], [], []
+        for q in self.dataset.questions:
+            t0 = time.perf_counter()
+            docs = retriever.invoke(q.question)
+            latencies.append(time.perf_counter() - t0)
+            recall, rr = score([d.page_content for d in docs], q.relevant, self.ks, self.min_overlap)
+            recalls.append(recall)
+            ranks.append(rr)
+        recall = {k: statistics.mean(r[k] for r in recalls) for k in self.ks}
+        return latencies, recall, statistics.mean(ranks)
+
+
+class _Reranked:
+    """Similarity candidates reranked to the top k."""
+
+    def __init__(self, candidates, reranker, k: int):
+        self.candidates, self.reranker, self.k = candidates, reranker, k
+
+    def invoke(self, query: str) -> List[Document]:
+        return self.reranker.rerank(query, self.candidates.invoke(query), top_n=self.k)
+
+
+def format_report(results: Sequence[EvalResult], ks: Sequence[int]) -> str:
+    """Markdown comparison table, best MRR first (ties: lower latency)."""
+    ks = sorted(ks)
+    head = ["chunk_size", "overlap", "index", "mode", "chunks"] + [f"recall@{k}" for k in ks] + [
+        "MRR", "ingest s", "index s", "index MB", "mean ms", "p95 ms"]
+    lines = ["| " + " | ".join(head) + " |", "|" + "---|" * len(head)]
+    for r in sorted(results, key=lambda r: (-r.mrr, r.latency_ms)):
+        row = [str(r.chunk_size), str(r.chunk_overlap), r.index, r.mode, str(r.chunks)]
+        row += [f"{r.recall[k]:.3f}" for k in ks]
+        row += [f"{r.mrr:.3f}", f"{r.ingest_seconds:.2f}", f"{r.index_seconds:.2f}", f"{r.index_mb:.2f}",
+                f"{r.latency_ms:.2f}", f"{r.p95_ms:.2f}"]
+        lines.append("| " + " | ".join(row) + " |")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,222 @@
+"""
+Federated search across session indexes. Each `faiss_index/<session>` directory
+is one shard. A query is embedded once, every shard is searched in parallel on a
+thread pool of at most `max_workers` owned by that request (FAISS releases the
+GIL), and the per-shard top-k lists are merged into a global top-k with a heap.
+
+Raw FAISS distances are not comparable across shards built with a different
+metric, storage or reduction, so every hit is scored the same way before the
+merge: cosine similarity between the full-dimension query embedding and the
+chunk's full-dimension vector. That is the shard's own vector where it keeps exact
+float32 vectors (float32 storage without reduction, or rescore), and otherwise
+the chunk text embedded again with the query's model, inside the shard's task.
+A legacy index at the root of `base` is only searched (as shard ".") with
+`include_root`.
+
+Every shard has a latency cap. A shard still running by then is reported as
+"timeout", and its results are left out instead of holding up the response; it
+finishes on its own request's pool, so it never delays later requests. Shards
+beyond `max_workers` queue behind the others and share the same deadline, which is
+measured from fan-out; those that never started are reported as "not_started".
+"""
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.janitor import in_use
+from utils.metrics import FEDERATED_SHARDS, stage_timer
+from utils.model_loader import ModelLoader
+from utils.vector_store import MetadataFilter, keeps_exact_vectors
+from src.document_chat.mmr import _unit
+from src.document_chat.prefilter import nearest, query_vector
+from src.document_chat.retrieval import open_index
+
+log = CustomLogger().get_logger(__name__)
+
+_SHARD_TIMER = stage_timer("federated", "shard")
+_MERGE_TIMER = stage_timer("federated", "merge")
+
+@dataclass
+class ShardReport:
+    shard: str
+    status: str  # ok | timeout | not_started | error | missing
+    seconds: float = 0.0
+    hits: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class FederatedHit:
+    shard: str
+    similarity: float  # cosine to the query at full dimension; comparable across shards
+    document: Document
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "shard": self.shard,
+            "similarity": self.similarity,
+            "content": self.document.page_content,
+            "metadata": self.document.metadata,
+        }
+
+
+@dataclass
+class FederatedResult:
+    hits: List[FederatedHit] = field(default_factory=list)
+    shards: List[ShardReport] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def list_shards(base: str, index_name: str = "index", include_root: bool = False) -> Dict[str, str]:
+    """{shard name: index dir} for every session index under `base` (and `base` itself as ".", if asked)."""
+    root = Path(base)
+    if not root.is_dir():
+        return {}
+    found = {}
+    if include_root and (root / f"{index_name}.faiss").exists():
+        found["."] = str(root)
+    for d in sorted(root.iterdir()):
+        if d.is_dir() and (d / f"{index_name}.faiss").exists():
+            found[d.name] = str(d)
+    return found
+
+
+class FederatedSearch:
+    def __init__(
+        self,
+        base: str = "faiss_index",
+        index_name: str = "index",
+        timeout_seconds: float = 2.0,
+        max_workers: int = 8,
+        include_root: bool = False,
+        model_loader: Optional[ModelLoader] = None,
+    ):
+        self.base = base
+        self.index_name = index_name
+        self.timeout_seconds = float(timeout_seconds)
+        self.max_workers = int(max_workers)
+        self.include_root = include_root
+        self.model_loader = model_loader or ModelLoader()
+
+    @classmethod
+    def from_config(cls, base: str, index_name: str = "index", config: Optional[dict] = None) -> "FederatedSearch":
+        cfg = (config or load_config()).get("federated", {})
+        return cls(
+            base,
+            index_name=index_name,
+            timeout_seconds=float(cfg.get("timeout_seconds", 2.0)),
+            max_workers=int(cfg.get("max_workers", 8)),
+            include_root=bool(cfg.get("include_root", False)),
+        )
+
+    def resolve(self, session_ids: Optional[Sequence[str]] = None) -> Tuple[Dict[str, str], List[ShardReport]]:
+        """
+        Index dirs to search: the given sessions, or every index under `base`. Names that
+        are not plain directory names, or have no index, come back as "missing" reports.
+        """
+        available = list_shards(self.base, self.index_name, self.include_root)
+        if session_ids is None:
+            return available, []
+        shards, missing = {}, []
+        for sid in dict.fromkeys(session_ids):
+            if sid in available and (sid == "." or os.path.basename(sid) == sid):
+                shards[sid] = available[sid]
+            else:
+                missing.append(ShardReport(sid, "missing", error="no index for this session"))
+        return shards, missing
+
+    def search(
+        self,
+        query: str,
+        session_ids: Optional[Sequence[str]] = None,
+        k: int = 5,
+        metadata_filter: Optional[MetadataFilter] = None,
+        timeout_seconds: Optional[float] = None,
+    ) -> FederatedResult:
+        """Global top-k for `query` over the selected shards, with one report per shard."""
+        t0 = time.perf_counter()
+        timeout = self.timeout_seconds if timeout_seconds is None else float(timeout_seconds)
+        shards, reports = self.resolve(session_ids)
+        for report in reports:
+            FEDERATED_SHARDS.labels(report.status).inc()
+        if not shards:
+            return FederatedResult(shards=reports, seconds=time.perf_counter() - t0)
+
+        embeddings = self.model_loader.load_embeddings()
+        embedding = embeddings.embed_query(query)
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(shards))), thread_name_prefix="federated"
+        )
+        try:
+            futures = {
+                pool.submit(self._search_shard, name, path, embeddings, embedding, k, metadata_filter): name
+                for name, path in shards.items()
+            }
+            done, pending = wait(futures, timeout=timeout)
+            # queued shards are cancelled; running ones finish unobserved on this request's threads
+            not_started = {future for future in pending if future.cancel()}
+        finally:
+            pool.shutdown(wait=False)
+
+        per_shard: List[List[FederatedHit]] = []
+        waited = time.perf_counter() - t0
+        for future, name in futures.items():
+            if future in done:
+                hits, report = future.result()
+                per_shard.append(hits)
+            elif future in not_started:
+                report = ShardReport(name, "not_started", seconds=waited)
+            else:
+                report = ShardReport(name, "timeout", seconds=waited)
+            FEDERATED_SHARDS.labels(report.status).inc()
+            reports.append(report)
+
+        with _MERGE_TIMER.time():
+            merged = list(islice(heapq.merge(*per_shard, key=lambda h: -h.similarity), k))
+        result = FederatedResult(hits=merged, shards=reports, seconds=time.perf_counter() - t0)
+        log.info(
+            "Federated search complete",
+            shards=len(futures),
+            timed_out=len(pending) - len(not_started),
+            not_started=len(not_started),
+            hits=len(merged),
+            seconds=round(result.seconds, 4),
+        )
+        return result
+
+    def _search_shard(
+        self, name: str, index_dir: str, embeddings, embedding, k: int, metadata_filter: Optional[MetadataFilter]
+    ) -> Tuple[List[FederatedHit], ShardReport]:
+        """This shard's top-k, best first by full-dimension cosine; failures are reported, not raised."""
+        t0 = time.perf_counter()
+        try:
+            with _SHARD_TIMER.time(), in_use(index_dir):
+                vs = open_index(index_dir, self.model_loader, self.index_name)
+                _, positions = nearest(vs, query_vector(vs, embedding), k, metadata_filter)
+                found = [(pos, vs.docstore.search(vs.index_to_docstore_id[pos])) for pos in positions.tolist()]
+                found = [(pos, doc) for pos, doc in found if isinstance(doc, Document)]
+                if not found:
+                    vectors = np.zeros((0, len(embedding)), dtype=np.float32)
+                elif keeps_exact_vectors(vs.index):
+                    vectors = vs.index.reconstruct_batch(np.array([pos for pos, _ in found], dtype=np.int64))
+                else:
+                    vectors = np.array(embeddings.embed_documents([doc.page_content for _, doc in found]), dtype=np.float32)
+                similarity = _unit(vectors) @ _unit(np.asarray(embedding, dtype=np.float32))
+                hits = sorted(
+                    (FederatedHit(name, float(sim), doc) for sim, (_, doc) in zip(similarity.tolist(), found)),
+                    key=lambda h: -h.similarity,
+                )
+            return hits, ShardReport(name, "ok", seconds=time.perf_counter() - t0, hits=len(hits))
+        except Exception as e:
+            log.warning("Federated shard failed", shard=name, error=repr(e))
+            return [], ShardReport(name, "error", seconds=time.perf_counter() - t0, error=repr(e))
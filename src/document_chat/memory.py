@@ -0,0 +1,117 @@
+"""
+Server-held chat history for one conversation, bounded by tokens. Turns are kept
+verbatim until history exceeds `max_tokens`. Then the oldest turns are folded into
+a rolling summary by the LLM, so the recent turns fill at most `keep_ratio` of the
+budget. The summary is sent ahead of them as a system message.
+
+Summarizing in one batch down to `keep_ratio`, instead of one turn at a time, costs
+one LLM call every few turns rather than one per turn once the budget is full.
+"""
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+
+from logger.custom_logger import CustomLogger
+from model.models import PromptType
+from prompt.prompt_library import PROMPT_REGISTRY
+from utils.metrics import record_usage, stage_timer
+from utils.token_budget import TokenBudget
+
+log = CustomLogger().get_logger(__name__)
+
+_SUMMARIZE_TIMER = stage_timer("chat_memory", "summarize")
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        llm,
+        budget: TokenBudget,
+        max_tokens: int = 2000,
+        keep_ratio: float = 0.5,
+        summary_max_tokens: int = 300,
+    ):
+        self.llm = llm
+        self.budget = budget
+        self.max_tokens = int(max_tokens)
+        self.keep_ratio = float(keep_ratio)
+        self.summary_max_tokens = int(summary_max_tokens)
+        self.summary = ""
+        self.turns: List[BaseMessage] = []
+        self.summarized_turns = 0
+        self.prompt = PROMPT_REGISTRY[PromptType.CONVERSATION_SUMMARY.value]
+
+    @classmethod
+    def from_config(cls, llm, budget: TokenBudget, config: Dict[str, Any]) -> "ConversationMemory":
+        cfg = config.get("memory", {})
+        return cls(
+            llm,
+            budget,
+            max_tokens=cfg.get("max_tokens", 2000),
+            keep_ratio=cfg.get("keep_ratio", 0.5),
+            summary_max_tokens=cfg.get("summary_max_tokens", 300),
+        )
+
+    def messages(self) -> List[BaseMessage]:
+        """History to pass as chat_history: the summary (if any), then the verbatim turns."""
+        head = [SystemMessage(content=SUMMARY_PREFIX + self.summary)] if self.summary else []
+        return head + self.turns
+
+    def tokens(self) -> int:
+        return self.budget.count_messages(self.messages())
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self.turns += [HumanMessage(content=question), AIMessage(content=answer)]
+
+    def clear(self) -> None:
+        self.summary, self.turns, self.summarized_turns = "", [], 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": len(self.turns) // 2,
+            "summarized_turns": self.summarized_turns,
+            "tokens": self.tokens(),
+            "max_tokens": self.max_tokens,
+        }
+
+    def _split(self) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """(older turns to summarize, recent turns to keep); the last turn is always kept."""
+        room = max(0, int(self.max_tokens * self.keep_ratio) - self.summary_max_tokens)
+        keep = len(self.turns) - 2
+        while keep > 0 and self.budget.count_messages(self.turns[keep - 2:]) <= room:
+            keep -= 2
+        return self.turns[:keep], self.turns[keep:]
+
+    async def acompact(self) -> bool:
+        """Fold the oldest turns into the summary when history is over budget; True if it did."""
+        if self.tokens() <= self.max_tokens:
+            return False
+        older, kept = self._split()
+        if not older:
+            return False
+        new_lines = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in older
+        )
+        variables = self.budget.fit_prompt_variable(
+            self.prompt,
+            {"summary": self.summary or "(none)", "new_lines": new_lines, "max_words": self.summary_max_tokens * 3 // 4},
+            "new_lines",
+        )
+        usage = self.budget.usage()
+        try:
+            with _SUMMARIZE_TIMER.time():
+                prompt_value = self.prompt.format_prompt(**variables)
+                usage.add(prompt_tokens=self.budget.count_prompt(prompt_value))
+                summary = await (self.llm | StrOutputParser()).ainvoke(prompt_value)
+            usage.add(completion_tokens=self.budget.count(summary))
+            self.summary = self.budget.truncate(summary.strip(), self.summary_max_tokens)
+        except Exception as e:
+            # history must stay bounded: drop the old turns and keep the previous summary
+            log.warning("Conversation summary failed; dropping older turns", error=str(e), dropped=len(older) // 2)
+        record_usage("chat_memory", usage)
+        self.turns = kept
+        self.summarized_turns += len(older) // 2
+        log.info("Chat history summarized", summarized=len(older) // 2, kept=len(kept) // 2, tokens=self.tokens())
+        return True
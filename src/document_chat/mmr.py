@@ -0,0 +1,75 @@
+"""
+Maximal marginal relevance over a FAISS store, vectorised with NumPy.
+
+Candidates come from one FAISS search, and their vectors are read back from the
+index with a single reconstruct_batch call, so nothing is re-embedded. The
+pairwise similarities are one matrix product. The greedy selection loops over
+the k picks only: each step updates every candidate's redundancy with one
+vectorised maximum. This replaces LangChain's MMR, which reconstructs candidates
+one by one and recomputes the similarities in Python at every step.
+"""
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from src.document_chat.prefilter import documents_at, embed_query, nearest_positions
+from utils.vector_store import MetadataFilter
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5) -> np.ndarray:
+    """
+    Indices into `candidates` (n x d), in pick order, of the k that maximise
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already picked), with cosine similarity.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    cands = _unit(np.asarray(candidates, dtype=np.float32))
+    relevance = cands @ _unit(np.asarray(query, dtype=np.float32).reshape(-1))
+    pairwise = cands @ cands.T
+    redundancy = np.zeros(n, dtype=np.float32)  # max similarity to any picked candidate
+    available = np.ones(n, dtype=bool)
+    picked = np.empty(k, dtype=np.int64)
+    for step in range(k):
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        picked[step] = best
+        available[best] = False
+        redundancy = pairwise[best] if step == 0 else np.maximum(redundancy, pairwise[best])
+    return picked
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Retriever running `mmr_select` over the `fetch_k` nearest chunks of a FAISS store
+    (among those matching `filter`, if set).
+    """
+
+    vectorstore: FAISS
+    k: int = 5
+    fetch_k: int = 50
+    lambda_mult: float = 0.5
+    filter: Optional[MetadataFilter] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_by_vector(embed_query(self.vectorstore, query))
+
+    def search_by_vector(self, q: np.ndarray) -> List[Document]:
+        """Results for a query embedded as `q` (a `query_vector` batch)."""
+        vs = self.vectorstore
+        ids = nearest_positions(vs, q, max(self.fetch_k, self.k), self.filter)
+        if len(ids) == 0:
+            return []
+        order = mmr_select(q[0], vs.index.reconstruct_batch(ids), self.k, self.lambda_mult)
+        return documents_at(vs, ids[order])
@@ -0,0 +1,90 @@
+"""
+Metadata-filtered retrieval over a FAISS store. The filter (source files, page
+range, ingest window) is resolved to vector positions through the chunk_meta
+table maintained at ingest, and the FAISS scan itself is restricted to those
+positions with an ID selector. Unlike post-filtering the top-k, a filtered query
+still returns k chunks as long as k chunks match.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_community.vectorstores import FAISS
+
+from utils.vector_store import MetadataFilter, filter_positions, search_subset
+
+
+def query_vector(vs: FAISS, embedding) -> np.ndarray:
+    """A query embedding as the 1 x d float32 batch `vs` searches with (L2-normalised if the store is)."""
+    q = np.array([embedding], dtype=np.float32)
+    if vs._normalize_L2:
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q /= np.where(norms == 0, 1, norms)
+    return q
+
+
+def embed_query(vs: FAISS, text: str) -> np.ndarray:
+    return query_vector(vs, vs.embedding_function.embed_query(text))
+
+
+def nearest(vs: FAISS, q: np.ndarray, n: int, flt: Optional[MetadataFilter] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(distances, positions) of the n vectors nearest to `q`, among those matching `flt` if given."""
+    if flt is None or flt.is_empty():
+        D, I = vs.index.search(q, n)
+    else:
+        allowed = filter_positions(vs, flt)
+        if len(allowed) == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        D, I = search_subset(vs.index, q, min(n, len(allowed)), allowed)
+    found = I[0] >= 0
+    return D[0][found], I[0][found]
+
+
+def nearest_positions(vs: FAISS, q: np.ndarray, n: int, flt: Optional[MetadataFilter] = None) -> np.ndarray:
+    """Positions of the n vectors nearest to `q`, among those matching `flt` if given."""
+    return nearest(vs, q, n, flt)[1]
+
+
+def documents_at(vs: FAISS, positions) -> List[Document]:
+    docs = []
+    for pos in positions:
+        doc = vs.docstore.search(vs.index_to_docstore_id[int(pos)])
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs
+
+
+def documents_by_vector(retriever, embedding: Sequence[float]) -> Optional[List[Document]]:
+    """
+    `retriever`'s documents for a query already embedded as `embedding`, without
+    embedding it again: retrievers with `search_by_vector`, and LangChain similarity
+    retrievers over FAISS. None when `retriever` can only search by text.
+    """
+    search = getattr(retriever, "search_by_vector", None)
+    if search is not None:
+        return search(query_vector(retriever.vectorstore, embedding))
+    if (
+        isinstance(retriever, VectorStoreRetriever)
+        and retriever.search_type == "similarity"
+        and isinstance(retriever.vectorstore, FAISS)
+    ):
+        return retriever.vectorstore.similarity_search_by_vector(list(embedding), **retriever.search_kwargs)
+    return None
+
+
+class PrefilteredRetriever(BaseRetriever):
+    """Top-k similarity search restricted to chunks matching `filter`."""
+
+    vectorstore: FAISS
+    filter: MetadataFilter
+    k: int = 5
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_by_vector(embed_query(self.vectorstore, query))
+
+    def search_by_vector(self, q: np.ndarray) -> List[Document]:
+        """Results for a query embedded as `q` (a `query_vector` batch)."""
+        return documents_at(self.vectorstore, nearest_positions(self.vectorstore, q, self.k, self.filter))
@@ -0,0 +1,65 @@
+"""
+Second retrieval stage for ConversationalRAG: FAISS over-fetches `fetch_k`
+candidates, a cross-encoder scores each (question, chunk) pair on CPU in batches,
+and only the best `top_n` chunks reach the QA prompt. Recall comes from the wide
+fetch and precision from the reranker, so the prompt stays small.
+
+Scores are cached per (question, chunk text) in a per-process LRU, so a repeated
+or retried question only scores chunks it has not seen.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from utils.metrics import record_cache
+
+
+class Reranker:
+    def __init__(self, model, top_n: int = 5, fetch_k: int = 20, batch_size: int = 32, cache_size: int = 4096):
+        self.model = model  # anything with predict(pairs, batch_size) -> scores
+        self.top_n = int(top_n)
+        self.fetch_k = int(fetch_k)
+        self.batch_size = int(batch_size)
+        self.cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[Tuple[str, bytes], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, text: str) -> Tuple[str, bytes]:
+        return query, hashlib.sha1(text.encode("utf-8")).digest()
+
+    def scores(self, query: str, texts: Sequence[str]) -> List[float]:
+        """Relevance of each text to `query` (higher is better)."""
+        keys = [self._key(query, t) for t in texts]
+        out: List[Optional[float]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._cache.get(key)
+                if score is not None:
+                    self._cache.move_to_end(key)
+                    out[i] = score
+        missing = [i for i, score in enumerate(out) if score is None]
+        for score in out:
+            record_cache("rerank", score is not None)
+        if missing:
+            predicted = self.model.predict([(query, texts[i]) for i in missing], batch_size=self.batch_size)
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    out[i] = float(score)
+                    if self.cache_size:
+                        self._cache[keys[i]] = out[i]
+                        self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def rerank(self, query: str, docs: Sequence[Document], top_n: Optional[int] = None) -> List[Document]:
+        """The `top_n` best docs by cross-encoder score, best first; ties keep retrieval order."""
+        if not docs:
+            return []
+        scores = self.scores(query, [d.page_content for d in docs])
+        order = sorted(range(len(docs)), key=lambda i: -scores[i])
+        return [docs[i] for i in order[: top_n or self.top_n]]
@@ -1,18 +1,57 @@
 import sys
 import os
 from operator import itemgetter
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
 
 from utils.model_loader import ModelLoader
+from src.document_ingestion.data_ingestion import FaissManager
 from exception.custom_exception import DocumentPortalException
 from logger.custom_logger import CustomLogger
 from prompt.prompt_library import PROMPT_REGISTRY
 from model.models import PromptType
+from utils.metrics import stage_timer, record_adaptive_cutoff, record_usage
+from utils.index_cache import INDEX_CACHE
+from utils.janitor import touch
+from utils.vector_store import MetadataFilter, load_vectorstore
+from src.document_chat.adaptive import AdaptiveRetriever
+from src.document_chat.mmr import MMRRetriever
+from src.document_chat.prefilter import PrefilteredRetriever
+from src.document_chat.speculative import SpeculativeRetrieval
+
+# Share of the prompt budget chat history may use; retrieved context gets the rest.
+HISTORY_BUDGET_SHARE = 0.25
+
+# Query-side indexes are memory-mapped so uvicorn workers share one copy.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
+
+_RAG_TIMERS = {s: stage_timer("rag", s) for s in ("load", "rewrite", "retrieve", "rerank", "compress", "generate")}
+
+
+def open_index(index_path: str, model_loader: ModelLoader, index_name: str = "index"):
+    """
+    Query-side FAISS store of a session index: from the per-process index cache, else
+    disk. Refuses indexes built with a different embedding model than the configured one.
+    """
+    if not os.path.isdir(index_path):
+        raise FileNotFoundError(f"FAISS index directory not found: {index_path}")
+
+    FaissManager.check_embedding_signature(
+        FaissManager.read_meta(index_path), model_loader.embedding_signature(), index_path
+    )
+    embeddings = model_loader.load_embeddings()
+
+    def load():
+        with _RAG_TIMERS["load"].time():
+            return load_vectorstore(index_path, embeddings, index_name=index_name, mmap=FAISS_MMAP)
+
+    vectorstore = INDEX_CACHE.get(index_path, index_name, load)
+    touch(index_path)  # last access for the janitor's TTL/LRU
+    return vectorstore
 
 
 class ConversationalRAG:
@@ -23,15 +62,32 @@ class ConversationalRAG:
         rag = ConversationalRAG(session_id="abc")
         rag.load_retriever_from_faiss(index_path="faiss_index/abc", k=5, index_name="index")
         answer = rag.invoke("What is ...?", chat_history=[])
+
+    speculative=True retrieves for the raw question while the question is rewritten
+    (retriever.speculative in config, or RAG_SPECULATIVE=1, when left as None).
     """
 
-    def __init__(self, session_id: Optional[str], retriever=None):
+    def __init__(self, session_id: Optional[str], retriever=None, speculative: Optional[bool] = None):
         try:
             self.log = CustomLogger().get_logger(__name__)
             self.session_id = session_id
+            self.model_loader = ModelLoader()
 
-            # Load LLM and prompts once
+            # Load LLM, reranker, token budget and prompts once
             self.llm = self._load_llm()
+            self.reranker = self.model_loader.load_reranker()  # None unless reranker.provider is set
+            self.top_n: Optional[int] = None  # chunks kept after reranking; reranker.top_n if unset
+            self.compressor = self.model_loader.load_compressor()  # None unless compression is enabled
+            self.last_compression = None
+            if speculative is None:
+                enabled = self.model_loader.config.get("retriever", {}).get("speculative", {}).get("enabled", False)
+                speculative = os.getenv("RAG_SPECULATIVE", "1" if enabled else "0") != "0"
+            self.speculative = speculative
+            self.last_speculation = None
+            self.last_cutoff = None  # AdaptiveCutoff of the last question, with search_type="adaptive"
+            self.last_documents = []  # chunks the last question's context was packed from
+            self.budget = self.model_loader.load_token_budget()
+            self.last_usage = self.budget.usage()
             self.contextualize_prompt: ChatPromptTemplate = PROMPT_REGISTRY[
                 PromptType.CONTEXTUALIZE_QUESTION.value
             ]
@@ -59,28 +115,55 @@ class ConversationalRAG:
         index_name: str = "index",
         search_type: str = "similarity",
         search_kwargs: Optional[Dict[str, Any]] = None,
+        metadata_filter: Optional[MetadataFilter] = None,
     ):
         """
-        Load FAISS vectorstore from disk and build retriever + LCEL chain.
+        Load FAISS vectorstore (from the per-process index cache, else disk) and build retriever + LCEL chain.
+        search_type="mmr" picks k diverse chunks from the fetch_k nearest (search_kwargs
+        fetch_k / lambda_mult, defaults from retriever.mmr in config) with the
+        vectorised MMRRetriever. With a reranker, `k` is the number of chunks kept
+        after reranking and max(k, reranker.fetch_k) candidates are retrieved.
+        search_type="adaptive" returns between min_k and max_k chunks (search_kwargs, defaults
+        from retriever.adaptive in config), cut where the similarity scores drop off; `k`
+        is then the fixed k its context-token savings are reported against.
+        `metadata_filter` restricts any search type to matching chunks, pre-filtered
+        inside the FAISS scan.
         """
         try:
-            if not os.path.isdir(index_path):
-                raise FileNotFoundError(f"FAISS index directory not found: {index_path}")
-
-            embeddings = ModelLoader().load_embeddings()
-            vectorstore = FAISS.load_local(
-                index_path,
-                embeddings,
-                index_name=index_name,
-                allow_dangerous_deserialization=True,  # ok if you trust the index
-            )
+            vectorstore = open_index(index_path, self.model_loader, index_name)
 
             if search_kwargs is None:
                 search_kwargs = {"k": k}
+            if self.reranker is not None:
+                search_kwargs = {**search_kwargs, "k": max(search_kwargs.get("k", k), self.reranker.fetch_k)}
+                self.top_n = k
 
-            self.retriever = vectorstore.as_retriever(
-                search_type=search_type, search_kwargs=search_kwargs
-            )
+            if metadata_filter is not None and metadata_filter.is_empty():
+                metadata_filter = None
+            if search_type == "mmr":
+                mmr = {**self.model_loader.config.get("retriever", {}).get("mmr", {}), **search_kwargs}
+                self.retriever = MMRRetriever(
+                    vectorstore=vectorstore,
+                    k=mmr["k"],
+                    fetch_k=max(mmr.get("fetch_k", 50), mmr["k"]),
+                    lambda_mult=mmr.get("lambda_mult", 0.5),
+                    filter=metadata_filter,
+                )
+            elif search_type == "adaptive":
+                self.retriever = AdaptiveRetriever.from_config(
+                    vectorstore,
+                    self.model_loader.config,
+                    baseline_k=k,
+                    filter=metadata_filter,
+                    count=self.budget.count,
+                    **{n: search_kwargs.get(n) for n in ("min_k", "max_k", "max_gap", "min_relative")},
+                )
+            elif metadata_filter is not None:
+                self.retriever = PrefilteredRetriever(vectorstore=vectorstore, k=search_kwargs["k"], filter=metadata_filter)
+            else:
+                self.retriever = vectorstore.as_retriever(
+                    search_type=search_type, search_kwargs=search_kwargs
+                )
             self._build_lcel_chain()
 
             self.log.info(
@@ -88,6 +171,8 @@ class ConversationalRAG:
                 index_path=index_path,
                 index_name=index_name,
                 k=k,
+                search_type=search_type,
+                filtered=metadata_filter is not None,
                 session_id=self.session_id,
             )
             return self.retriever
@@ -103,9 +188,10 @@ class ConversationalRAG:
                 raise DocumentPortalException(
                     "RAG chain not initialized. Call load_retriever_from_faiss() before invoke().", sys
                 )
-            chat_history = chat_history or []
-            payload = {"input": user_input, "chat_history": chat_history}
+            payload = self._budgeted_payload(user_input, chat_history or [])
+            self.last_usage = self.budget.usage()
             answer = self.chain.invoke(payload)
+            record_usage("rag", self.last_usage)
             if not answer:
                 self.log.warning(
                     "No answer generated", user_input=user_input, session_id=self.session_id
@@ -116,17 +202,45 @@ class ConversationalRAG:
                 session_id=self.session_id,
                 user_input=user_input,
                 answer_preview=str(answer)[:150],
+                **self.last_usage.as_dict(),
             )
             return answer
         except Exception as e:
             self.log.error("Failed to invoke ConversationalRAG", error=str(e))
             raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
 
+    async def astream(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> AsyncIterator[str]:
+        """invoke(), yielding the answer in pieces as the LLM produces them."""
+        try:
+            if self.chain is None:
+                raise DocumentPortalException(
+                    "RAG chain not initialized. Call load_retriever_from_faiss() before astream().", sys
+                )
+            payload = self._budgeted_payload(user_input, chat_history or [])
+            self.last_usage = self.budget.usage()
+            inputs = await self._prepare.ainvoke(payload)
+            parts: List[str] = []
+            with _RAG_TIMERS["generate"].time():
+                async for piece in self._stream_generate.astream(inputs):
+                    parts.append(piece)
+                    yield piece
+            self.last_usage.add(completion_tokens=self.budget.count("".join(parts)))
+            record_usage("rag", self.last_usage)
+            self.log.info(
+                "Chain streamed successfully",
+                session_id=self.session_id,
+                user_input=user_input,
+                **self.last_usage.as_dict(),
+            )
+        except Exception as e:
+            self.log.error("Failed to stream ConversationalRAG", error=str(e))
+            raise DocumentPortalException("Streaming error in ConversationalRAG", sys)
+
     # ---------- Internals ----------
 
     def _load_llm(self):
         try:
-            llm = ModelLoader().load_llm()
+            llm = self.model_loader.load_llm()
             if not llm:
                 raise ValueError("LLM could not be loaded")
             self.log.info("LLM loaded successfully", session_id=self.session_id)
@@ -139,6 +253,91 @@ class ConversationalRAG:
     def _format_docs(docs) -> str:
         return "\n\n".join(getattr(d, "page_content", str(d)) for d in docs)
 
+    def _budgeted_payload(self, user_input: str, chat_history: List[BaseMessage]) -> Dict[str, Any]:
+        """Trim chat history to its share of the prompt budget (most recent turns win)."""
+        history_budget = int(self.budget.prompt_budget * HISTORY_BUDGET_SHARE)
+        trimmed = self.budget.trim_history(chat_history, history_budget)
+        if len(trimmed) < len(chat_history):
+            self.log.info(
+                "Chat history trimmed to token budget",
+                kept=len(trimmed),
+                dropped=len(chat_history) - len(trimmed),
+                session_id=self.session_id,
+            )
+        return {"input": user_input, "chat_history": trimmed}
+
+    def _fit_context(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Pack retrieved chunks (in rank order) into whatever budget the QA prompt leaves."""
+        fixed = {"context": "", "input": inputs["input"], "chat_history": inputs["chat_history"]}
+        overhead = self.budget.count_prompt(self.qa_prompt.format_prompt(**fixed))
+        self.budget.ensure_fits(overhead, what="QA prompt without context")
+        self.last_documents = inputs["docs"]
+        texts = [getattr(d, "page_content", str(d)) for d in inputs["docs"]]
+        packed = self.budget.pack(texts, self.budget.prompt_budget - overhead)
+        if len(packed) < len(texts):
+            self.log.info(
+                "Retrieved context packed to token budget",
+                kept=len(packed),
+                retrieved=len(texts),
+                session_id=self.session_id,
+            )
+        return dict(fixed, context=self._format_docs(packed))
+
+    @staticmethod
+    def _timed(stage: str, runnable):
+        """Wrap a runnable so its wall time lands in the rag/<stage> histogram."""
+        timer = _RAG_TIMERS[stage]
+        def run(inputs, config):
+            with timer.time():
+                return runnable.invoke(inputs, config)
+        return RunnableLambda(run, name=stage)
+
+    def _rerank(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(inputs, docs=self.reranker.rerank(inputs["question"], inputs["docs"], top_n=self.top_n))
+
+    def _compress(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        docs, stats = self.compressor.compress(inputs["question"], inputs["docs"], count=self.budget.count)
+        self.last_compression = stats
+        self.log.info(
+            "Retrieved context compressed",
+            tokens_in=stats.tokens_in,
+            tokens_out=stats.tokens_out,
+            ratio=round(stats.ratio, 3),
+            session_id=self.session_id,
+        )
+        return dict(inputs, docs=docs)
+
+    def _record_speculation(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        stats = inputs["speculation"]
+        self.last_speculation = stats
+        self.log.info(
+            "Speculative retrieval settled",
+            hit=stats.hit,
+            reason=stats.reason,
+            similarity=round(stats.similarity, 3),
+            saved_ms=round(stats.saved_seconds * 1000, 1),
+            session_id=self.session_id,
+        )
+        return {"question": inputs["question"], "docs": self._record_cutoff(inputs["docs"])}
+
+    def _record_cutoff(self, docs):
+        """Record the adaptive cutoff of the documents this question uses (once, after any speculation)."""
+        cutoff = getattr(docs, "cutoff", None)
+        if cutoff is None:
+            return docs
+        self.last_cutoff = cutoff
+        record_adaptive_cutoff(cutoff.k, cutoff.tokens, cutoff.baseline_tokens)
+        self.log.info("Adaptive cutoff", **cutoff.as_dict(), session_id=self.session_id)
+        return docs
+
+    def _record_prompt(self, prompt_value):
+        self.last_usage.add(prompt_tokens=self.budget.count_prompt(prompt_value))
+        return prompt_value
+
+    def _record_completion(self, output):
+        self.last_usage.add(completion_tokens=self.budget.count_output(output))
+        return output
+
     def _build_lcel_chain(self):
         try:
             if self.retriever is None:
@@ -148,24 +347,49 @@ class ConversationalRAG:
             question_rewriter = (
                 {"input": itemgetter("input"), "chat_history": itemgetter("chat_history")}
                 | self.contextualize_prompt
+                | RunnableLambda(self._record_prompt)
                 | self.llm
+                | RunnableLambda(self._record_completion)
                 | StrOutputParser()
             )
 
-            # 2) Retrieve docs for rewritten question
-            retrieve_docs = question_rewriter | self.retriever | self._format_docs
-
-            # 3) Answer using retrieved context + original input + chat history
-            self.chain = (
-                {
-                    "context": retrieve_docs,
-                    "input": itemgetter("input"),
-                    "chat_history": itemgetter("chat_history"),
-                }
-                | self.qa_prompt
+            # 2) Retrieve docs for rewritten question, then rerank / compress when configured
+            retrieve = self._timed("retrieve", self.retriever) | RunnableLambda(self._record_cutoff)
+            post = []
+            if self.reranker is not None:
+                post.append(self._timed("rerank", RunnableLambda(self._rerank)))
+            if self.compressor is not None:
+                post.append(self._timed("compress", RunnableLambda(self._compress)))
+            if self.speculative:
+                speculate = SpeculativeRetrieval.from_config(
+                    question_rewriter, self.retriever, self.model_loader.load_embeddings(), self.model_loader.config
+                )
+                retrieve_docs = speculate.as_runnable() | RunnableLambda(self._record_speculation)
+                for stage in post:
+                    retrieve_docs = retrieve_docs | stage
+                retrieve_docs = retrieve_docs | itemgetter("docs")
+            elif not post:
+                retrieve_docs = self._timed("rewrite", question_rewriter) | retrieve
+            else:
+                retrieve_docs = self._timed("rewrite", question_rewriter) | RunnableParallel(
+                    question=RunnablePassthrough(), docs=retrieve
+                )
+                for stage in post:
+                    retrieve_docs = retrieve_docs | stage
+                retrieve_docs = retrieve_docs | itemgetter("docs")
+
+            # 3) Answer using budget-packed context + original input + chat history
+            generate = (
+                self.qa_prompt
+                | RunnableLambda(self._record_prompt)
                 | self.llm
+                | RunnableLambda(self._record_completion)
                 | StrOutputParser()
             )
+            self._prepare = RunnablePassthrough.assign(docs=retrieve_docs) | RunnableLambda(self._fit_context)
+            # streaming twin of `generate`: completion tokens are counted once the stream ends
+            self._stream_generate = self.qa_prompt | RunnableLambda(self._record_prompt) | self.llm | StrOutputParser()
+            self.chain = self._prepare | self._timed("generate", generate)
 
             self.log.info("LCEL graph built successfully", session_id=self.session_id)
         except Exception as e:
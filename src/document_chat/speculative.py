@@ -0,0 +1,166 @@
+"""
+Speculative retrieval: while the LLM rewrites the question against the chat
+history, retrieve for the raw question at the same time. When the rewrite comes
+back unchanged (ignoring case, spacing and punctuation) or its embedding is at
+least `min_similarity` (cosine) from the raw question's, the speculative results
+are used. Otherwise only the retrieval is redone for the rewritten question.
+
+Each question is embedded once: the speculative branch embeds the raw question and
+searches by that vector (`documents_by_vector`), and the rewritten question's
+embedding from the comparison is reused for the redo. A hit therefore costs the
+same single query embedding as the sequential chain, with the retrieval off the
+critical path; a rewrite that changes the question costs one more.
+"""
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableParallel
+from langchain_core.runnables.config import run_in_executor
+
+from src.document_chat.prefilter import documents_by_vector
+from utils.metrics import record_speculation, stage_timer
+
+_TIMERS = {s: stage_timer("rag", s) for s in ("rewrite", "retrieve")}
+_NON_WORD = re.compile(r"\W+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text).strip().casefold()
+
+
+def _cosine(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+def _clocked(runnable: Runnable) -> Runnable:
+    """`runnable`, returning (output, seconds) so parallel branches can be timed."""
+    def run(inputs, config):
+        t0 = time.perf_counter()
+        out = runnable.invoke(inputs, config)
+        return out, time.perf_counter() - t0
+
+    async def arun(inputs, config):
+        t0 = time.perf_counter()
+        out = await runnable.ainvoke(inputs, config)
+        return out, time.perf_counter() - t0
+
+    return RunnableLambda(run, afunc=arun)
+
+
+@dataclass
+class SpeculationStats:
+    hit: bool
+    reason: str             # unchanged | similar | changed
+    similarity: float
+    rewrite_seconds: float
+    retrieve_seconds: float  # the retrieval whose results were used
+    seconds: float           # wall time of rewrite + retrieval
+
+    @property
+    def saved_seconds(self) -> float:
+        """Against running the rewrite and the retrieval one after the other."""
+        return self.rewrite_seconds + self.retrieve_seconds - self.seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(asdict(self), saved_seconds=self.saved_seconds)
+
+
+class SpeculativeRetrieval:
+    """
+    Builds the rewrite + retrieve step of ConversationalRAG's chain. The runnable
+    takes {"input", "chat_history"} and returns {"question", "docs", "speculation"}.
+    """
+
+    def __init__(self, rewriter: Runnable, retriever: Runnable, embeddings, min_similarity: float = 0.95):
+        self.rewriter = rewriter
+        self.retriever = retriever
+        self.embeddings = embeddings
+        self.min_similarity = float(min_similarity)
+        question = RunnableLambda(lambda inputs: inputs["input"])
+        self._parallel = RunnableParallel(
+            rewrite=_clocked(rewriter),
+            speculative=_clocked(question | RunnableLambda(self._embed_and_retrieve, afunc=self._aembed_and_retrieve)),
+        )
+
+    @classmethod
+    def from_config(cls, rewriter: Runnable, retriever: Runnable, embeddings, config: Dict[str, Any]) -> "SpeculativeRetrieval":
+        cfg = config.get("retriever", {}).get("speculative", {})
+        return cls(rewriter, retriever, embeddings, min_similarity=cfg.get("min_similarity", 0.95))
+
+    def as_runnable(self) -> Runnable:
+        return RunnableLambda(self._run, afunc=self._arun, name="speculative_retrieve")
+
+    def _retrieve(self, question: str, vector, config) -> List[Document]:
+        docs = documents_by_vector(self.retriever, vector)
+        return self.retriever.invoke(question, config) if docs is None else docs
+
+    async def _aretrieve(self, question: str, vector, config) -> List[Document]:
+        docs = await run_in_executor(config, documents_by_vector, self.retriever, vector)
+        return await self.retriever.ainvoke(question, config) if docs is None else docs
+
+    def _embed_and_retrieve(self, question: str, config) -> Tuple[List[Document], List[float]]:
+        vector = self.embeddings.embed_query(question)
+        return self._retrieve(question, vector, config), vector
+
+    async def _aembed_and_retrieve(self, question: str, config) -> Tuple[List[Document], List[float]]:
+        vector = await self.embeddings.aembed_query(question)
+        return await self._aretrieve(question, vector, config), vector
+
+    def _verdict(self, similarity: Optional[float]) -> Tuple[str, float]:
+        """(reason, similarity); similarity is None when the rewrite left the question unchanged."""
+        if similarity is None:
+            return "unchanged", 1.0
+        return ("similar" if similarity >= self.min_similarity else "changed"), similarity
+
+    def _settle(self, t0: float, rewrite, speculative, reason: str, similarity: float, redo=None) -> Dict[str, Any]:
+        (question, rewrite_s), ((docs, _), retrieve_s) = rewrite, speculative
+        if redo is not None:
+            docs, retrieve_s = redo
+        _TIMERS["rewrite"].observe(rewrite_s)
+        _TIMERS["retrieve"].observe(retrieve_s)
+        stats = SpeculationStats(
+            hit=redo is None,
+            reason=reason,
+            similarity=similarity,
+            rewrite_seconds=rewrite_s,
+            retrieve_seconds=retrieve_s,
+            seconds=time.perf_counter() - t0,
+        )
+        record_speculation(stats.hit, stats.saved_seconds)
+        return {"question": question, "docs": docs, "speculation": stats}
+
+    def _run(self, inputs: Dict[str, Any], config) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        out = self._parallel.invoke(inputs, config)
+        rewritten, vector = out["rewrite"][0], out["speculative"][0][1]
+        similarity = rewritten_vector = None
+        t1 = time.perf_counter()
+        if _normalize(rewritten) != _normalize(inputs["input"]):
+            rewritten_vector = self.embeddings.embed_query(rewritten)
+            similarity = _cosine(vector, rewritten_vector)
+        reason, similarity = self._verdict(similarity)
+        redo = None
+        if reason == "changed":  # timed from the embedding, which the sequential chain would also make
+            redo = self._retrieve(rewritten, rewritten_vector, config), time.perf_counter() - t1
+        return self._settle(t0, out["rewrite"], out["speculative"], reason, similarity, redo)
+
+    async def _arun(self, inputs: Dict[str, Any], config) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        out = await self._parallel.ainvoke(inputs, config)
+        rewritten, vector = out["rewrite"][0], out["speculative"][0][1]
+        similarity = rewritten_vector = None
+        t1 = time.perf_counter()
+        if _normalize(rewritten) != _normalize(inputs["input"]):
+            rewritten_vector = await self.embeddings.aembed_query(rewritten)
+            similarity = _cosine(vector, rewritten_vector)
+        reason, similarity = self._verdict(similarity)
+        redo = None
+        if reason == "changed":
+            redo = await self._aretrieve(rewritten, rewritten_vector, config), time.perf_counter() - t1
+        return self._settle(t0, out["rewrite"], out["speculative"], reason, similarity, redo)
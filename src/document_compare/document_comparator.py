@@ -1,13 +1,22 @@
+from __future__ import annotations
 import sys
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, List, Dict, Any
 from dotenv import load_dotenv
-import pandas as pd
 from langchain_core.output_parsers import JsonOutputParser
-from langchain.output_parsers import OutputFixingParser
 from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 from prompt.prompt_library import PROMPT_REGISTRY
-from model.models import SummaryResponse,PromptType
+from model.models import SummaryResponse,PromptType,ChangeFormat
+from utils.metrics import stage_timer, record_usage
+
+if TYPE_CHECKING:  # pandas is imported on first comparison, not at API startup
+    import pandas as pd
+
+RETRY_BACKOFF_SECONDS = 1.0
+
+_TIMERS = {s: stage_timer("comparator", s) for s in ("generate", "parse", "window")}
 
 class DocumentComparatorLLM:
     def __init__(self):
@@ -15,7 +24,10 @@ class DocumentComparatorLLM:
         self.log = CustomLogger().get_logger(__name__)
         self.loader = ModelLoader()
         self.llm = self.loader.load_llm()
+        self.budget = self.loader.load_token_budget()
+        self.last_usage = self.budget.usage()
         self.parser = JsonOutputParser(pydantic_object=SummaryResponse)
+        from langchain.output_parsers import OutputFixingParser
         self.fixing_parser = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
         self.prompt = PROMPT_REGISTRY[PromptType.DOCUMENT_COMPARISON.value]
         self.chain = self.prompt | self.llm | self.parser
@@ -23,21 +35,118 @@ class DocumentComparatorLLM:
 
     def compare_documents(self, combined_docs: str) -> pd.DataFrame:
         try:
-            inputs = {
-                "combined_docs": combined_docs,
-                "format_instruction": self.parser.get_format_instructions()
-            }
+            inputs = self.budget.fit_prompt_variable(
+                self.prompt,
+                {
+                    "combined_docs": combined_docs,
+                    "format_instruction": self.parser.get_format_instructions()
+                },
+                "combined_docs",
+            )
+            prompt_value = self.prompt.format_prompt(**inputs)
+            self.last_usage = self.budget.usage(prompt_tokens=self.budget.count_prompt(prompt_value))
 
-            self.log.info("Invoking document comparison LLM chain")
-            response = self.chain.invoke(inputs)
+            self.log.info("Invoking document comparison LLM chain", prompt_tokens=self.last_usage.prompt_tokens)
+            with _TIMERS["generate"].time():
+                raw = self.llm.invoke(prompt_value)
+            self.last_usage.add(completion_tokens=self.budget.count_output(raw))
+            record_usage("comparator", self.last_usage)
+            with _TIMERS["parse"].time():
+                response = self.parser.parse(getattr(raw, "content", raw))
             self.log.info("Chain invoked successfully", response_preview=str(response)[:200])
             return self._format_response(response)
         except Exception as e:
             self.log.error("Error in compare_documents", error=str(e))
             raise DocumentPortalException("Error comparing documents", sys)
 
+    async def astream_compare(
+        self,
+        windows: Iterable,
+        max_concurrency: int = 4,
+        max_retries: int = 2,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Compare page windows with at most `max_concurrency` LLM calls in flight and yield
+        events as each window completes: {"type": "row", ...ChangeFormat} per change, or
+        {"type": "error", ...} for a window that still failed after `max_retries` retries.
+        Windows are pulled lazily, so the first rows arrive before later pages are read.
+        """
+        self.last_usage = self.budget.usage()
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max(1, max_concurrency))
+        workers: List[asyncio.Task] = []
+
+        async def run_window(window):
+            try:
+                rows = await self._acompare_window_with_retry(window, max_retries)
+                await results.put((window, rows, None))
+            except Exception as e:
+                await results.put((window, None, e))
+            finally:
+                slots.release()
+
+        async def produce():
+            it = iter(windows)
+            try:
+                while True:
+                    await slots.acquire()
+                    window = await asyncio.to_thread(next, it, None)
+                    if window is None:
+                        slots.release()
+                        break
+                    workers.append(asyncio.create_task(run_window(window)))
+                await asyncio.gather(*workers)
+            finally:
+                await results.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await results.get()) is not None:
+                window, rows, error = item
+                pages = f"{window.first_page}-{window.last_page}"
+                if error is not None:
+                    self.log.error("Window comparison failed", pages=pages, error=str(error))
+                    yield {"type": "error", "window": window.index, "pages": pages, "error": str(error)}
+                    continue
+                for row in rows:
+                    yield {"type": "row", "window": window.index, "pages": pages, **row.model_dump()}
+            await producer  # surface page extraction errors
+        finally:
+            for task in [producer, *workers]:
+                task.cancel()
+
+    async def _acompare_window_with_retry(self, window, max_retries: int) -> List[ChangeFormat]:
+        for attempt in range(max_retries + 1):
+            try:
+                with _TIMERS["window"].time():
+                    return await self._acompare_window(window)
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                self.log.warning("Retrying window comparison", window=window.index, attempt=attempt + 1, error=str(e))
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        return []
+
+    async def _acompare_window(self, window) -> List[ChangeFormat]:
+        inputs = self.budget.fit_prompt_variable(
+            self.prompt,
+            {"combined_docs": window.text, "format_instruction": self.parser.get_format_instructions()},
+            "combined_docs",
+        )
+        prompt_value = self.prompt.format_prompt(**inputs)
+        prompt_tokens = self.budget.count_prompt(prompt_value)
+        with _TIMERS["generate"].time():
+            raw = await self.llm.ainvoke(prompt_value)
+        usage = self.budget.usage(prompt_tokens=prompt_tokens, completion_tokens=self.budget.count_output(raw))
+        self.last_usage.add(usage.prompt_tokens, usage.completion_tokens)
+        record_usage("comparator", usage)
+        with _TIMERS["parse"].time():
+            parsed = self.parser.parse(getattr(raw, "content", raw))
+        return SummaryResponse.model_validate(parsed).root
+
     def _format_response(self, response_parsed: list[dict]) -> pd.DataFrame: #type: ignore
         try:
+            import pandas as pd
             df = pd.DataFrame(response_parsed)
             return df
         except Exception as e:
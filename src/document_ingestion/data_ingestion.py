@@ -2,17 +2,18 @@ from __future__ import annotations
 import os
 import sys
 import json
+import time
 import uuid
 import hashlib
 import shutil
 from pathlib import Path
+from dataclasses import dataclass
+from itertools import zip_longest
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Iterable, List, Optional, Dict, Any
+from typing import Iterable, Iterator, List, Optional, Dict, Any
 
-import fitz  # PyMuPDF
-from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 
 from utils.model_loader import ModelLoader
@@ -21,42 +22,118 @@ from exception.custom_exception import DocumentPortalException
 
 from utils.file_io import generate_session_id, save_uploaded_files
 from utils.document_ops import load_documents, concat_for_analysis, concat_for_comparison
+from utils.pdf_pages import iter_pdf_pages
+from utils.metrics import stage_timer
+from utils.vector_store import index_exists, index_lock, load_vectorstore, parse_reduction, save_vectorstore
 
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
 
+@dataclass
+class PageWindow:
+    """Aligned page range of the reference and actual PDFs, rendered for one comparison call."""
+    index: int
+    first_page: int  # 1-based, inclusive
+    last_page: int
+    text: str
+
+_FAISS_TIMERS = {s: stage_timer("faiss", s) for s in ("embed", "index_add", "load", "write")}
+# ingested_meta.json "rows" key scheme; version 1 keyed every chunk of a source without row_id as "src::"
+FINGERPRINT_VERSION = 2
+_INGEST_TIMERS = {s: stage_timer("ingest", s) for s in ("save", "parse", "split", "index")}
+
 # FAISS Manager (load-or-create)
 class FaissManager:
+    """
+    Load-or-create plus idempotent appends for one index directory. Wrap
+    load_or_create() and add_documents() in `with manager.locked():` so concurrent
+    ingests into the same session (threads or worker processes) are serialised.
+    """
     def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None):
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(parents=True, exist_ok=True)
         
         self.meta_path = self.index_dir / "ingested_meta.json"
-        self._meta: Dict[str, Any] = {"rows": {}}
-        
-        if self.meta_path.exists():
-            try:
-                self._meta = json.loads(self.meta_path.read_text(encoding="utf-8")) or {"rows": {}}
-            except Exception:
-                self._meta = {"rows": {}}
+        self._meta: Dict[str, Any] = self._load_meta()
         
 
         self.model_loader = model_loader or ModelLoader()
+        self.embedding_signature = self.model_loader.embedding_signature()
+        self.check_embedding_signature(self._meta, self.embedding_signature, self.index_dir)
         self.emb = self.model_loader.load_embeddings()
         self.vs: Optional[FAISS] = None
+
+        faiss_config = self.model_loader.config.get("fais_db", {})
+        self.storage = os.getenv("FAISS_STORAGE") or faiss_config.get("storage", "float32")
+        self.rescore = bool(faiss_config.get("rescore", False))
+        self.reduction = parse_reduction(os.getenv("FAISS_REDUCTION") or faiss_config.get("reduction"))
+
+    @staticmethod
+    def read_meta(index_dir: Path) -> Dict[str, Any]:
+        meta_path = Path(index_dir) / "ingested_meta.json"
+        if not meta_path.exists():
+            return {}
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8")) or {}
+        except Exception:
+            return {}
+
+    def _load_meta(self) -> Dict[str, Any]:
+        meta = self.read_meta(self.index_dir)
+        meta.setdefault("rows", {})
+        return meta
+
+    @contextmanager
+    def locked(self):
+        """Hold the index's exclusive write lock; metadata is re-read once it is acquired."""
+        with index_lock(self.index_dir):
+            self._meta = self._load_meta()
+            self.vs = None
+            yield self
+
+    @staticmethod
+    def check_embedding_signature(meta: Dict[str, Any], signature: str, index_dir: Path):
+        """Refuse to mix vectors from different embedding models in one index."""
+        built_with = meta.get("embedding")
+        if built_with and built_with != signature:
+            raise DocumentPortalException(
+                f"Index {index_dir} was built with embedding model '{built_with}', "
+                f"but the configured model is '{signature}'; re-ingest the documents", sys
+            )
         
     def _exists(self)-> bool:
-        return (self.index_dir / "index.faiss").exists() and (self.index_dir / "index.pkl").exists()
+        return index_exists(self.index_dir)
     
     @staticmethod
     def _fingerprint(text: str, md: Dict[str, Any]) -> str:
         src = md.get("source") or md.get("file_path")
         rid = md.get("row_id")
-        if src is not None:
-            return f"{src}::{'' if rid is None else rid}"
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if src is not None and rid is not None:
+            return f"{src}::{rid}"
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return digest if src is None else f"{src}::{digest}"
     
+    def _rekey_rows(self):
+        """Rebuild `rows` from the chunks in the loaded store, for meta written under an older key scheme."""
+        rows = {}
+        for doc_id in self.vs.index_to_docstore_id.values():
+            doc = self.vs.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                rows[self._fingerprint(doc.page_content, doc.metadata or {})] = True
+        self._meta["rows"] = rows
+        self._meta["fingerprints"] = FINGERPRINT_VERSION
+
+    @staticmethod
+    def _stamp(metadatas: List[Optional[dict]]) -> List[dict]:
+        """Copy chunk metadata with the ingest time, which the chunk_meta filter index reads."""
+        now = time.time()
+        return [dict(md or {}, ingested_at=now) for md in metadatas]
+
     def _save_meta(self):
-        self.meta_path.write_text(json.dumps(self._meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        self._meta["embedding"] = self.embedding_signature
+        self._meta["fingerprints"] = FINGERPRINT_VERSION
+        tmp = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        tmp.write_text(json.dumps(self._meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
         
         
     def add_documents(self,docs: List[Document]):
@@ -73,24 +150,36 @@ class FaissManager:
             new_docs.append(d)
             
         if new_docs:
-            self.vs.add_documents(new_docs)
-            self.vs.save_local(str(self.index_dir))
-            self._save_meta()
+            texts = [d.page_content for d in new_docs]
+            with _FAISS_TIMERS["embed"].time():
+                vectors = self.emb.embed_documents(texts)
+            with _FAISS_TIMERS["index_add"].time():
+                self.vs.add_embeddings(list(zip(texts, vectors)), metadatas=self._stamp([d.metadata for d in new_docs]))
+            with _FAISS_TIMERS["write"].time():
+                save_vectorstore(self.vs, self.index_dir, storage=self.storage, rescore=self.rescore, reduction=self.reduction)
+                self._save_meta()
         return len(new_docs)
     
     def load_or_create(self,texts:Optional[List[str]]=None, metadatas: Optional[List[dict]] = None):
         if self._exists():
-            self.vs = FAISS.load_local(
-                str(self.index_dir),
-                embeddings=self.emb,
-                allow_dangerous_deserialization=True,
-            )
+            with _FAISS_TIMERS["load"].time():
+                self.vs = load_vectorstore(self.index_dir, self.emb, read_only=False)
+            if self._meta.get("fingerprints") != FINGERPRINT_VERSION:
+                self._rekey_rows()
+                self._save_meta()
             return self.vs
         if not texts:
             raise DocumentPortalException("No existing FAISS index and no data to create one", sys)
         
-        self.vs = FAISS.from_texts(texts=texts, embedding=self.emb, metadatas=metadatas or [])
-        self.vs.save_local(str(self.index_dir))
+        with _FAISS_TIMERS["embed"].time():
+            vectors = self.emb.embed_documents(texts)
+        with _FAISS_TIMERS["index_add"].time():
+            self.vs = FAISS.from_embeddings(list(zip(texts, vectors)), embedding=self.emb, metadatas=self._stamp(metadatas or [{}] * len(texts)))
+        for text, md in zip(texts, metadatas or [{}] * len(texts)):
+            self._meta["rows"][self._fingerprint(text, md or {})] = True
+        with _FAISS_TIMERS["write"].time():
+            save_vectorstore(self.vs, self.index_dir, storage=self.storage, rescore=self.rescore, reduction=self.reduction)
+            self._save_meta()
         return self.vs
         
         
@@ -132,8 +221,10 @@ class ChatIngestor:
         return base # fallback: "faiss_index/"
         
     def _split(self, docs: List[Document], chunk_size=1000, chunk_overlap=200) -> List[Document]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter  # slow import; ingest-only
         splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        chunks = splitter.split_documents(docs)
+        with _INGEST_TIMERS["split"].time():
+            chunks = splitter.split_documents(docs)
         self.log.info("Documents split", chunks=len(chunks), chunk_size=chunk_size, overlap=chunk_overlap)
         return chunks
     
@@ -144,8 +235,10 @@ class ChatIngestor:
         chunk_overlap: int = 200,
         k: int = 5,):
         try:
-            paths = save_uploaded_files(uploaded_files, self.temp_dir)
-            docs = load_documents(paths)
+            with _INGEST_TIMERS["save"].time():
+                paths = save_uploaded_files(uploaded_files, self.temp_dir)
+            with _INGEST_TIMERS["parse"].time():
+                docs = load_documents(paths)
             if not docs:
                 raise ValueError("No valid documents loaded")
             
@@ -155,12 +248,13 @@ class ChatIngestor:
             texts = [c.page_content for c in chunks]
             metas = [c.metadata for c in chunks]
             
-            try:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-            except Exception:
-                vs = fm.load_or_create(texts=texts, metadatas=metas)
-                
-            added = fm.add_documents(chunks)
+            with _INGEST_TIMERS["index"].time(), fm.locked():
+                try:
+                    vs = fm.load_or_create(texts=texts, metadatas=metas)
+                except Exception:
+                    vs = fm.load_or_create(texts=texts, metadatas=metas)
+                    
+                added = fm.add_documents(chunks)
             self.log.info("FAISS index updated", added=added, index=str(self.faiss_dir))
             
             return vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
@@ -201,13 +295,14 @@ class DocHandler:
             self.log.error("Failed to save PDF", error=str(e), session_id=self.session_id)
             raise DocumentPortalException(f"Failed to save PDF: {str(e)}", e) from e
 
+    def iter_pdf_pages(self, pdf_path: str) -> Iterator[str]:
+        """Stream formatted pages in order (parallel extraction for large PDFs)."""
+        for page_num, text in iter_pdf_pages(pdf_path):
+            yield f"\n--- Page {page_num + 1} ---\n{text}"
+
     def read_pdf(self, pdf_path: str) -> str:
         try:
-            text_chunks = []
-            with fitz.open(pdf_path) as doc:
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}")  # type: ignore
+            text_chunks = list(self.iter_pdf_pages(pdf_path))
             text = "\n".join(text_chunks)
             self.log.info("PDF read successfully", pdf_path=pdf_path, session_id=self.session_id, pages=len(text_chunks))
             return text
@@ -244,23 +339,64 @@ class DocumentComparator:
             self.log.error("Error saving PDF files", error=str(e), session=self.session_id)
             raise DocumentPortalException("Error saving files", e) from e
 
+    def iter_pdf_pages(self, pdf_path: Path) -> Iterator[str]:
+        """Stream formatted non-empty pages in order (parallel extraction for large PDFs)."""
+        for page_num, text in iter_pdf_pages(str(pdf_path), reject_encrypted=True):
+            if text.strip():
+                yield f"\n --- Page {page_num + 1} --- \n{text}"
+
     def read_pdf(self, pdf_path: Path) -> str:
         try:
-            with fitz.open(pdf_path) as doc:
-                if doc.is_encrypted:
-                    raise ValueError(f"PDF is encrypted: {pdf_path.name}")
-                parts = []
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()  # type: ignore
-                    if text.strip():
-                        parts.append(f"\n --- Page {page_num + 1} --- \n{text}")
+            parts = list(self.iter_pdf_pages(pdf_path))
             self.log.info("PDF read successfully", file=str(pdf_path), pages=len(parts))
             return "\n".join(parts)
         except Exception as e:
             self.log.error("Error reading PDF", file=str(pdf_path), error=str(e))
             raise DocumentPortalException("Error reading PDF", e) from e
 
+    def iter_page_windows(self, reference_path: Path, actual_path: Path, window_pages: int = 10) -> Iterator[PageWindow]:
+        """
+        Pair pages of both PDFs by page number and yield them in windows of `window_pages`.
+        Pages are extracted lazily, so the first window is ready without reading whole files.
+        """
+        try:
+            if window_pages < 1:
+                raise ValueError("window_pages must be >= 1")
+            ref_pages = iter_pdf_pages(str(reference_path), reject_encrypted=True)
+            act_pages = iter_pdf_pages(str(actual_path), reject_encrypted=True)
+            batch: List[tuple] = []
+            index = 0
+            for ref, act in zip_longest(ref_pages, act_pages):
+                batch.append((ref, act))
+                if len(batch) == window_pages:
+                    yield self._render_window(index, batch, Path(reference_path), Path(actual_path))
+                    index += 1
+                    batch = []
+            if batch:
+                yield self._render_window(index, batch, Path(reference_path), Path(actual_path))
+                index += 1
+            self.log.info("Page windows generated", windows=index, window_pages=window_pages, session=self.session_id)
+        except Exception as e:
+            self.log.error("Error generating page windows", error=str(e), session=self.session_id)
+            raise DocumentPortalException("Error generating page windows", e) from e
+
+    @staticmethod
+    def _render_window(index: int, batch: List[tuple], reference_path: Path, actual_path: Path) -> PageWindow:
+        first_page = (batch[0][0] or batch[0][1])[0] + 1
+        def render(pages) -> str:
+            out = []
+            for offset, page in enumerate(pages):
+                if page is None:
+                    out.append(f"\n --- Page {first_page + offset} --- \n(page missing)")
+                else:
+                    out.append(f"\n --- Page {page[0] + 1} --- \n{page[1] if page[1].strip() else '(empty page)'}")
+            return "\n".join(out)
+        text = (
+            f"Document: {reference_path.name}\n{render(r for r, _ in batch)}"
+            f"\n\nDocument: {actual_path.name}\n{render(a for _, a in batch)}"
+        )
+        return PageWindow(index=index, first_page=first_page, last_page=first_page + len(batch) - 1, text=text)
+
     def combine_documents(self) -> str:
         try:
             doc_parts = []
@@ -277,7 +413,7 @@ class DocumentComparator:
 
     def clean_old_sessions(self, keep_latest: int = 3):
         try:
-            sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir()], reverse=True)
+            sessions = sorted([f for f in self.base_dir.iterdir() if f.is_dir()], key=lambda f: f.stat().st_mtime, reverse=True)
             for folder in sessions[keep_latest:]:
                 shutil.rmtree(folder, ignore_errors=True)
                 self.log.info("Old session folder deleted", path=str(folder))
@@ -1,9 +1,25 @@
+import os
+import copy
+from functools import lru_cache
+
 import yaml
 
-def load_config(config_path: str = "config\config.yaml") -> dict:
-    with open(config_path,"r") as file:
-        config = yaml.safe_load(file)
-        # print(config)
-    return config
+# config/config.yaml next to this package, independent of the working directory;
+# CONFIG_PATH overrides it.
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(_PROJECT_ROOT, "config", "config.yaml")
+
+
+@lru_cache(maxsize=None)
+def _read_config(config_path: str) -> dict:
+    with open(config_path, "r") as file:
+        return yaml.safe_load(file)
+
 
-load_config()
\ No newline at end of file
+def load_config(config_path: str = None) -> dict:
+    """
+    Parsed config (read from disk once per process per path). Returns a copy,
+    so callers may modify their dict freely.
+    """
+    config_path = config_path or os.getenv("CONFIG_PATH", DEFAULT_CONFIG_PATH)
+    return copy.deepcopy(_read_config(os.path.abspath(config_path)))
@@ -3,13 +3,8 @@ from pathlib import Path
 from datetime import datetime, timezone
 from typing import Iterable, List, Optional, Dict, Any
 
-import fitz
-from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 
-from utils.model_loader import ModelLoader
 from logger.custom_logger import CustomLogger
 from exception.custom_exception import DocumentPortalException
 
@@ -21,6 +16,8 @@ def load_documents(paths: Iterable[Path])-> List[Document]:
     """Load docs using appropriate loader based on extension."""
     docs: List[Document] = []
     try:
+        # loaders pull in pypdf/docx2txt; import them only when documents are loaded
+        from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
         for p in paths:
             ext = p.suffix.lower()
             if ext == ".pdf":
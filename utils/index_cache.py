@@ -0,0 +1,74 @@
+"""
+Per-process LRU cache of loaded FAISS vector stores, so a chat session's index is
+read from disk once instead of on every query. Entries are keyed by directory and
+index name and revalidated against the mtime and size of the index file and its
+delta segment, so re-ingesting a session is picked up on the next lookup.
+
+A store dropped from the cache (LRU eviction, a newer version, evict()) may still
+be in use by a caller, so it is not closed there: every loaded store closes its
+SQLite docstore once the last reference to it is gone.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from logger.custom_logger import CustomLogger
+from utils.metrics import record_cache
+from utils.vector_store import vectorstore_closer
+
+log = CustomLogger().get_logger(__name__)
+
+INDEX_CACHE_SIZE = int(os.getenv("INDEX_CACHE_SIZE", "16"))
+
+
+class VectorStoreCache:
+    def __init__(self, max_entries: int = INDEX_CACHE_SIZE):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Tuple, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(index_dir: str, index_name: str) -> Tuple:
+        version = []
+        for name in (f"{index_name}.faiss", f"{index_name}.delta.faiss"):
+            try:
+                st = os.stat(os.path.join(index_dir, name))
+                version.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def get(self, index_dir: str, index_name: str, load: Callable[[], Any]) -> Any:
+        """Return the cached store for (index_dir, index_name), calling `load()` on a miss."""
+        key = (os.path.abspath(index_dir), index_name)
+        version = self._version(index_dir, index_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                record_cache("faiss_index", True)
+                return entry[1]
+        record_cache("faiss_index", False)
+        store = load()
+        weakref.finalize(store, vectorstore_closer(store))
+        if self.max_entries:
+            with self._lock:
+                self._entries[key] = (version, store)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return store
+
+    def evict(self, index_dir: str, index_name: Optional[str] = None) -> None:
+        path = os.path.abspath(index_dir)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path and index_name in (None, k[1])]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+INDEX_CACHE = VectorStoreCache()
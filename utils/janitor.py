@@ -0,0 +1,275 @@
+"""
+Background garbage collection for per-request session data and indexes.
+
+Each configured area (config.yaml `janitor.areas`) is a directory whose children
+matching its patterns are session entries (e.g. data/document_compare/session_*).
+A sweep removes entries idle for longer than the area's TTL, then, while the total
+size of all entries exceeds the quota, the least recently used ones.
+
+Last access is the newest mtime inside an entry; readers that do not write (chat
+queries) call `touch()`. Entries registered with `in_use()` in this process, or
+touched within `min_age_seconds` by any process, are never removed. `in_use()` is
+per process: with several workers, an entry another worker is using is protected
+only by that worker's writes and `touch()` calls keeping it younger than
+`min_age_seconds`, so that must exceed the longest gap between them in a request.
+Sweeps across worker processes are serialised with a lock file.
+
+The background thread is off unless `janitor.enabled` (or JANITOR_ENABLED=1) is
+set: the default areas also match the sample sessions checked into the repo.
+"""
+from __future__ import annotations
+import os
+import time
+import shutil
+import fnmatch
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from logger.custom_logger import CustomLogger
+from utils.config_loader import load_config
+from utils.index_cache import INDEX_CACHE
+from utils.metrics import JANITOR_RECLAIMED_BYTES, JANITOR_REMOVED, SESSION_DISK_BYTES
+
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps are not serialised across processes
+    fcntl = None
+
+log = CustomLogger().get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class Area:
+    name: str
+    path: Path
+    ttl_seconds: float
+    patterns: Tuple[str, ...] = ("session_*",)
+
+
+@dataclass
+class Entry:
+    area: Area
+    path: Path
+    size: int
+    last_access: float
+
+
+_in_use: Dict[str, int] = {}
+_in_use_lock = threading.Lock()
+
+
+def _key(path) -> str:
+    return os.path.abspath(str(path))
+
+
+@contextmanager
+def in_use(*paths):
+    """Protect session paths from collection for the duration of the block."""
+    keys = [_key(p) for p in paths if p]
+    with _in_use_lock:
+        for k in keys:
+            _in_use[k] = _in_use.get(k, 0) + 1
+    try:
+        yield
+    finally:
+        with _in_use_lock:
+            for k in keys:
+                if _in_use.get(k, 0) <= 1:
+                    _in_use.pop(k, None)
+                else:
+                    _in_use[k] -= 1
+
+
+def touch(path) -> None:
+    """Record a read access to a session entry (sets its mtime to now)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _is_in_use(path: Path) -> bool:
+    key = _key(path)
+    with _in_use_lock:
+        return any(k == key or k.startswith(key + os.sep) for k in _in_use)
+
+
+def _usage(path: Path) -> Tuple[int, float]:
+    """(bytes on disk, newest mtime) of a file or directory tree."""
+    st = path.stat()
+    if not path.is_dir():
+        return getattr(st, "st_blocks", 0) * 512 or st.st_size, st.st_mtime
+    size, newest = 0, st.st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in dirs:
+            try:
+                newest = max(newest, os.lstat(os.path.join(root, name)).st_mtime)
+            except OSError:
+                continue
+        for name in files:
+            try:
+                s = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            newest = max(newest, s.st_mtime)
+            size += getattr(s, "st_blocks", 0) * 512 or s.st_size
+    return size, newest
+
+
+class Janitor:
+    def __init__(
+        self,
+        areas: Sequence[Area],
+        quota_bytes: Optional[int] = None,
+        interval_seconds: float = 300,
+        min_age_seconds: float = 600,
+        lock_path: Optional[str] = None,
+        enabled: bool = True,
+    ):
+        self.areas = list(areas)
+        self.quota_bytes = quota_bytes
+        self.interval_seconds = interval_seconds
+        self.min_age_seconds = min_age_seconds
+        self.lock_path = lock_path
+        self.enabled = enabled
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[dict] = None) -> "Janitor":
+        cfg = (config or load_config()).get("janitor", {})
+        areas = [
+            Area(
+                name=a.get("name") or a["path"],
+                path=Path(a["path"]),
+                ttl_seconds=float(a.get("ttl_hours", 24)) * 3600,
+                patterns=tuple(a.get("patterns", ["session_*"])),
+            )
+            for a in cfg.get("areas", [])
+        ]
+        quota_gb = cfg.get("quota_gb")
+        return cls(
+            areas,
+            quota_bytes=int(float(quota_gb) * 1024 ** 3) if quota_gb else None,
+            interval_seconds=float(cfg.get("interval_seconds", 300)),
+            min_age_seconds=float(cfg.get("min_age_seconds", 600)),
+            lock_path=cfg.get("lock_file"),
+            enabled=os.getenv("JANITOR_ENABLED", "1" if cfg.get("enabled", False) else "0") != "0",
+        )
+
+    # ---------- Sweeping ----------
+
+    def entries(self) -> Iterator[Entry]:
+        seen = set()
+        for area in self.areas:
+            if not area.path.is_dir():
+                continue
+            for child in area.path.iterdir():
+                if not any(fnmatch.fnmatch(child.name, p) for p in area.patterns):
+                    continue
+                key = _key(child)
+                if key in seen:
+                    continue
+                seen.add(key)
+                try:
+                    size, last_access = _usage(child)
+                except OSError:  # removed concurrently
+                    continue
+                yield Entry(area, child, size, last_access)
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, int]:
+        """One TTL + quota pass; returns {"removed": n, "bytes": reclaimed}."""
+        now = time.time() if now is None else now
+        stats = {"removed": 0, "bytes": 0}
+        with self._exclusive() as acquired:
+            if not acquired:
+                return stats
+            entries = list(self.entries())
+            for area in self.areas:
+                SESSION_DISK_BYTES.labels(area.name).set(sum(e.size for e in entries if e.area is area))
+
+            kept: List[Entry] = []
+            for e in entries:
+                if now - e.last_access > e.area.ttl_seconds and self._removable(e, now):
+                    self._remove(e, "ttl", stats)
+                else:
+                    kept.append(e)
+
+            if self.quota_bytes is not None:
+                total = sum(e.size for e in kept)
+                for e in sorted(kept, key=lambda e: e.last_access):
+                    if total <= self.quota_bytes:
+                        break
+                    if self._removable(e, now):
+                        self._remove(e, "quota", stats)
+                        total -= e.size
+                if total > self.quota_bytes:
+                    log.warning("Session data over quota; remaining entries are in use or recently accessed", total_bytes=total, quota_bytes=self.quota_bytes)
+        if stats["removed"]:
+            log.info("Janitor sweep", **stats)
+        return stats
+
+    def _removable(self, entry: Entry, now: float) -> bool:
+        return now - entry.last_access >= self.min_age_seconds and not _is_in_use(entry.path)
+
+    def _remove(self, entry: Entry, reason: str, stats: Dict[str, int]) -> None:
+        if entry.path.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+            INDEX_CACHE.evict(str(entry.path))
+        else:
+            try:
+                entry.path.unlink()
+            except OSError:
+                return
+        JANITOR_REMOVED.labels(entry.area.name, reason).inc()
+        JANITOR_RECLAIMED_BYTES.labels(entry.area.name, reason).inc(entry.size)
+        stats["removed"] += 1
+        stats["bytes"] += entry.size
+        log.info("Session data removed", path=str(entry.path), reason=reason, bytes=entry.size)
+
+    @contextmanager
+    def _exclusive(self):
+        if not self.lock_path or fcntl is None:
+            yield True
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        with open(self.lock_path, "a") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:  # another worker is sweeping
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ---------- Background thread ----------
+
+    def start(self) -> None:
+        if self._thread is not None or not self.areas:
+            return
+        if not self.enabled:
+            log.info("Janitor disabled", areas=[a.name for a in self.areas])
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+        self._thread.start()
+        log.info("Janitor started", areas=[a.name for a in self.areas], quota_bytes=self.quota_bytes)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                log.error("Janitor sweep failed", error=str(e))
+            self._stop.wait(self.interval_seconds)
@@ -0,0 +1,258 @@
+"""
+Local models selected through ModelLoader: a CPU embedding model (EMBEDDING_PROVIDER=local),
+a CPU cross-encoder for reranking (RERANKER_PROVIDER=cross_encoder) and deterministic
+stand-ins for the hosted models (LLM_PROVIDER=fake, EMBEDDING_PROVIDER=hash,
+RERANKER_PROVIDER=hash) for offline benchmarks and evaluation.
+"""
+import re
+import json
+import time
+import zlib
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PAGE_MARKER = re.compile(r"--- Page (\d+) ---")
+_PIECE = re.compile(r"\S+\s*")
+_FOLLOW_UP = re.compile(r"\b(it|its|this|that|these|those|they|them|their)\b", re.IGNORECASE)
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Feature-hashed bag of words, L2-normalised. Stable across processes and runs,
+    so texts sharing words land close together without any model download.
+    `latency_ms` is slept once per call, to mimic a hosted embedding API.
+    """
+
+    def __init__(self, dim: int = 384, latency_ms: float = 0.0):
+        self.dim = int(dim)
+        self.latency_ms = float(latency_ms)
+
+    def _delay(self) -> None:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._delay()
+        return [self._embed(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._delay()
+        return self._embed(text).tolist()
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Sentence-transformers model on CPU, with either the PyTorch or the ONNX Runtime
+    backend. `num_threads` caps intra-op threads so embedding does not starve the
+    API workers; `quantized` loads the int8 ONNX export (or applies dynamic int8
+    quantization to the PyTorch Linear layers).
+    sentence-transformers (and onnxruntime/optimum for the ONNX backend) are
+    optional dependencies, imported only when this provider is used.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = "torch",
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        quantized: bool = False,
+        quantized_file: str = "onnx/model_qint8_avx512.onnx",
+        normalize: bool = True,
+    ):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = int(batch_size)
+        self.normalize = normalize
+        self.quantized = bool(quantized)
+
+        model_kwargs: dict = {}
+        if backend == "onnx":
+            if num_threads:
+                import onnxruntime as ort
+                options = ort.SessionOptions()
+                options.intra_op_num_threads = int(num_threads)
+                options.inter_op_num_threads = 1
+                model_kwargs["session_options"] = options
+            if self.quantized:
+                model_kwargs["file_name"] = quantized_file
+        elif num_threads:
+            import torch
+            torch.set_num_threads(int(num_threads))
+
+        self.model = SentenceTransformer(model_name, device="cpu", backend=backend, model_kwargs=model_kwargs or None)
+        if backend == "torch" and self.quantized:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+class LocalCrossEncoder:
+    """
+    Sentence-transformers cross-encoder on CPU: scores (query, passage) pairs jointly,
+    which ranks far better than comparing independently computed embeddings.
+    `num_threads` caps intra-op threads as for LocalEmbeddings; sentence-transformers
+    is an optional dependency, imported only when this provider is used.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        backend: str = "torch",
+        num_threads: Optional[int] = None,
+        max_length: int = 512,
+    ):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        if num_threads and backend == "torch":
+            import torch
+            torch.set_num_threads(int(num_threads))
+        kwargs: dict = {"device": "cpu", "max_length": int(max_length)}
+        if backend != "torch":
+            kwargs["backend"] = backend
+        self.model = CrossEncoder(model_name, **kwargs)
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(
+            self.model.predict(pairs, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+            dtype=np.float32,
+        )
+
+
+class HashCrossEncoder:
+    """
+    Offline stand-in for LocalCrossEncoder: the share of distinct query words found in
+    the passage, so passages containing a rare query term (an identifier, a code) win.
+    """
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        scores = []
+        for query, passage in pairs:
+            terms = set(_WORD.findall(query.lower()))
+            words = set(_WORD.findall(passage.lower()))
+            scores.append(len(terms & words) / len(terms) if terms else 0.0)
+        return np.asarray(scores, dtype=np.float32)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers each prompt family in this repo with a well-formed,
+    deterministic response, after sleeping `latency_ms` plus output tokens at
+    `tokens_per_second` (and, if set, prompt tokens at `prompt_tokens_per_second`)
+    to mimic a hosted model's timing.
+    """
+
+    latency_ms: float = 200.0
+    tokens_per_second: float = 80.0
+    prompt_tokens_per_second: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    # ---------- Responses ----------
+
+    @staticmethod
+    def _respond(messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if "rewrite the query as a standalone question" in prompt:
+            # follow-ups that refer back are resolved against the previous question
+            question = str(messages[-1].content)
+            earlier = [m for m in messages[1:-1] if isinstance(m, HumanMessage)]
+            if earlier and _FOLLOW_UP.search(question):
+                return f"{question.rstrip(' ?')}, regarding: {earlier[-1].content}"
+            return question
+        if "Progressively summarize the conversation" in prompt:
+            words = _WORD.findall(prompt.split("Existing summary:", 1)[-1])
+            return " ".join(words[:60])
+        if "Compare the content in two PDFs" in prompt:
+            pages = sorted({int(p) for p in _PAGE_MARKER.findall(prompt)})
+            return json.dumps([{"Page": str(p), "Changes": "NO CHANGE"} for p in pages])
+        if '"SentimentTone"' in prompt and '"Summary"' in prompt:
+            words = _WORD.findall(prompt.split("Analyse this document", 1)[-1])[:40]
+            semantic = {"Summary": [" ".join(words)], "Language": "English", "SentimentTone": "Neutral"}
+            if '"Title"' in prompt:
+                semantic.update({
+                    "Title": "Not Available", "Author": [], "DateCreated": "Not Available",
+                    "LastModifiedDate": "Not Available", "Publisher": "Not Available", "PageCount": "Not Available",
+                })
+            return json.dumps(semantic)
+        # QA: echo the opening of the retrieved context
+        system = str(messages[0].content) if messages else ""
+        context = system.split("\n\n", 1)[-1]
+        return " ".join(_WORD.findall(context)[:50]) or "I don't know."
+
+    def _delay(self, text: str, messages: List[BaseMessage]) -> float:
+        tokens = max(1, len(text) // 4)
+        delay = self.latency_ms / 1000.0 + tokens / max(self.tokens_per_second, 1e-6)
+        if self.prompt_tokens_per_second > 0:
+            delay += sum(len(str(m.content)) for m in messages) / 4 / self.prompt_tokens_per_second
+        return delay
+
+    def _result(self, text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        text = self._respond(messages)
+        time.sleep(self._delay(text, messages))
+        return self._result(text)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        text = self._respond(messages)
+        await asyncio.sleep(self._delay(text, messages))
+        return self._result(text)
+
+    # ---------- Streaming: first token after the fixed latency, then tokens_per_second ----------
+
+    def _pieces(self, messages: List[BaseMessage]) -> Tuple[float, List[Tuple[str, float]]]:
+        text = self._respond(messages)
+        pieces = _PIECE.findall(text) or [text]
+        per_piece = [max(1, len(p) // 4) / max(self.tokens_per_second, 1e-6) for p in pieces]
+        first = max(0.0, self._delay(text, messages) - sum(per_piece))
+        return first, list(zip(pieces, per_piece))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        first, pieces = self._pieces(messages)
+        time.sleep(first)
+        for piece, delay in pieces:
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        first, pieces = self._pieces(messages)
+        await asyncio.sleep(first)
+        for piece, delay in pieces:
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
@@ -0,0 +1,246 @@
+"""
+Lightweight in-process metrics: counters, gauges, histograms and span timers,
+rendered in the Prometheus text exposition format for GET /metrics.
+
+Labelled children are resolved once (e.g. at import or construction time) and
+then updated with a lock-protected add, so a timed span costs ~1-2 microseconds.
+Metrics are per process; scrape each uvicorn worker or run one worker per pod.
+"""
+import bisect
+import threading
+from time import perf_counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond splits through multi-minute LLM calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_label_str(self.labelnames, key)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(perf_counter() - self._t0)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> _Timer:
+        """`with child.time(): ...` records the block's wall time in seconds."""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts, total = list(child._counts), child._sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))  # type: ignore
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))  # type: ignore
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))  # type: ignore
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "document_portal_stage_seconds", "Latency of pipeline stages", ("component", "stage")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "document_portal_request_seconds", "HTTP request latency", ("endpoint", "status")
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "document_portal_in_flight_requests", "Requests currently being served", ("endpoint",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "document_portal_llm_tokens_total", "LLM tokens by component and kind", ("component", "kind")
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "document_portal_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result")
+)
+CONTEXT_TOKENS = REGISTRY.counter(
+    "document_portal_rag_context_tokens_total", "RAG context tokens before and after compression", ("stage",)
+)
+RAG_SPECULATION = REGISTRY.counter(
+    "document_portal_rag_speculation_total", "Speculative retrievals by outcome (hit/miss)", ("outcome",)
+)
+RAG_SPECULATION_SAVED_SECONDS = REGISTRY.counter(
+    "document_portal_rag_speculation_saved_seconds_total", "Latency saved by reusing speculative retrievals"
+)
+RAG_ADAPTIVE_K = REGISTRY.histogram(
+    "document_portal_rag_adaptive_k", "Chunks kept per query by the adaptive top-k cutoff",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 32),
+)
+RAG_ADAPTIVE_CONTEXT_TOKENS = REGISTRY.counter(
+    "document_portal_rag_adaptive_context_tokens_total",
+    "Retrieved-context tokens with the adaptive cutoff and with the fixed k it replaces", ("retrieval",)
+)
+FEDERATED_SHARDS = REGISTRY.counter(
+    "document_portal_federated_shards_total", "Federated search shard outcomes (ok/timeout/not_started/error/missing)", ("status",)
+)
+
+JANITOR_REMOVED = REGISTRY.counter(
+    "document_portal_janitor_removed_total", "Session entries removed by area and reason (ttl/quota)", ("area", "reason")
+)
+JANITOR_RECLAIMED_BYTES = REGISTRY.counter(
+    "document_portal_janitor_reclaimed_bytes_total", "Bytes reclaimed by area and reason (ttl/quota)", ("area", "reason")
+)
+SESSION_DISK_BYTES = REGISTRY.gauge(
+    "document_portal_session_disk_bytes", "Bytes held by session entries per area at the last sweep", ("area",)
+)
+
+
+def stage_timer(component: str, stage: str) -> _HistogramChild:
+    """Resolve a stage histogram once; use as `with timer.time(): ...`."""
+    return STAGE_SECONDS.labels(component, stage)
+
+
+def record_usage(component: str, usage) -> None:
+    """Add a TokenUsage to the token counters."""
+    LLM_TOKENS.labels(component, "prompt").inc(usage.prompt_tokens)
+    LLM_TOKENS.labels(component, "completion").inc(usage.completion_tokens)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_speculation(hit: bool, saved_seconds: float) -> None:
+    RAG_SPECULATION.labels("hit" if hit else "miss").inc()
+    if hit:
+        RAG_SPECULATION_SAVED_SECONDS.labels().inc(max(saved_seconds, 0.0))
+
+
+def record_adaptive_cutoff(k: int, tokens: int, baseline_tokens: int) -> None:
+    RAG_ADAPTIVE_K.labels().observe(k)
+    RAG_ADAPTIVE_CONTEXT_TOKENS.labels("adaptive").inc(tokens)
+    RAG_ADAPTIVE_CONTEXT_TOKENS.labels("fixed_k").inc(baseline_tokens)
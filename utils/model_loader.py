@@ -1,9 +1,13 @@
 import os
 import sys
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
 from dotenv import load_dotenv
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, GoogleGenerativeAI
-from langchain_groq import ChatGroq
 from utils.config_loader import load_config
+from utils.token_budget import TokenBudget
+from utils.local_models import FakeChatModel, HashCrossEncoder, HashEmbeddings, LocalCrossEncoder, LocalEmbeddings
+from utils.metrics import record_cache
 
 from logger.custom_logger import CustomLogger
 from exception.custom_exception_archive import DocumentPortalException
@@ -11,22 +15,43 @@ from exception.custom_exception_archive import DocumentPortalException
 
 log = CustomLogger().get_logger(__name__)
 
+# API key each hosted provider needs; local providers (fake, hash) need none.
+PROVIDER_API_KEYS = {"google": "GOOGLE_API_KEY", "groq": "GROQ_API_KEY", "openai": "OPENAI_API_KEY"}
+
+# Model clients are shared by every ModelLoader in the process (the API builds one per
+# request), keyed by the config that produced them; warm_up() fills this at startup.
+_CLIENTS: Dict[Tuple, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _cached_client(key: Tuple, factory: Callable[[], Any]) -> Any:
+    client = _CLIENTS.get(key)
+    record_cache("model_client", client is not None)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = _CLIENTS[key] = factory()
+    return client
+
 class ModelLoader:
     """
     A utility class to load embedding models and llm models
     """
     def __init__(self,):
         load_dotenv()
-        self._validate_env()
         self.config = load_config()
+        self._validate_env()
         log.info("Configuration loaded successfully", config_keys = list(self.config.keys()))
 
     def _validate_env(self):
         """
         validate necessary environment variables.
-        Ensure API keys exist.
+        Ensure API keys exist for the providers actually in use.
         """
-        required_vars = ["GOOGLE_API_KEY","GROQ_API_KEY"]
+        llm_provider = self.config['llm'].get(os.getenv("LLM_PROVIDER", "groq"), {}).get('provider')
+        providers = {llm_provider, self.embedding_provider()}
+        required_vars = [PROVIDER_API_KEYS[p] for p in providers if p in PROVIDER_API_KEYS]
         self.api_keys = {key: os.getenv(key) for key in required_vars}
         missing = [k for k,v in self.api_keys.items() if not v]
         if missing:
@@ -35,28 +60,183 @@ class ModelLoader:
         log.info("Environment variables validated", available_keys = [k for k in self.api_keys if self.api_keys[k]])
     def load_embeddings(self):
         """
-        Load and return the embedding model
+        Load and return the embedding model (created once per process and config)
         """
+        emb_config = self.config['embedding_model']
+        key = ("embeddings", self.embedding_provider(), json.dumps(emb_config, sort_keys=True), os.getenv("HASH_EMBEDDING_LATENCY_MS"))
+        return _cached_client(key, lambda: self._create_embeddings(emb_config))
+
+    def _create_embeddings(self, emb_config: dict):
         try:
-            log.info("loading embedding model...")
-            model_name = self.config['embedding_model']['model_name']
+            provider = self.embedding_provider()
+            log.info("loading embedding model...", provider=provider)
+            if provider == "hash":
+                hashed = emb_config.get('hash', {})
+                return HashEmbeddings(
+                    dim=hashed.get('dim', 384),
+                    latency_ms=float(os.getenv("HASH_EMBEDDING_LATENCY_MS", hashed.get('latency_ms', 0))),
+                )
+            if provider == "local":
+                local = emb_config.get('local', {})
+                return LocalEmbeddings(
+                    model_name=local.get('model_name', "sentence-transformers/all-MiniLM-L6-v2"),
+                    backend=local.get('backend', "torch"),
+                    batch_size=local.get('batch_size', 32),
+                    num_threads=local.get('num_threads'),
+                    quantized=local.get('quantized', False),
+                    quantized_file=local.get('quantized_file', "onnx/model_qint8_avx512.onnx"),
+                    normalize=local.get('normalize', True),
+                )
+            model_name = emb_config['model_name']
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
             return GoogleGenerativeAIEmbeddings(model=model_name)
         except Exception as e:
             log.error("Error loading embedding model",error = str(e))
             raise DocumentPortalException("Failed to load embedding model", sys)
-    def load_llm(self):
+    def embedding_provider(self) -> str:
         """
-        Load and return the LLM Model.
+        Active embedding provider: EMBEDDING_PROVIDER env, else embedding_model.provider.
         """
-        llm_block = self.config['llm']
-        log.info("Loading LLM...")
+        return os.getenv("EMBEDDING_PROVIDER") or self.config['embedding_model'].get('provider', 'google')
+
+    def embedding_signature(self) -> str:
+        """
+        Identify the embedding space an index is built in, e.g. "google:models/text-embedding-004"
+        or "local:sentence-transformers/all-MiniLM-L6-v2:onnx:int8". Vectors from different
+        signatures must never share an index.
+        """
+        provider = self.embedding_provider()
+        emb_config = self.config['embedding_model']
+        if provider == "hash":
+            return f"hash:{emb_config.get('hash', {}).get('dim', 384)}"
+        if provider == "local":
+            local = emb_config.get('local', {})
+            parts = [provider, local.get('model_name', "sentence-transformers/all-MiniLM-L6-v2"), local.get('backend', "torch")]
+            if local.get('quantized', False):
+                parts.append("int8")
+            return ":".join(parts)
+        return f"{provider}:{emb_config['model_name']}"
+
+    def reranker_provider(self) -> str:
+        """
+        Active reranker: RERANKER_PROVIDER env, else reranker.provider ("none" disables reranking).
+        """
+        return os.getenv("RERANKER_PROVIDER") or self.config.get('reranker', {}).get('provider', 'none')
+
+    def load_reranker(self):
+        """
+        Load the second-stage reranker (created once per process and config, so its
+        score cache is shared by every request), or None when reranking is disabled.
+        """
+        provider = self.reranker_provider()
+        if provider in ("none", "", None):
+            return None
+        rr_config = self.config.get('reranker', {})
+        key = ("reranker", provider, json.dumps(rr_config, sort_keys=True))
+        return _cached_client(key, lambda: self._create_reranker(provider, rr_config))
+
+    def _create_reranker(self, provider: str, rr_config: dict):
+        from src.document_chat.reranker import Reranker
+        try:
+            log.info("loading reranker...", provider=provider)
+            if provider == "hash":
+                model = HashCrossEncoder()
+            elif provider == "cross_encoder":
+                ce = rr_config.get('cross_encoder', {})
+                model = LocalCrossEncoder(
+                    model_name=ce.get('model_name', "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+                    backend=ce.get('backend', "torch"),
+                    num_threads=ce.get('num_threads'),
+                    max_length=ce.get('max_length', 512),
+                )
+            else:
+                raise ValueError(f"Unsupported reranker provider: {provider}")
+            return Reranker(
+                model,
+                top_n=rr_config.get('top_n', 5),
+                fetch_k=rr_config.get('fetch_k', 20),
+                batch_size=rr_config.get('batch_size', 32),
+                cache_size=rr_config.get('cache_size', 4096),
+            )
+        except Exception as e:
+            log.error("Error loading reranker", error=str(e))
+            raise DocumentPortalException("Failed to load reranker", sys)
 
+    def compression_enabled(self) -> bool:
+        """
+        Whether RAG context is compressed: CONTEXT_COMPRESSION env (1/0), else compression.enabled.
+        """
+        env = os.getenv("CONTEXT_COMPRESSION")
+        if env is not None:
+            return env.strip().lower() in ("1", "true", "yes", "on")
+        return bool(self.config.get('compression', {}).get('enabled', False))
+
+    def load_compressor(self):
+        """
+        Extractive context compressor over the configured embeddings (one per process,
+        so its sentence-embedding cache is shared), or None when compression is disabled.
+        """
+        if not self.compression_enabled():
+            return None
+        cfg = self.config.get('compression', {})
+        key = ("compressor", self.embedding_signature(), json.dumps(cfg, sort_keys=True))
+        return _cached_client(key, lambda: self._create_compressor(cfg))
+
+    def _create_compressor(self, cfg: dict):
+        from src.document_chat.compression import ExtractiveCompressor
+        return ExtractiveCompressor(
+            self.load_embeddings(),
+            max_tokens=cfg.get('max_tokens', 800),
+            min_similarity=cfg.get('min_similarity'),
+            cache_size=cfg.get('cache_size', 20000),
+        )
+
+    def get_llm_config(self) -> dict:
+        """
+        Return the `llm` config block of the active provider (LLM_PROVIDER, default groq).
+        """
+        llm_block = self.config['llm']
         provider_key = os.getenv("LLM_PROVIDER","groq") # default groq
         if provider_key not in llm_block:
             log.error("LLM model not found in config",provider_key=provider_key)
             raise DocumentPortalException(f"LLM provider '{provider_key}' not found in config", sys)
-        
-        llm_config = llm_block[provider_key]
+        return llm_block[provider_key]
+
+    def load_token_budget(self) -> TokenBudget:
+        """
+        Load the token budget for the active LLM provider.
+        """
+        budget = TokenBudget.from_config(self.get_llm_config(), cache_dir=self.config.get("tokenizer", {}).get("cache_dir"))
+        log.info(
+            "Token budget loaded",
+            context_window=budget.context_window,
+            prompt_budget=budget.prompt_budget,
+            estimated=budget.estimated,
+        )
+        return budget
+
+    def load_llm(self):
+        """
+        Load and return the LLM Model (created once per process and config).
+        """
+        llm_config = self.get_llm_config()
+        overrides = tuple(os.getenv(f"FAKE_LLM_{n}") for n in ("LATENCY_MS", "TOKENS_PER_SECOND", "PROMPT_TOKENS_PER_SECOND"))
+        key = ("llm", json.dumps(llm_config, sort_keys=True), overrides)
+        return _cached_client(key, lambda: self._create_llm(llm_config))
+
+    def warm_up(self) -> None:
+        """
+        Create the LLM and embedding clients and the tokenizer ahead of the first request
+        (provider SDK imports and client setup otherwise land on it).
+        """
+        self.load_llm()
+        self.load_embeddings()
+        self.load_reranker()
+        self.load_token_budget().count("warm up")
+        log.info("Model clients warmed up", embedding=self.embedding_signature(), reranker=self.reranker_provider())
+
+    def _create_llm(self, llm_config: dict):
+        log.info("Loading LLM...")
         provider = llm_config.get('provider')
         model_name = llm_config.get('model_name')
         temperature = llm_config.get('temperature', 0.2)
@@ -64,14 +244,23 @@ class ModelLoader:
 
         log.info("Loading LLM", provider=provider,model=model_name,temperature=temperature,max_tokens=max_tokens)
 
+        # provider SDKs are imported on first use; they dominate import time
         if provider == "google":
+            from langchain_google_genai import GoogleGenerativeAI
             llm = GoogleGenerativeAI(
                 model=model_name,
                 temperature=temperature,
                 max_output_tokens=max_tokens
             )
             return llm
+        elif provider == "fake":
+            return FakeChatModel(
+                latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", llm_config.get('latency_ms', 200))),
+                tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", llm_config.get('tokens_per_second', 80))),
+                prompt_tokens_per_second=float(os.getenv("FAKE_LLM_PROMPT_TOKENS_PER_SECOND", llm_config.get('prompt_tokens_per_second', 0))),
+            )
         elif provider == "groq":
+            from langchain_groq import ChatGroq
             llm = ChatGroq(
                 model = model_name,
                 temperature=temperature,
@@ -79,6 +268,7 @@ class ModelLoader:
             return llm
 
         elif provider == "openai":
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model=model_name,
                 api_key=self.api_keys["OPENAI_API_KEY"],
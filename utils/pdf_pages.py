@@ -0,0 +1,87 @@
+from __future__ import annotations
+import os
+import atexit
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+# Below this many pages the process hand-off costs more than it saves.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+PDF_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all requests; spawn keeps workers safe under threaded servers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Worker: open the file independently and extract pages [start, stop)."""
+    import fitz  # PyMuPDF; imported on first use to keep API startup light
+    with fitz.open(pdf_path) as doc:
+        return [(i, doc.load_page(i).get_text()) for i in range(start, stop)]  # type: ignore
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    *,
+    workers: Optional[int] = None,
+    pages_per_task: int = PAGES_PER_TASK,
+    min_pages_for_parallel: int = PARALLEL_MIN_PAGES,
+    reject_encrypted: bool = False,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order, 0-based.
+
+    Large PDFs are split into page ranges extracted by the shared process pool; each
+    worker opens the file itself. Results are yielded as soon as the next range in
+    order is ready, so callers can consume pages incrementally. `workers` is this
+    call's parallelism: at most that many ranges are queued or running at once (and
+    held in memory ahead of the consumer), so one large PDF does not fill the pool's
+    queue ahead of other requests. It defaults to PDF_EXTRACT_WORKERS, the pool size;
+    `workers <= 1` forces in-process extraction.
+    """
+    pdf_path = str(pdf_path)
+    workers = PDF_WORKERS if workers is None else workers
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        if reject_encrypted and doc.is_encrypted:
+            raise ValueError(f"PDF is encrypted: {os.path.basename(pdf_path)}")
+        n_pages = doc.page_count
+        if workers <= 1 or n_pages < min_pages_for_parallel:
+            for i in range(n_pages):
+                yield i, doc.load_page(i).get_text()  # type: ignore
+            return
+
+    pool = _get_pool()
+    ranges = iter([(s, min(s + pages_per_task, n_pages)) for s in range(0, n_pages, pages_per_task)])
+    window: deque = deque()
+    try:
+        for start, stop in ranges:
+            window.append(pool.submit(_extract_range, pdf_path, start, stop))
+            if len(window) >= workers:
+                break
+        while window:
+            pages = window.popleft().result()
+            for start, stop in ranges:  # refill before yielding, so extraction overlaps the consumer
+                window.append(pool.submit(_extract_range, pdf_path, start, stop))
+                break
+            yield from pages
+    finally:
+        # consumer stopped early or a range failed: drop work that has not started
+        for fut in window:
+            fut.cancel()
@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Spaces acquisitions evenly so at most `rate_per_minute` calls start per minute.
+    A non-positive rate disables limiting.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute and rate_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
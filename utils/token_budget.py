@@ -0,0 +1,240 @@
+from __future__ import annotations
+import os
+import json
+from functools import lru_cache
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.prompt_values import PromptValue
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+
+log = CustomLogger().get_logger(__name__)
+
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_TOKENIZER = "cl100k_base"
+DEFAULT_PROMPT_RESERVE = 256
+CHARS_PER_TOKEN = 4           # fallback estimate when no local tokenizer is available
+MESSAGE_OVERHEAD_TOKENS = 4   # role/separator tokens per chat message
+TRUNCATION_MARKER = "\n...[truncated to fit the model context]..."
+
+
+@dataclass
+class TokenUsage:
+    """Prompt/completion token counts for one request (may span several LLM calls)."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    estimated: bool = False  # counted with the chars/4 fallback, not the model's tokenizer
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, prompt_tokens: int = 0, completion_tokens: int = 0) -> "TokenUsage":
+        self.prompt_tokens += int(prompt_tokens)
+        self.completion_tokens += int(completion_tokens)
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "estimated": self.estimated,
+        }
+
+
+class TokenBudget:
+    """
+    Counts tokens with a local tokenizer and trims prompt inputs to fit the model context.
+
+    Budget = context_window - max_output_tokens - prompt_reserve_tokens.
+    Uses tiktoken when its encoding is available locally, otherwise a chars/4 estimate
+    (`estimated`, also flagged on every TokenUsage from `usage()`). tiktoken downloads
+    the encoding on first use into TIKTOKEN_CACHE_DIR, else `cache_dir` (config
+    tokenizer.cache_dir); pre-cache it there with `python -m utils.token_budget` so
+    servers without network access count real tokens.
+    """
+
+    def __init__(
+        self,
+        context_window: int = DEFAULT_CONTEXT_WINDOW,
+        max_output_tokens: int = 2048,
+        prompt_reserve_tokens: int = DEFAULT_PROMPT_RESERVE,
+        tokenizer: str = DEFAULT_TOKENIZER,
+        cache_dir: Optional[str] = None,
+    ):
+        self.context_window = int(context_window)
+        self.max_output_tokens = int(max_output_tokens)
+        self.prompt_reserve_tokens = int(prompt_reserve_tokens)
+        self.tokenizer_name = tokenizer
+        self._encoding = self._load_encoding(tokenizer, cache_dir)
+        if self.prompt_budget <= 0:
+            raise DocumentPortalException(
+                f"Invalid token budget: context_window={self.context_window}, "
+                f"max_output_tokens={self.max_output_tokens}, reserve={self.prompt_reserve_tokens}"
+            )
+
+    @classmethod
+    def from_config(cls, llm_config: Dict[str, Any], cache_dir: Optional[str] = None) -> "TokenBudget":
+        """Build from one provider block of the `llm` section in config.yaml."""
+        return cls(
+            context_window=llm_config.get("context_window", DEFAULT_CONTEXT_WINDOW),
+            max_output_tokens=llm_config.get("max_output_tokens", 2048),
+            prompt_reserve_tokens=llm_config.get("prompt_reserve_tokens", DEFAULT_PROMPT_RESERVE),
+            tokenizer=llm_config.get("tokenizer", DEFAULT_TOKENIZER),
+            cache_dir=cache_dir,
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _load_encoding(name: str, cache_dir: Optional[str] = None):
+        # cached per process: tiktoken may try to fetch the BPE file on first use
+        if cache_dir:  # tiktoken's default cache is a temp dir; TIKTOKEN_CACHE_DIR wins
+            os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.abspath(cache_dir))
+        if os.getenv("TIKTOKEN_CACHE_DIR"):
+            os.makedirs(os.environ["TIKTOKEN_CACHE_DIR"], exist_ok=True)
+        try:
+            import tiktoken
+            return tiktoken.get_encoding(name)
+        except Exception as e:
+            log.warning(
+                "Local tokenizer unavailable, using character estimate; token usage is marked estimated",
+                tokenizer=name,
+                cache_dir=os.getenv("TIKTOKEN_CACHE_DIR"),
+                hint="pre-cache with: python -m utils.token_budget",
+                error=str(e),
+            )
+            return None
+
+    @property
+    def estimated(self) -> bool:
+        """True when counts are the chars/4 estimate instead of the tokenizer's."""
+        return self._encoding is None
+
+    def usage(self, prompt_tokens: int = 0, completion_tokens: int = 0) -> TokenUsage:
+        """A TokenUsage for counts made with this budget, flagged when they are estimates."""
+        return TokenUsage(prompt_tokens, completion_tokens, estimated=self.estimated)
+
+    @property
+    def prompt_budget(self) -> int:
+        return self.context_window - self.max_output_tokens - self.prompt_reserve_tokens
+
+    # ---------- Counting ----------
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        total = 0
+        for m in messages:
+            content = m.content if isinstance(m.content, str) else json.dumps(m.content)
+            total += self.count(content) + MESSAGE_OVERHEAD_TOKENS
+        return total
+
+    def count_prompt(self, prompt_value: Any) -> int:
+        """Count a formatted prompt (PromptValue, message list or plain string)."""
+        if isinstance(prompt_value, PromptValue):
+            return self.count_messages(prompt_value.to_messages())
+        if isinstance(prompt_value, (list, tuple)):
+            return self.count_messages(prompt_value)
+        return self.count(str(prompt_value))
+
+    def count_output(self, output: Any) -> int:
+        """Count an LLM completion, preferring provider-reported usage when present."""
+        usage = getattr(output, "usage_metadata", None)
+        if usage and usage.get("output_tokens"):
+            return int(usage["output_tokens"])
+        content = getattr(output, "content", output)
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        return self.count(content)
+
+    # ---------- Fitting ----------
+
+    def ensure_fits(self, prompt_tokens: int, what: str = "prompt") -> None:
+        if prompt_tokens > self.prompt_budget:
+            raise DocumentPortalException(
+                f"{what} needs {prompt_tokens} tokens but the budget is {self.prompt_budget} "
+                f"(context_window={self.context_window}, max_output_tokens={self.max_output_tokens})"
+            )
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the head of `text` within `max_tokens`, appending a truncation marker."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max(max_tokens - self.count(TRUNCATION_MARKER), 0)
+        if self._encoding is not None:
+            head = self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:keep])
+        else:
+            head = text[: keep * CHARS_PER_TOKEN]
+        return head + TRUNCATION_MARKER
+
+    def pack(self, texts: Sequence[str], max_tokens: int, separator: str = "\n\n") -> List[str]:
+        """
+        Greedily keep texts in rank order while they fit; texts that do not fit are skipped
+        so a shorter lower-ranked text can still use the remaining budget.
+        """
+        kept: List[str] = []
+        used = 0
+        sep_tokens = self.count(separator)
+        for t in texts:
+            cost = self.count(t) + (sep_tokens if kept else 0)
+            if used + cost > max_tokens:
+                continue
+            kept.append(t)
+            used += cost
+        return kept
+
+    def trim_history(self, messages: Sequence[BaseMessage], max_tokens: int) -> List[BaseMessage]:
+        """Keep the most recent messages that fit within `max_tokens`."""
+        kept: List[BaseMessage] = []
+        used = 0
+        for m in reversed(messages):
+            cost = self.count_messages([m])
+            if used + cost > max_tokens:
+                break
+            kept.append(m)
+            used += cost
+        kept.reverse()
+        return kept
+
+    def fit_prompt_variable(self, prompt, variables: Dict[str, Any], name: str) -> Dict[str, Any]:
+        """
+        Truncate `variables[name]` so the fully formatted `prompt` fits the budget.
+        Returns a new variables dict; raises if the fixed parts alone do not fit.
+        """
+        fixed = dict(variables, **{name: ""})
+        overhead = self.count_prompt(prompt.format_prompt(**fixed))
+        self.ensure_fits(overhead, what="prompt template")
+        original = variables.get(name) or ""
+        fitted = self.truncate(original, self.prompt_budget - overhead)
+        if fitted is not original:
+            log.warning(
+                "Prompt input truncated to fit token budget",
+                variable=name,
+                original_tokens=self.count(original),
+                budget=self.prompt_budget - overhead,
+            )
+        return dict(variables, **{name: fitted})
+
+
+if __name__ == "__main__":
+    # Pre-cache the tokenizer of every configured LLM (e.g. at image build time).
+    import sys
+    from utils.config_loader import load_config
+
+    config = load_config()
+    cache_dir = config.get("tokenizer", {}).get("cache_dir")
+    names = sorted({block.get("tokenizer", DEFAULT_TOKENIZER) for block in config.get("llm", {}).values()})
+    failed = [n for n in names if TokenBudget._load_encoding(n, cache_dir) is None]
+    print(f"tokenizers cached in {os.getenv('TIKTOKEN_CACHE_DIR')}: {', '.join(n for n in names if n not in failed) or 'none'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,896 @@
+"""
+FAISS persistence shared by ingestion and retrieval.
+
+A saved store is <name>.faiss plus <name>.docs.sqlite: chunk text and metadata in
+an indexed SQLite table, with a positions table mapping each vector to its chunk
+id and a chunk_meta table (source file, page, ingest time) that turns a
+MetadataFilter into the vector positions it allows, for pre-filtered searches
+(`search_subset`). Nothing is pickled, so loading needs no `allow_dangerous_deserialization`, and
+a search reads only the k chunks it returns; load time and memory do not grow
+with corpus text size.
+
+Vectors added to an existing store go to an append-only delta segment,
+<name>.delta.faiss, searched together with the base index; adding 10 chunks to a
+large index rewrites only the delta. Once the delta reaches
+FAISS_DELTA_MERGE_VECTORS it is folded into the base by a background thread.
+
+The base can be stored compactly (`storage`): float16, or int8 scalar-quantized
+per dimension, at 1/2 or 1/4 of the float32 size. With `rescore`, the exact float32
+vectors are also kept in <name>.f32. A query then takes FAISS_RESCORE_FACTOR x k
+candidates from the compact index and re-ranks them by exact distance, reading
+only those rows of the memory-mapped file (`RescoredIndex`).
+
+Vectors can also be reduced to fewer dimensions (`reduction`): truncated and
+re-normalised (Matryoshka-style models), or projected with a PCA trained on the
+store's vectors when it is written. The transform is saved inside <name>.faiss
+(an IndexPreTransform), so every search applies it to the query automatically.
+The delta segment is searched in the same reduced space, or at full dimension
+when the base is re-scored, so its distances match the base's.
+
+Every file is written to a temporary name and swapped in with os.replace, so
+readers never see a partial file. Writers hold `index_lock()` from load to save;
+readers take it shared while opening the files, and merges take it only for the
+final swap. The base index is memory-mapped read-only by default, so every
+uvicorn worker serving a session shares one page-cache copy. Indexes saved as
+<name>.pkl by older versions still load, and are converted on their next save.
+"""
+from __future__ import annotations
+import os
+import re
+import shutil
+import fnmatch
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, MutableMapping, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+
+from logger.custom_logger import CustomLogger
+from utils.metrics import stage_timer
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are atomic but not serialised across processes
+    fcntl = None
+
+log = CustomLogger().get_logger(__name__)
+
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(1 << 30)))
+DELTA_MERGE_VECTORS = int(os.getenv("FAISS_DELTA_MERGE_VECTORS", "10000"))
+RESCORE_FACTOR = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))  # candidates per result re-scored in float32
+STORAGE_MODES = ("float32", "float16", "int8")
+REDUCTION_METHODS = ("truncate", "pca")
+PCA_TRAIN_MAX = 100_000  # vectors sampled to train a PCA projection
+
+_MERGE_TIMER = stage_timer("faiss", "merge")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS positions (pos INTEGER PRIMARY KEY, id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chunk_meta (id TEXT PRIMARY KEY, source TEXT, file_name TEXT, page INTEGER, ingested_at REAL);
+CREATE INDEX IF NOT EXISTS chunk_meta_file ON chunk_meta (file_name);
+CREATE INDEX IF NOT EXISTS chunk_meta_ingested ON chunk_meta (ingested_at);
+CREATE INDEX IF NOT EXISTS positions_id ON positions (id);
+"""
+
+
+@dataclass
+class MetadataFilter:
+    """
+    Restricts a search to chunks from some source files (full path, stored file
+    name, or the name the file was uploaded under), a 1-based inclusive page range and/or an ingest-time window (epoch seconds).
+    Unset fields do not filter.
+    """
+    sources: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    ingested_after: Optional[float] = None
+    ingested_before: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not self.sources and all(
+            v is None for v in (self.page_from, self.page_to, self.ingested_after, self.ingested_before)
+        )
+
+    def where(self) -> Tuple[str, List]:
+        """SQL condition over chunk_meta (aliased m) and its parameters."""
+        clauses, params = [], []
+        if self.sources:
+            marks = ",".join("?" * len(self.sources))
+            globs = " OR ".join("m.file_name GLOB ?" for _ in self.sources)
+            clauses.append(f"(m.file_name IN ({marks}) OR m.source IN ({marks}) OR {globs})")
+            params += list(self.sources) * 2 + [_upload_glob(s) for s in self.sources]
+        if self.page_from is not None:
+            clauses.append("m.page >= ?")
+            params.append(self.page_from - 1)  # loaders store 0-based pages
+        if self.page_to is not None:
+            clauses.append("m.page <= ?")
+            params.append(self.page_to - 1)
+        if self.ingested_after is not None:
+            clauses.append("m.ingested_at >= ?")
+            params.append(self.ingested_after)
+        if self.ingested_before is not None:
+            clauses.append("m.ingested_at <= ?")
+            params.append(self.ingested_before)
+        return " AND ".join(clauses) or "1", params
+
+    def matches(self, metadata: Dict) -> bool:
+        """Python equivalent of where(), for stores without a chunk_meta table."""
+        source, file_name, page, ingested = _chunk_meta(metadata)
+        if self.sources and source not in self.sources and not (
+            file_name is not None
+            and any(file_name == s or fnmatch.fnmatchcase(file_name, _upload_glob(s)) for s in self.sources)
+        ):
+            return False
+        if (self.page_from is not None or self.page_to is not None) and page is None:
+            return False
+        if self.page_from is not None and page < self.page_from - 1:
+            return False
+        if self.page_to is not None and page > self.page_to - 1:
+            return False
+        if (self.ingested_after is not None or self.ingested_before is not None) and ingested is None:
+            return False
+        if self.ingested_after is not None and ingested < self.ingested_after:
+            return False
+        if self.ingested_before is not None and ingested > self.ingested_before:
+            return False
+        return True
+
+
+def _upload_glob(name: str) -> str:
+    """GLOB for the names save_uploaded_files stores an upload called `name` under."""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    safe = re.sub(r"[^a-zA-Z0-9_\-]", "_", stem).lower()
+    return f"{safe}_{'[0-9a-f]' * 6}{ext.lower()}"
+
+
+def _chunk_meta(metadata: Dict) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[float]]:
+    """(source, file name, page, ingested_at) of a chunk's metadata."""
+    source = metadata.get("source") or metadata.get("file_path")
+    page = metadata.get("page")
+    ingested = metadata.get("ingested_at")
+    return (
+        None if source is None else str(source),
+        None if source is None else os.path.basename(str(source)),
+        int(page) if isinstance(page, (int, float)) or (isinstance(page, str) and page.isdigit()) else None,
+        float(ingested) if isinstance(ingested, (int, float)) else None,
+    )
+
+
+def docs_path(folder: Union[str, Path], index_name: str = "index") -> Path:
+    return Path(folder) / f"{index_name}.docs.sqlite"
+
+
+def delta_path(folder: Union[str, Path], index_name: str = "index") -> Path:
+    return Path(folder) / f"{index_name}.delta.faiss"
+
+
+def vectors_path(folder: Union[str, Path], index_name: str = "index") -> Path:
+    return Path(folder) / f"{index_name}.f32"
+
+
+def index_exists(folder: Union[str, Path], index_name: str = "index") -> bool:
+    folder = Path(folder)
+    return (folder / f"{index_name}.faiss").exists() and (
+        docs_path(folder, index_name).exists() or (folder / f"{index_name}.pkl").exists()
+    )
+
+
+@contextmanager
+def index_lock(folder: Union[str, Path], index_name: str = "index", shared: bool = False, blocking: bool = True):
+    """
+    Per-index file lock (<name>.lock), exclusive for writers and shared for readers.
+    Yields False instead of waiting when blocking=False and the lock is held.
+    """
+    if fcntl is None:
+        yield True
+        return
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / f"{index_name}.lock", "a") as fh:
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fh, mode if blocking else mode | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _write_index(index, path: Path) -> None:
+    import faiss
+
+    tmp = path.with_name(path.name + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+def parse_reduction(value) -> Optional[Tuple[str, int]]:
+    """(method, dim) from "pca:256" / {"method": "pca", "dim": 256}; None for none/empty."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        method, dim = value.get("method"), value.get("dim")
+    else:
+        method, _, dim = str(value).partition(":")
+    method = (method or "none").strip().lower()
+    if method == "none":
+        return None
+    if method not in REDUCTION_METHODS or not str(dim).strip().isdigit() or int(dim) <= 0:
+        raise ValueError(f"Invalid FAISS reduction {value!r}; expected 'truncate:<dim>' or 'pca:<dim>'")
+    return method, int(dim)
+
+
+def _reduction_transforms(vectors: np.ndarray, reduction: Tuple[str, int]) -> List:
+    """Trained transforms mapping `vectors` to `reduction`'s dimensions; [] when not applicable."""
+    import faiss
+
+    method, dim = reduction
+    n, d = vectors.shape
+    if dim >= d:
+        return []
+    if method == "truncate":
+        return [faiss.RemapDimensionsTransform(d, dim, False), faiss.NormalizationTransform(dim)]
+    if n < d:
+        log.info("Too few vectors to train a PCA projection; keeping full dimensions", vectors=n, dim=d)
+        return []
+    pca = faiss.PCAMatrix(d, dim)
+    if n > PCA_TRAIN_MAX:
+        vectors = vectors[np.random.default_rng(0).choice(n, PCA_TRAIN_MAX, replace=False)]
+    pca.train(vectors)
+    return [pca]
+
+
+def _build_base(vectors: np.ndarray, metric_type: int, storage: str, reduction: Optional[Tuple[str, int]] = None):
+    """A new base index over `vectors` in the given storage mode, dimension-reduced if requested."""
+    import faiss
+
+    chain = _reduction_transforms(vectors, reduction) if reduction else []
+    if chain:
+        reduced = vectors
+        for transform in chain:
+            reduced = transform.apply(reduced)
+        index = faiss.IndexPreTransform(chain[-1], _build_base(reduced, metric_type, storage))
+        for transform in reversed(chain[:-1]):
+            index.prepend_transform(transform)
+        return index
+
+    d = vectors.shape[1]
+    if storage == "float32":
+        index = faiss.IndexFlat(d, metric_type)
+    elif storage in ("float16", "int8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if storage == "float16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(d, qtype, metric_type)
+        # widen the trained int8 ranges a little: vectors merged in later are clamped to them
+        index.sq.rangestat_arg = 0.05
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown FAISS storage mode {storage!r}; expected one of {STORAGE_MODES}")
+    index.add(vectors)
+    return index
+
+
+def storage_of(index) -> str:
+    """Storage mode of a base index ("float32", "float16", "int8", or the FAISS class name)."""
+    import faiss
+
+    if isinstance(index, (RescoredIndex, SegmentedIndex)):
+        return storage_of(index.base)
+    if isinstance(index, faiss.IndexPreTransform):
+        return storage_of(faiss.downcast_index(index.index))
+    if isinstance(index, faiss.IndexFlat):
+        return "float32"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return {faiss.ScalarQuantizer.QT_fp16: "float16", faiss.ScalarQuantizer.QT_8bit: "int8"}.get(
+            index.sq.qtype, "sq"
+        )
+    return type(index).__name__
+
+
+def _empty_delta(base):
+    """
+    An empty delta segment whose distances are comparable with `base`: a flat index
+    over the same space. That is the reduced space when `base` applies a transform,
+    except under a RescoredIndex, which returns exact full-dimension distances.
+    """
+    import faiss
+
+    if isinstance(base, RescoredIndex) or not isinstance(base, faiss.IndexPreTransform):
+        return faiss.IndexFlat(base.d, base.metric_type)
+    # clone_index cannot copy every VectorTransform type; a serialised copy can
+    chain = []
+    for i in range(base.chain.size()):
+        writer = faiss.VectorIOWriter()
+        faiss.write_VectorTransform(base.chain.at(i), writer)
+        reader = faiss.VectorIOReader()
+        reader.data = writer.data
+        chain.append(faiss.read_VectorTransform(reader))
+    delta = faiss.IndexPreTransform(chain[-1], faiss.IndexFlat(chain[-1].d_out, base.metric_type))
+    for transform in reversed(chain[:-1]):
+        delta.prepend_transform(transform)
+    return delta
+
+
+def exact_vectors(index) -> np.ndarray:
+    """
+    All vectors of `index` in float32: exact when kept in float32, decoded (or mapped
+    back from reduced dimensions) otherwise.
+    """
+    if isinstance(index, SegmentedIndex):
+        parts = [exact_vectors(index.base)]
+        if index.delta.ntotal:
+            parts.append(index.delta.reconstruct_n(0, index.delta.ntotal))
+        return np.vstack(parts)
+    if isinstance(index, RescoredIndex):
+        return np.array(index.vectors)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def keeps_exact_vectors(index) -> bool:
+    """Whether reconstruct() returns the exact float32 vectors that were added."""
+    import faiss
+
+    if isinstance(index, SegmentedIndex):
+        return keeps_exact_vectors(index.base)  # the delta is flat, in the base's space
+    return isinstance(index, RescoredIndex) or isinstance(index, faiss.IndexFlat)
+
+
+def searched_query(index, x: np.ndarray) -> np.ndarray:
+    """Queries `x` as `index` compares them: through any reduction transform."""
+    import faiss
+
+    if isinstance(index, SegmentedIndex):
+        return searched_query(index.base, x)  # the delta shares the base's space
+    if isinstance(index, faiss.IndexPreTransform):
+        for i in range(index.chain.size()):
+            x = index.chain.at(i).apply(np.ascontiguousarray(x, dtype=np.float32))
+    return x
+
+
+def searched_vectors(index, positions) -> np.ndarray:
+    """
+    Vectors at `positions` as `index` compares them: in reduced dimensions under a
+    transform and at stored precision, unlike reconstruct(), which maps them back.
+    """
+    import faiss
+
+    positions = np.asarray(positions, dtype=np.int64)
+    if isinstance(index, SegmentedIndex):
+        nb, in_base = index.base.ntotal, positions < index.base.ntotal
+        parts = [searched_vectors(index.base, positions[in_base])]
+        parts.append(searched_vectors(index.delta, positions[~in_base] - nb))
+        out = np.empty((len(positions), parts[0].shape[1]), dtype=np.float32)
+        out[in_base], out[~in_base] = parts
+        return out
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    if not len(positions):
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_batch(positions)
+
+
+class RescoredIndex:
+    """
+    A compact (float16/int8) base index whose candidates are re-ranked by exact
+    distance to float32 `vectors` (the memory-mapped <name>.f32). Each search takes
+    `factor` x k candidates; only their rows of `vectors` are read.
+    """
+
+    def __init__(self, base, vectors: np.ndarray, factor: int = RESCORE_FACTOR):
+        self.base = base
+        self.vectors = vectors
+        self.factor = max(1, int(factor))
+        self.d = base.d
+        self.metric_type = base.metric_type
+        self.is_trained = True
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal
+
+    def search(self, x, k: int, params=None):
+        import faiss
+
+        kwargs = {"params": params} if params is not None else {}
+        _, cand = self.base.search(x, min(k * self.factor, self.base.ntotal) or k, **kwargs)
+        ip = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        D = np.full((len(x), k), -np.inf if ip else np.inf, dtype=np.float32)
+        I = np.full((len(x), k), -1, dtype=np.int64)
+        for row, (q, ids) in enumerate(zip(np.asarray(x, dtype=np.float32), cand)):
+            ids = ids[ids >= 0]
+            if not len(ids):
+                continue
+            order = np.argsort(ids)  # ascending offsets read the file sequentially
+            vecs = np.empty((len(ids), self.d), dtype=np.float32)
+            vecs[order] = self.vectors[ids[order]]
+            if ip:
+                dist = vecs @ q
+                best = np.argsort(-dist, kind="stable")[:k]
+            else:
+                dist = ((vecs - q) ** 2).sum(axis=1)
+                best = np.argsort(dist, kind="stable")[:k]
+            D[row, : len(best)] = dist[best]
+            I[row, : len(best)] = ids[best]
+        return D, I
+
+    def reconstruct(self, i: int):
+        return np.array(self.vectors[int(i)])
+
+    def reconstruct_batch(self, ids):
+        return np.array(self.vectors[np.asarray(ids, dtype=np.int64)])
+
+    def reconstruct_n(self, i0: int, n: int):
+        return np.array(self.vectors[i0 : i0 + n])
+
+
+def _open_vectors(path: Path, d: int) -> Optional[np.ndarray]:
+    if not path.exists():
+        return None
+    return np.memmap(path, dtype=np.float32, mode="r").reshape(-1, d)
+
+
+def _write_vectors(vectors: np.ndarray, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    np.ascontiguousarray(vectors, dtype=np.float32).tofile(tmp)
+    os.replace(tmp, path)
+
+
+class SegmentedIndex:
+    """
+    A base index plus an in-memory flat delta segment, searched as one index: delta
+    vectors take positions base.ntotal.. in order. Implements the part of the faiss
+    Index interface the LangChain FAISS wrapper uses; `add` appends to the delta.
+    """
+
+    def __init__(self, base, delta=None, base_stamp: Optional[Tuple[int, int]] = None):
+        self.base = base
+        self.delta = delta if delta is not None else _empty_delta(base)
+        self.base_stamp = base_stamp  # base file at load time; saving after a merge is refused
+        self.d = base.d
+        self.metric_type = base.metric_type
+        self.is_trained = True
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    def add(self, x) -> None:
+        self.delta.add(x)
+
+    def search(self, x, k: int, params=None):
+        kwargs = {"params": params} if params is not None else {}
+        D, I = self.base.search(x, k, **kwargs)
+        if self.delta.ntotal == 0:
+            return D, I
+        dD, dI = self.delta.search(x, k)
+        return self._merge(k, (D, I), (dD, dI))
+
+    def search_subset(self, x, k: int, positions: np.ndarray):
+        """search() restricted to `positions`, split into a selector per segment."""
+        nb = self.base.ntotal
+        in_base = positions < nb
+        if in_base.all():
+            return search_subset(self.base, x, k, positions)
+        delta_result = search_subset(self.delta, x, k, positions[~in_base] - nb)
+        if not in_base.any():
+            D, I = delta_result
+            return D, np.where(I >= 0, I + nb, -1)
+        return self._merge(k, search_subset(self.base, x, k, positions[in_base]), delta_result)
+
+    def _merge(self, k: int, base_result, delta_result):
+        """Combine per-segment (D, I), offsetting delta ids, best k first."""
+        import faiss
+
+        D, I = base_result
+        dD, dI = delta_result
+        dI = np.where(dI >= 0, dI + self.base.ntotal, -1)
+        D, I = np.hstack([D, dD]), np.hstack([I, dI])
+        worst = -np.inf if self.metric_type == faiss.METRIC_INNER_PRODUCT else np.inf
+        key = np.where(I >= 0, D, worst)
+        order = np.argsort(-key if self.metric_type == faiss.METRIC_INNER_PRODUCT else key, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def reconstruct(self, i: int):
+        i = int(i)
+        if i < self.base.ntotal:
+            return self.base.reconstruct(i)
+        return self.delta.reconstruct(i - self.base.ntotal)
+
+    def reconstruct_batch(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.empty((len(ids), self.d), dtype=np.float32)
+        in_base = ids < self.base.ntotal
+        if in_base.any():
+            out[in_base] = self.base.reconstruct_batch(ids[in_base])
+        if not in_base.all():
+            out[~in_base] = self.delta.reconstruct_batch(ids[~in_base] - self.base.ntotal)
+        return out
+
+    def reconstruct_n(self, i0: int, n: int):
+        nb, parts = self.base.ntotal, []
+        if i0 < nb:
+            parts.append(self.base.reconstruct_n(i0, min(n, nb - i0)))
+        if i0 + n > nb:
+            start = max(i0 - nb, 0)
+            parts.append(self.delta.reconstruct_n(start, i0 + n - nb - start))
+        return np.vstack(parts) if parts else np.zeros((0, self.d), dtype=np.float32)
+
+
+def search_subset(index, x, k: int, positions: np.ndarray):
+    """
+    k-nearest search among `positions` only (pre-filtering): a FAISS IDSelector
+    skips every other vector inside the scan, so a filter still yields k results.
+    """
+    import faiss
+
+    if isinstance(index, SegmentedIndex):
+        return index.search_subset(x, k, positions)
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(positions, dtype=np.int64))
+    return index.search(x, k, params=faiss.SearchParameters(sel=selector))
+
+
+def filter_positions(vs: FAISS, flt: MetadataFilter) -> np.ndarray:
+    """Vector positions of `vs` whose chunks match `flt` (chunk_meta lookup, else a metadata scan)."""
+    if isinstance(vs.docstore, SqliteDocstore):
+        return vs.docstore.positions_where(flt)
+    positions = []
+    for pos, doc_id in vs.index_to_docstore_id.items():
+        doc = vs.docstore.search(doc_id)
+        if isinstance(doc, Document) and flt.matches(doc.metadata or {}):
+            positions.append(pos)
+    return np.array(sorted(positions), dtype=np.int64)
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """Chunk store over SQLite; documents are fetched by id on demand."""
+
+    def __init__(self, path: Union[str, Path], read_only: bool = False):
+        self.path = Path(path).resolve()
+        self.read_only = read_only
+        uri = self.path.as_uri() + ("?mode=ro" if read_only else "")
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        if read_only:
+            self._conn.execute("PRAGMA query_only=1")
+        else:
+            self._conn.executescript(_SCHEMA)
+            self._backfill_chunk_meta()
+            self._conn.commit()
+        self.has_chunk_meta = bool(self._query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_meta'"))
+
+    def _backfill_chunk_meta(self) -> None:
+        """Fill chunk_meta for stores written before it existed."""
+        missing = self._conn.execute(
+            "SELECT d.id, d.metadata FROM docs d LEFT JOIN chunk_meta m ON m.id = d.id WHERE m.id IS NULL"
+        ).fetchall()
+        if missing:
+            self._conn.executemany(
+                "INSERT INTO chunk_meta (id, source, file_name, page, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                [(i, *_chunk_meta(json.loads(md))) for i, md in missing],
+            )
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [(i, d.page_content, json.dumps(d.metadata or {}, ensure_ascii=False, default=str)) for i, d in texts.items()]
+        meta = [(i, *_chunk_meta(d.metadata or {})) for i, d in texts.items()]
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT INTO docs (id, page_content, metadata) VALUES (?, ?, ?)", rows)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunk_meta (id, source, file_name, page, ingested_at) VALUES (?, ?, ?, ?, ?)", meta
+                )
+                self._conn.commit()
+            except sqlite3.IntegrityError as e:
+                self._conn.rollback()
+                raise ValueError(f"Tried to add ids that already exist: {e}") from e
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in ids])
+            self._conn.executemany("DELETE FROM chunk_meta WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def positions_where(self, flt: MetadataFilter) -> np.ndarray:
+        """Sorted vector positions whose chunks match `flt`."""
+        if self.has_chunk_meta:
+            where, params = flt.where()
+            # matching ids first, then their positions through positions_id; a join
+            # would probe chunk_meta once per vector instead
+            rows = self._query(
+                f"SELECT pos FROM positions WHERE id IN (SELECT m.id FROM chunk_meta m WHERE {where}) ORDER BY pos",
+                tuple(params),
+            )
+            return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        rows = self._query("SELECT p.pos, d.metadata FROM positions p JOIN docs d ON d.id = p.id ORDER BY p.pos")
+        return np.array([pos for pos, md in rows if flt.matches(json.loads(md))], dtype=np.int64)
+
+    def search(self, search: str) -> Union[str, Document]:
+        rows = self._query("SELECT page_content, metadata FROM docs WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        content, metadata = rows[0]
+        return Document(id=search, page_content=content, metadata=json.loads(metadata))
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM docs")[0][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SqliteIdMap(MutableMapping):
+    """index_to_docstore_id stored in the docstore's positions table instead of a dict."""
+
+    def __init__(self, store: SqliteDocstore):
+        self._store = store
+
+    def __getitem__(self, pos: int) -> str:
+        rows = self._store._query("SELECT id FROM positions WHERE pos = ?", (int(pos),))
+        if not rows:
+            raise KeyError(pos)
+        return rows[0][0]
+
+    def __setitem__(self, pos: int, doc_id: str) -> None:
+        self.update({pos: doc_id})
+
+    def update(self, other=(), **kwargs) -> None:
+        items = list(dict(other, **kwargs).items())
+        with self._store._lock:
+            self._store._conn.executemany("INSERT OR REPLACE INTO positions (pos, id) VALUES (?, ?)", [(int(p), i) for p, i in items])
+            self._store._conn.commit()
+
+    def __delitem__(self, pos: int) -> None:
+        with self._store._lock:
+            self._store._conn.execute("DELETE FROM positions WHERE pos = ?", (int(pos),))
+            self._store._conn.commit()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(p for (p,) in self._store._query("SELECT pos FROM positions ORDER BY pos"))
+
+    def __len__(self) -> int:
+        return self._store._query("SELECT COUNT(*) FROM positions")[0][0]
+
+    def truncate(self, n: int) -> None:
+        """Drop positions >= n (left behind if a writer died before saving the index)."""
+        with self._store._lock:
+            self._store._conn.execute("DELETE FROM positions WHERE pos >= ?", (n,))
+            self._store._conn.commit()
+
+    def close(self) -> None:
+        """Close the docstore connection the map reads through."""
+        self._store.close()
+
+
+def vectorstore_closer(vs: FAISS):
+    """
+    A callable closing `vs`'s SQLite docstore and id map (connection and memory map).
+    It holds no reference to `vs`, so it can run from a weakref.finalize on it.
+    """
+    parts = [p for p in (vs.docstore, vs.index_to_docstore_id) if isinstance(p, (SqliteDocstore, SqliteIdMap))]
+
+    def close() -> None:
+        for part in parts:
+            part.close()
+
+    return close
+
+
+def _write_sqlite(vs: FAISS, path: Path) -> None:
+    """Write an in-memory (pickled-format) docstore to a fresh database, swapped in atomically."""
+    tmp = path.with_suffix(".sqlite.tmp")
+    tmp.unlink(missing_ok=True)
+    store = SqliteDocstore(tmp)
+    ids = [vs.index_to_docstore_id[i] for i in range(vs.index.ntotal)]
+    store.add({i: vs.docstore.search(i) for i in ids})
+    SqliteIdMap(store).update({p: i for p, i in enumerate(ids)})
+    store.close()
+    os.replace(tmp, path)
+
+
+def save_vectorstore(
+    vs: FAISS,
+    folder: Union[str, Path],
+    index_name: str = "index",
+    storage: str = "float32",
+    rescore: bool = False,
+    reduction: Optional[Tuple[str, int]] = None,
+) -> FAISS:
+    """
+    Persist `vs`; callers hold `index_lock(folder, index_name)`. A store loaded with
+    read_only=False writes only its delta segment (chunks are already in SQLite). A
+    store built in memory is written in full, switched over to its database and
+    given an empty delta, so later adds append to both. `storage`, `rescore` and
+    `reduction` apply to full writes; a delta-only save keeps the base as it is on disk.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    path = docs_path(folder, index_name).resolve()
+    base_file = folder / f"{index_name}.faiss"
+    index = vs.index
+    if isinstance(index, SegmentedIndex) and isinstance(vs.docstore, SqliteDocstore) and vs.docstore.path == path:
+        if index.base_stamp != _file_stamp(base_file):
+            raise RuntimeError(f"{base_file} changed since it was loaded; reload the store before writing")
+        if index.delta.ntotal:
+            _write_index(index.delta, delta_path(folder, index_name))
+            if index.delta.ntotal >= DELTA_MERGE_VECTORS:
+                schedule_merge(folder, index_name)
+        return vs
+
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown FAISS storage mode {storage!r}; expected one of {STORAGE_MODES}")
+    rescore = rescore and storage != "float32"
+    import faiss
+
+    base = index.base if isinstance(index, SegmentedIndex) else index
+    vectors = None
+    has_delta = isinstance(index, SegmentedIndex) and index.delta.ntotal > 0
+    if storage != "float32" or reduction or not isinstance(base, faiss.IndexFlat) or has_delta:
+        vectors = exact_vectors(index)
+        base = _build_base(vectors, index.metric_type, storage, reduction)
+    if not (isinstance(vs.docstore, SqliteDocstore) and vs.docstore.path == path):
+        _write_sqlite(vs, path)
+        vs.docstore = SqliteDocstore(path)
+        vs.index_to_docstore_id = SqliteIdMap(vs.docstore)
+    if rescore:
+        _write_vectors(vectors, vectors_path(folder, index_name))
+    else:
+        vectors_path(folder, index_name).unlink(missing_ok=True)
+    _write_index(base, base_file)
+    delta_path(folder, index_name).unlink(missing_ok=True)
+    (folder / f"{index_name}.pkl").unlink(missing_ok=True)
+    if rescore:
+        base = RescoredIndex(base, _open_vectors(vectors_path(folder, index_name), base.d))
+    vs.index = SegmentedIndex(base, base_stamp=_file_stamp(base_file))
+    return vs
+
+
+def load_vectorstore(
+    folder: Union[str, Path],
+    embeddings,
+    index_name: str = "index",
+    read_only: bool = True,
+    mmap: bool = True,
+    rescore_factor: int = RESCORE_FACTOR,
+    **kwargs,
+) -> FAISS:
+    """
+    Load a saved store. read_only=True (the query path) opens the database read-only
+    and takes the index lock shared while reading; read_only=False is for writers,
+    who already hold it exclusively, and returns a store whose adds go to the delta.
+    mmap=False reads the base index into private memory instead of mapping it. A
+    compact base with a <name>.f32 file is searched through a RescoredIndex.
+    """
+    import faiss
+
+    folder = Path(folder)
+    path = docs_path(folder, index_name)
+    if not path.exists():
+        log.warning("Loading legacy pickled docstore", folder=str(folder), index_name=index_name)
+        return FAISS.load_local(
+            str(folder), embeddings, index_name=index_name,
+            allow_dangerous_deserialization=True,  # legacy format; ok if you trust the index
+            **kwargs,
+        )
+    base_file = folder / f"{index_name}.faiss"
+    flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    with index_lock(folder, index_name, shared=True) if read_only else _no_lock():
+        base_stamp = _file_stamp(base_file)
+        base = faiss.read_index(str(base_file), flags)
+        delta_file = delta_path(folder, index_name)
+        delta = faiss.read_index(str(delta_file)) if delta_file.exists() else None
+        store = SqliteDocstore(path, read_only=read_only)
+        vectors = _open_vectors(vectors_path(folder, index_name), base.d)
+    if vectors is not None and len(vectors) == base.ntotal:
+        base = RescoredIndex(base, vectors, rescore_factor)
+    elif vectors is not None:
+        log.warning("Ignoring float32 vectors file of a different size", folder=str(folder), index_name=index_name)
+    index = SegmentedIndex(base, delta, base_stamp) if delta is not None or not read_only else base
+    ids = SqliteIdMap(store)
+    if not read_only:
+        ids.truncate(index.ntotal)
+    return FAISS(embeddings, index, store, ids, **kwargs)
+
+
+@contextmanager
+def _no_lock():
+    yield True
+
+
+# ---------- Delta merging ----------
+
+_merging: set = set()
+_merging_lock = threading.Lock()
+
+
+def merge_delta(folder: Union[str, Path], index_name: str = "index") -> int:
+    """
+    Fold the delta segment into the base index; returns the number of vectors merged.
+    The new base is built without holding the index lock, which is taken only to
+    swap files, so queries and ingestion continue during a merge. Vectors appended
+    to the delta meanwhile are kept in a new, shorter delta.
+    """
+    import faiss
+
+    folder = Path(folder)
+    base_file, delta_file = folder / f"{index_name}.faiss", delta_path(folder, index_name)
+    with index_lock(folder, f"{index_name}.merge", blocking=False) as acquired:
+        if not acquired:  # another process is merging this index
+            return 0
+        with index_lock(folder, index_name, shared=True):
+            if not delta_file.exists():
+                return 0
+            delta = faiss.read_index(str(delta_file))
+            base_stamp = _file_stamp(base_file)
+        n = delta.ntotal
+        with _MERGE_TIMER.time():
+            base = faiss.read_index(str(base_file))
+            added = delta.reconstruct_n(0, n)
+            base.add(added)
+            tmp = base_file.with_name(base_file.name + ".merge.tmp")
+            faiss.write_index(base, str(tmp))
+            vectors_file = vectors_path(folder, index_name)
+            vectors_tmp = vectors_file.with_name(vectors_file.name + ".merge.tmp")
+            if vectors_file.exists():  # float32 copy for re-scoring grows with the base
+                shutil.copyfile(vectors_file, vectors_tmp)
+                with open(vectors_tmp, "ab") as fh:
+                    fh.write(np.ascontiguousarray(added, dtype=np.float32).tobytes())
+            with index_lock(folder, index_name):
+                if _file_stamp(base_file) != base_stamp:  # rewritten in full meanwhile
+                    tmp.unlink(missing_ok=True)
+                    vectors_tmp.unlink(missing_ok=True)
+                    return 0
+                current = faiss.read_index(str(delta_file)) if delta_file.exists() else None
+                if vectors_tmp.exists():
+                    os.replace(vectors_tmp, vectors_file)
+                os.replace(tmp, base_file)
+                if current is not None and current.ntotal > n:
+                    rest = _empty_delta(current)
+                    rest.add(current.reconstruct_n(n, current.ntotal - n))
+                    _write_index(rest, delta_file)
+                else:
+                    delta_file.unlink(missing_ok=True)
+    log.info("FAISS delta merged", folder=str(folder), index_name=index_name, vectors=n, total=base.ntotal)
+    return n
+
+
+def schedule_merge(folder: Union[str, Path], index_name: str = "index") -> None:
+    """Run merge_delta in a background thread, at most one per index in this process."""
+    key = (os.path.abspath(folder), index_name)
+    with _merging_lock:
+        if key in _merging:
+            return
+        _merging.add(key)
+
+    def run():
+        try:
+            merge_delta(folder, index_name)
+        except Exception as e:
+            log.error("FAISS delta merge failed", folder=str(folder), index_name=index_name, error=str(e))
+        finally:
+            with _merging_lock:
+                _merging.discard(key)
+
+    threading.Thread(target=run, name=f"faiss-merge-{index_name}", daemon=True).start()